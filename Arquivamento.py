@@ -0,0 +1,79 @@
+"""
+Arquivamento em segundo plano dos pedidos entregues antigos.
+
+O ArquivadorPedidos chama BancoDeDados.arquivar_pedidos em lotes pequenos,
+com uma pausa entre eles para que o webhook consiga o lock de escrita, e
+depois dorme até a próxima rodada. Uso avulso (cron):
+
+    python Arquivamento.py pizzaria.db pizzaria_arquivo.db [dias]
+"""
+import threading
+from typing import Optional
+
+from BancoDeDados import BancoDeDados
+
+
+class ArquivadorPedidos:
+    def __init__(self, db: BancoDeDados, dias: int = 90, lote: int = 500,
+                 pausa_lote: float = 0.2, intervalo: float = 3600.0) -> None:
+        """
+        Args:
+            db: BancoDeDados criado com banco_arquivo
+            dias: Idade mínima, em dias, de um pedido entregue para ser arquivado
+            lote: Pedidos movidos por transação
+            pausa_lote: Segundos entre um lote e o próximo
+            intervalo: Segundos entre uma rodada e a seguinte
+        """
+        if not db.banco_arquivo:
+            raise ValueError("BancoDeDados sem banco_arquivo configurado")
+        self.db = db
+        self.dias = dias
+        self.lote = lote
+        self.pausa_lote = pausa_lote
+        self.intervalo = intervalo
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def executar_rodada(self) -> int:
+        """Arquiva lote a lote até acabarem os pedidos elegíveis; retorna o total movido."""
+        total = 0
+        while not self._parar.is_set():
+            movidos = self.db.arquivar_pedidos(self.dias, self.lote)
+            if not movidos:
+                break
+            total += movidos
+            if movidos < self.lote:
+                break
+            self._parar.wait(self.pausa_lote)
+        return total
+
+    def _executar(self) -> None:
+        while not self._parar.is_set():
+            try:
+                self.executar_rodada()
+            except Exception as e:
+                print(f"Erro no arquivamento de pedidos: {e}")
+            self._parar.wait(self.intervalo)
+
+    def iniciar(self) -> None:
+        self._thread = threading.Thread(target=self._executar, name='arquivamento-pedidos', daemon=True)
+        self._thread.start()
+
+    def parar(self, timeout: float = 5.0) -> None:
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 3:
+        print("Uso: python Arquivamento.py <banco> <banco_arquivo> [dias]")
+        sys.exit(1)
+    arquivador = ArquivadorPedidos(
+        BancoDeDados(sys.argv[1], banco_arquivo=sys.argv[2]),
+        dias=int(sys.argv[3]) if len(sys.argv) > 3 else 90, pausa_lote=0
+    )
+    print(f"{arquivador.executar_rodada()} pedidos arquivados.")
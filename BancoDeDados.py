@@ -1,21 +1,676 @@
 import sqlite3
-import requests
 import re
-from typing import Optional, List, Dict, Union, Tuple
+import threading
+import json
+import time
+import functools
+import os
+import uuid
+from urllib.parse import quote
+from queue import LifoQueue, Empty, Full
+from contextlib import contextmanager
+from typing import Optional, List, Dict, Union, Tuple, Iterator, Iterable, Callable
 from datetime import datetime
+from itertools import islice
+from Cache import CacheLRU, AUSENTE
+from IndiceCep import IndiceCep
+from Metricas import REGISTRO, RegistroMetricas
+from ConsultasLentas import ConexaoMonitorada, MonitorConsultas
+from ImportacaoCardapio import ler_cardapio, normalizar_item
+
+STATUS_PEDIDO = ('Recebido', 'Confirmado', 'Em preparo', 'Assando', 'Saiu para entrega', 'Entregue')
+
+# Migrações do esquema, aplicadas em ordem sobre as tabelas de _criar_tabelas.
+# A migração de índice i leva o banco para PRAGMA user_version = i + 1.
+# Nunca altere uma migração já publicada; acrescente uma nova ao final.
+MIGRACOES: List[List[str]] = [
+    # 1: colunas de endereço que buscar_detalhes_pedido já consulta
+    [
+        "ALTER TABLE enderecos ADD COLUMN bairro TEXT",
+        "ALTER TABLE enderecos ADD COLUMN cidade TEXT",
+        "ALTER TABLE enderecos ADD COLUMN uf TEXT",
+    ],
+    # 2: índices dos caminhos quentes; o de histórico cobre buscar_pedidos_cliente
+    [
+        '''CREATE INDEX IF NOT EXISTS idx_pedidos_cliente_historico
+           ON pedidos (cliente_id, data_pedido DESC, status, valor_total, endereco_id)''',
+        "CREATE INDEX IF NOT EXISTS idx_pedidos_data ON pedidos (data_pedido)",
+        "CREATE INDEX IF NOT EXISTS idx_pedidos_status ON pedidos (status, data_pedido)",
+        "CREATE INDEX IF NOT EXISTS idx_enderecos_cliente ON enderecos (cliente_id, apelido)",
+        "CREATE INDEX IF NOT EXISTS idx_itens_pedido_pedido ON itens_pedido (pedido_id, pizza_id)",
+    ],
+    # 3: resumos de vendas mantidos incrementalmente (ver _atualizar_resumo_*)
+    [
+        '''CREATE TABLE IF NOT EXISTS resumo_vendas_diario (
+               dia TEXT NOT NULL,
+               pizza_id INTEGER NOT NULL,
+               tamanho TEXT NOT NULL,
+               quantidade INTEGER NOT NULL DEFAULT 0,
+               receita REAL NOT NULL DEFAULT 0,
+               PRIMARY KEY (dia, pizza_id, tamanho)
+           ) WITHOUT ROWID''',
+        '''CREATE TABLE IF NOT EXISTS resumo_status_diario (
+               dia TEXT NOT NULL,
+               status TEXT NOT NULL,
+               pedidos INTEGER NOT NULL DEFAULT 0,
+               valor REAL NOT NULL DEFAULT 0,
+               PRIMARY KEY (dia, status)
+           ) WITHOUT ROWID''',
+        '''INSERT INTO resumo_vendas_diario (dia, pizza_id, tamanho, quantidade, receita)
+           SELECT date(p.data_pedido), i.pizza_id, i.tamanho,
+                  SUM(i.quantidade), SUM(i.quantidade * i.valor_unitario)
+           FROM itens_pedido i JOIN pedidos p ON p.id = i.pedido_id
+           GROUP BY 1, 2, 3''',
+        '''INSERT INTO resumo_status_diario (dia, status, pedidos, valor)
+           SELECT date(data_pedido), status, COUNT(*), SUM(valor_total)
+           FROM pedidos GROUP BY 1, 2''',
+    ],
+    # 4: busca textual no cardápio, sem acentos e por prefixo; triggers mantêm o índice
+    [
+        '''CREATE VIRTUAL TABLE IF NOT EXISTS pizzas_busca USING fts5(
+               nome, descricao, ingredientes,
+               content='pizzas', content_rowid='id',
+               tokenize='unicode61 remove_diacritics 2',
+               prefix='2 3'
+           )''',
+        '''CREATE TRIGGER IF NOT EXISTS pizzas_busca_ai AFTER INSERT ON pizzas BEGIN
+               INSERT INTO pizzas_busca (rowid, nome, descricao, ingredientes)
+               VALUES (new.id, new.nome, new.descricao, new.ingredientes);
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS pizzas_busca_ad AFTER DELETE ON pizzas BEGIN
+               INSERT INTO pizzas_busca (pizzas_busca, rowid, nome, descricao, ingredientes)
+               VALUES ('delete', old.id, old.nome, old.descricao, old.ingredientes);
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS pizzas_busca_au
+           AFTER UPDATE OF nome, descricao, ingredientes ON pizzas BEGIN
+               INSERT INTO pizzas_busca (pizzas_busca, rowid, nome, descricao, ingredientes)
+               VALUES ('delete', old.id, old.nome, old.descricao, old.ingredientes);
+               INSERT INTO pizzas_busca (rowid, nome, descricao, ingredientes)
+               VALUES (new.id, new.nome, new.descricao, new.ingredientes);
+           END''',
+        "INSERT INTO pizzas_busca (pizzas_busca) VALUES ('rebuild')",
+    ],
+    # 5: apelidos das pizzas ("margherita", "calabreza"), usados pelo pedido em texto livre
+    [
+        '''CREATE TABLE IF NOT EXISTS pizzas_apelidos (
+               apelido TEXT PRIMARY KEY COLLATE NOCASE,
+               pizza_id INTEGER NOT NULL REFERENCES pizzas(id) ON DELETE CASCADE
+           )''',
+        "CREATE INDEX IF NOT EXISTS idx_pizzas_apelidos_pizza ON pizzas_apelidos (pizza_id)",
+    ],
+    # 6: vizinhança entre prefixos de CEP (5 dígitos), usada para agrupar entregas
+    [
+        '''CREATE TABLE IF NOT EXISTS vizinhanca_cep (
+               prefixo TEXT NOT NULL,
+               vizinho TEXT NOT NULL,
+               distancia_km REAL NOT NULL CHECK(distancia_km >= 0),
+               PRIMARY KEY (prefixo, vizinho)
+           ) WITHOUT ROWID''',
+    ],
+    # 7: histórico paginado com desempate por id (data_pedido tem resolução de 1 s)
+    [
+        "DROP INDEX IF EXISTS idx_pedidos_cliente_historico",
+        '''CREATE INDEX IF NOT EXISTS idx_pedidos_cliente_pagina
+           ON pedidos (cliente_id, data_pedido DESC, id DESC, status, valor_total, endereco_id)''',
+    ],
+    # 8: mudanças de status gravadas para os outros processos (ver _sincronizar)
+    [
+        '''CREATE TABLE IF NOT EXISTS eventos_status (
+               id INTEGER PRIMARY KEY AUTOINCREMENT,
+               origem TEXT NOT NULL,
+               pedido_id INTEGER NOT NULL,
+               status_anterior TEXT,
+               status TEXT NOT NULL,
+               momento REAL NOT NULL,
+               cliente_id INTEGER,
+               valor_total REAL
+           )''',
+        "CREATE INDEX IF NOT EXISTS idx_eventos_status_momento ON eventos_status (momento)",
+    ],
+    # 9: versão do cardápio no banco, para outros processos saberem quando recarregar
+    [
+        '''CREATE TABLE IF NOT EXISTS versoes (
+               nome TEXT PRIMARY KEY,
+               versao INTEGER NOT NULL DEFAULT 0
+           ) WITHOUT ROWID''',
+        "INSERT OR IGNORE INTO versoes (nome, versao) VALUES ('cardapio', 0)",
+        '''CREATE TRIGGER IF NOT EXISTS versao_cardapio_pizzas_ai AFTER INSERT ON pizzas BEGIN
+               UPDATE versoes SET versao = versao + 1 WHERE nome = 'cardapio';
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS versao_cardapio_pizzas_au AFTER UPDATE ON pizzas BEGIN
+               UPDATE versoes SET versao = versao + 1 WHERE nome = 'cardapio';
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS versao_cardapio_pizzas_ad AFTER DELETE ON pizzas BEGIN
+               UPDATE versoes SET versao = versao + 1 WHERE nome = 'cardapio';
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS versao_cardapio_precos_ai AFTER INSERT ON precos BEGIN
+               UPDATE versoes SET versao = versao + 1 WHERE nome = 'cardapio';
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS versao_cardapio_precos_au AFTER UPDATE ON precos BEGIN
+               UPDATE versoes SET versao = versao + 1 WHERE nome = 'cardapio';
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS versao_cardapio_precos_ad AFTER DELETE ON precos BEGIN
+               UPDATE versoes SET versao = versao + 1 WHERE nome = 'cardapio';
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS versao_cardapio_categorias_ai AFTER INSERT ON categorias BEGIN
+               UPDATE versoes SET versao = versao + 1 WHERE nome = 'cardapio';
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS versao_cardapio_categorias_au AFTER UPDATE ON categorias BEGIN
+               UPDATE versoes SET versao = versao + 1 WHERE nome = 'cardapio';
+           END''',
+        '''CREATE TRIGGER IF NOT EXISTS versao_cardapio_categorias_ad AFTER DELETE ON categorias BEGIN
+               UPDATE versoes SET versao = versao + 1 WHERE nome = 'cardapio';
+           END''',
+    ],
+    # 10: gravações em lote (importar_cardapio) ligam em_lote e somam 1 à versão
+    # uma única vez; os triggers passam a cobrir também os apelidos
+    [
+        "ALTER TABLE versoes ADD COLUMN em_lote INTEGER NOT NULL DEFAULT 0",
+        *[f"DROP TRIGGER IF EXISTS versao_cardapio_{tabela}_{sufixo}"
+          for tabela in ('pizzas', 'precos', 'categorias') for sufixo in ('ai', 'au', 'ad')],
+        *[f'''CREATE TRIGGER IF NOT EXISTS versao_cardapio_{tabela}_{sufixo} AFTER {evento} ON {tabela}
+               WHEN NOT (SELECT em_lote FROM versoes WHERE nome = 'cardapio') BEGIN
+                   UPDATE versoes SET versao = versao + 1 WHERE nome = 'cardapio';
+               END'''
+          for tabela in ('pizzas', 'precos', 'categorias', 'pizzas_apelidos')
+          for sufixo, evento in (('ai', 'INSERT'), ('au', 'UPDATE'), ('ad', 'DELETE'))],
+    ],
+]
+
+# Banco de arquivo (ATTACH ... AS arquivo): pedidos entregues antigos saem de
+# pedidos/itens_pedido e vão para cá, com as mesmas colunas. Clientes, endereços
+# e pizzas continuam no banco principal.
+COLUNAS_PEDIDO = ('id', 'cliente_id', 'endereco_id', 'data_pedido', 'status', 'valor_total',
+                  'forma_pagamento', 'troco_para', 'observacoes')
+COLUNAS_ITEM = ('id', 'pedido_id', 'pizza_id', 'tamanho', 'quantidade', 'valor_unitario', 'observacoes')
+ESQUEMA_ARQUIVO = [
+    '''CREATE TABLE IF NOT EXISTS arquivo.pedidos (
+           id INTEGER PRIMARY KEY,
+           cliente_id INTEGER NOT NULL,
+           endereco_id INTEGER NOT NULL,
+           data_pedido TIMESTAMP,
+           status TEXT,
+           valor_total REAL NOT NULL,
+           forma_pagamento TEXT,
+           troco_para REAL DEFAULT 0,
+           observacoes TEXT,
+           arquivado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+       )''',
+    '''CREATE TABLE IF NOT EXISTS arquivo.itens_pedido (
+           id INTEGER PRIMARY KEY,
+           pedido_id INTEGER NOT NULL,
+           pizza_id INTEGER NOT NULL,
+           tamanho TEXT NOT NULL,
+           quantidade INTEGER NOT NULL,
+           valor_unitario REAL NOT NULL,
+           observacoes TEXT
+       )''',
+    "DROP INDEX IF EXISTS arquivo.idx_pedidos_cliente_historico",  # sem o desempate por id
+    '''CREATE INDEX IF NOT EXISTS arquivo.idx_pedidos_cliente_pagina
+       ON pedidos (cliente_id, data_pedido DESC, id DESC, status, valor_total, endereco_id)''',
+    "CREATE INDEX IF NOT EXISTS arquivo.idx_itens_pedido_pedido ON itens_pedido (pedido_id, pizza_id)",
+]
+
+# Por quanto tempo (s) eventos_status guarda uma mudança para os outros processos
+RETENCAO_EVENTOS = 3600
+INTERVALO_LIMPEZA_EVENTOS = 60
+
+# Primeira palavra do SQL -> rótulo "tipo" de pizzap_banco_comandos_total
+TIPOS_COMANDO = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH', 'BEGIN', 'COMMIT', 'ROLLBACK')
+
+
+def _instrumentado(metodo):
+    """Mede chamadas, duração e linhas retornadas de um método público do BancoDeDados."""
+    nome = metodo.__name__
+
+    @functools.wraps(metodo)
+    def medido(self, *args, **kwargs):
+        local = self._local
+        anterior = getattr(local, 'metodo', None)
+        local.metodo = nome  # atribui os comandos do trace callback a este método
+        inicio = time.perf_counter()
+        try:
+            resultado = metodo(self, *args, **kwargs)
+        except Exception:
+            self._metrica_excecoes.incrementar(nome)
+            raise
+        finally:
+            local.metodo = anterior
+            self._metrica_duracao.observar(time.perf_counter() - inicio, nome)
+        if isinstance(resultado, list):
+            self._metrica_linhas.incrementar(nome, valor=len(resultado))
+        elif isinstance(resultado, dict):
+            self._metrica_linhas.incrementar(nome)
+        return resultado
+    return medido
+
 
 class BancoDeDados:
-    def __init__(self, nome_banco: str = 'pizzaria.db') -> None:
+    def __init__(self, nome_banco: str = 'pizzaria.db', tamanho_pool: int = 5,
+                 timeout_ocupado: float = 5.0, cache_kb: int = 8192,
+                 url_cep: str = 'https://viacep.com.br/ws/{cep}/json/',
+                 timeout_cep: Tuple[float, float] = (1.0, 2.0),
+                 ttl_cep: float = 30 * 86400, ttl_cep_invalido: float = 86400,
+                 indice_cep: Optional[str] = None, inicio_rapido: bool = True,
+                 metricas: Optional[RegistroMetricas] = None,
+                 limite_consulta_lenta: Optional[float] = None,
+                 log_consultas_lentas: Optional[str] = 'consultas_lentas.log',
+                 banco_arquivo: Optional[str] = None,
+                 intervalo_checkpoint: Optional[float] = None,
+                 limite_wal_paginas: int = 10000,
+                 tamanho_cache_clientes: int = 4096,
+                 ttl_cache_clientes: float = 300.0,
+                 intervalo_sincronizacao: Optional[float] = None) -> None:
+        """
+        Args:
+            nome_banco: Caminho do arquivo SQLite
+            tamanho_pool: Máximo de conexões ociosas mantidas para reuso
+            timeout_ocupado: Segundos que uma conexão espera por um lock antes de falhar
+            cache_kb: Tamanho do cache de páginas de cada conexão, em KiB
+            url_cep: URL do serviço de CEP, com o marcador {cep}
+            timeout_cep: Timeouts (conexão, leitura) da consulta de CEP, em segundos
+            ttl_cep: Validade em segundos de um CEP encontrado no cache
+            ttl_cep_invalido: Validade em segundos de um CEP inexistente no cache
+            indice_cep: Arquivo gerado por IndiceCep.py, consultado antes de qualquer cache
+            inicio_rapido: Se o esquema já está na versão atual, pula DDL e dados iniciais
+            metricas: Onde registrar as métricas (padrão: Metricas.REGISTRO)
+            limite_consulta_lenta: Segundos a partir dos quais uma consulta vai para o log
+                de consultas lentas, com seu EXPLAIN QUERY PLAN (None desliga)
+            log_consultas_lentas: Arquivo (com rotação) do log de consultas lentas
+            banco_arquivo: Arquivo SQLite para onde arquivar_pedidos move os pedidos
+                entregues antigos (None desliga o arquivamento)
+            intervalo_checkpoint: Segundos entre checkpoints do WAL feitos por uma
+                thread própria; as conexões do pool deixam de fazer checkpoint
+                automático (None mantém o automático do SQLite)
+            limite_wal_paginas: Com o checkpoint em segundo plano, tamanho do WAL
+                (em páginas) a partir do qual o arquivo é truncado
+            tamanho_cache_clientes: Clientes (com o endereço padrão) mantidos em
+                memória por buscar_cliente, com descarte LRU
+            ttl_cache_clientes: Segundos que um cliente fica em memória; limita o
+                tempo que outro processo leva para ver uma alteração
+            intervalo_sincronizacao: Segundos entre verificações de PRAGMA data_version
+                por uma thread que repassa aos ouvintes de status as mudanças feitas
+                por outros processos no mesmo arquivo e descarta o cardápio em
+                memória quando outro processo o altera (None: só as deste processo)
+        """
+        inicio = time.perf_counter()
         self.nome_banco = nome_banco
-        self._criar_tabelas()
-        self._popular_dados_iniciais()
-    
-    def _conectar(self) -> sqlite3.Connection:
-        conn = sqlite3.connect(self.nome_banco)
-        conn.execute("PRAGMA foreign_keys = ON")
+        self.tamanho_pool = tamanho_pool
+        self.timeout_ocupado = timeout_ocupado
+        self.cache_kb = cache_kb
+        self.banco_arquivo = banco_arquivo
+        self.intervalo_checkpoint = intervalo_checkpoint
+        self.limite_wal_paginas = limite_wal_paginas
+        self.intervalo_sincronizacao = intervalo_sincronizacao
+        # Identifica as mudanças deste processo em eventos_status, que já foram notificadas
+        self._origem = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._pool: LifoQueue = LifoQueue(maxsize=tamanho_pool)
+        self._pool_leitura: LifoQueue = LifoQueue(maxsize=tamanho_pool)
+        self._local = threading.local()
+        self._lock_estatisticas = threading.Lock()
+        self.pool_acertos = 0
+        self.pool_falhas = 0
+        self._rastreador = None
+        self.metricas = metricas or REGISTRO
+        self._metrica_duracao = self.metricas.histograma(
+            'pizzap_banco_duracao_segundos', 'Duração das chamadas ao BancoDeDados', ('metodo',))
+        self._metrica_linhas = self.metricas.contador(
+            'pizzap_banco_linhas_total', 'Linhas retornadas pelos métodos do BancoDeDados', ('metodo',))
+        self._metrica_excecoes = self.metricas.contador(
+            'pizzap_banco_excecoes_total', 'Exceções que escaparam dos métodos do BancoDeDados', ('metodo',))
+        self._metrica_comandos = self.metricas.contador(
+            'pizzap_banco_comandos_total', 'Comandos SQL executados, por método e tipo', ('metodo', 'tipo'))
+        self._metrica_checkpoint = self.metricas.histograma(
+            'pizzap_banco_checkpoint_duracao_segundos', 'Duração dos checkpoints do WAL em segundo plano',
+            ('modo',))
+        self._metrica_checkpoint_ocupado = self.metricas.contador(
+            'pizzap_banco_checkpoint_ocupado_total', 'Checkpoints que não terminaram por haver leitores ou escritor',
+            ('banco',))
+        self._paginas_wal: Dict[str, int] = {}
+        self._parar_checkpoint = threading.Event()
+        self._thread_checkpoint: Optional[threading.Thread] = None
+        self._parar_sincronizacao = threading.Event()
+        self._thread_sincronizacao: Optional[threading.Thread] = None
+        self.monitor_consultas = MonitorConsultas(
+            limite_consulta_lenta, log_consultas_lentas, metricas=self.metricas
+        ) if limite_consulta_lenta is not None else None
+        self._ouvintes_status: List[Callable[[List[Dict]], None]] = []
+        self._lock_cardapio = threading.Lock()
+        self._versao_cardapio = 0
+        self._versao_cardapio_banco = 0  # maior versoes.versao já refletida no cache
+        self._cache_cardapio: Optional[Tuple[int, List[Dict]]] = None
+        self.url_cep = url_cep
+        self.timeout_cep = timeout_cep
+        self.ttl_cep = ttl_cep
+        self.ttl_cep_invalido = ttl_cep_invalido
+        self._cache_cep = CacheLRU(tamanho_maximo=2048)
+        self._cache_clientes = CacheLRU(tamanho_maximo=tamanho_cache_clientes, ttl=ttl_cache_clientes)
+        self._lock_clientes = threading.Lock()
+        self._versao_clientes = 0
+        self._sessao_http = None  # requests.Session, criada na primeira consulta remota
+        self._estatisticas_cep = {'indice': 0, 'memoria': 0, 'banco': 0, 'remoto': 0, 'erros': 0}
+        self._indice_cep = IndiceCep(indice_cep) if indice_cep else None
+        self.relatorio_inicializacao: Dict[str, float] = {}
+        self._marcar_etapa('configuracao', inicio)
+        self._inicializar_esquema(inicio_rapido)
+        if banco_arquivo:
+            self._criar_tabelas_arquivo()
+        if intervalo_checkpoint:
+            self.metricas.medidor('pizzap_banco_wal_paginas', 'Páginas no WAL no último checkpoint',
+                                  lambda: dict(self._paginas_wal), ('banco',))
+            self._thread_checkpoint = threading.Thread(
+                target=self._executar_checkpoints, name='checkpoint-wal', daemon=True)
+            self._thread_checkpoint.start()
+        if intervalo_sincronizacao:
+            # Pontos de partida lidos antes de qualquer leitura do cardápio ou dos
+            # pedidos ativos: nada gravado depois deles se perde
+            with self._conectar() as conn:
+                ultimo_evento = conn.execute("SELECT COALESCE(MAX(id), 0) FROM eventos_status").fetchone()[0]
+                with self._lock_cardapio:
+                    self._versao_cardapio_banco = max(self._versao_cardapio_banco,
+                                                      self._ler_versao_cardapio(conn))
+            self._thread_sincronizacao = threading.Thread(
+                target=self._sincronizar, args=(ultimo_evento,), name='sincronizacao', daemon=True)
+            self._thread_sincronizacao.start()
+        self.relatorio_inicializacao['total'] = (time.perf_counter() - inicio) * 1000
+
+    # --- CONEXÕES ---
+    @staticmethod
+    def _uri_somente_leitura(caminho: str) -> str:
+        return f"file:{quote(os.path.abspath(caminho))}?mode=ro"
+
+    def _nova_conexao(self, somente_leitura: bool = False) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self._uri_somente_leitura(self.nome_banco) if somente_leitura else self.nome_banco,
+            timeout=self.timeout_ocupado,
+            check_same_thread=False,  # a conexão migra entre threads via pool
+            factory=ConexaoMonitorada if self.monitor_consultas else sqlite3.Connection,
+            uri=somente_leitura
+        )
+        if self.monitor_consultas:
+            conn.monitor = self.monitor_consultas
+            conn.contexto = lambda: getattr(self._local, 'metodo', None)
         conn.row_factory = sqlite3.Row
+        if somente_leitura:
+            conn.execute("PRAGMA query_only = ON")
+        else:
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            if self.intervalo_checkpoint:
+                conn.execute("PRAGMA wal_autocheckpoint = 0")  # fica com _executar_checkpoints
+        conn.execute(f"PRAGMA cache_size = -{int(self.cache_kb)}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("PRAGMA foreign_keys = ON")
+        if self.banco_arquivo:
+            # Anexar só abre o arquivo; as consultas quentes nunca leem dele
+            if somente_leitura:
+                conn.execute("ATTACH DATABASE ? AS arquivo", (self._uri_somente_leitura(self.banco_arquivo),))
+            else:
+                conn.execute("ATTACH DATABASE ? AS arquivo", (self.banco_arquivo,))
+                conn.execute("PRAGMA arquivo.journal_mode = WAL")
+                conn.execute("PRAGMA arquivo.synchronous = NORMAL")
+        conn.set_trace_callback(self._ao_executar)
         return conn
-    
+
+    def _ao_executar(self, sql: str) -> None:
+        """Trace callback das conexões: conta o comando e repassa ao rastreador, se houver."""
+        tipo = sql.lstrip()[:8].split(None, 1)
+        tipo = tipo[0].upper() if tipo else ''
+        self._metrica_comandos.incrementar(
+            getattr(self._local, 'metodo', None) or 'interno',
+            tipo if tipo in TIPOS_COMANDO else 'OUTRO'
+        )
+        if self._rastreador is not None:
+            self._rastreador(sql)
+
+    def _obter_conexao(self, somente_leitura: bool = False) -> sqlite3.Connection:
+        try:
+            conn = (self._pool_leitura if somente_leitura else self._pool).get_nowait()
+            with self._lock_estatisticas:
+                self.pool_acertos += 1
+            return conn
+        except Empty:
+            with self._lock_estatisticas:
+                self.pool_falhas += 1
+            return self._nova_conexao(somente_leitura)
+
+    def _devolver_conexao(self, conn: sqlite3.Connection, somente_leitura: bool = False) -> None:
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            (self._pool_leitura if somente_leitura else self._pool).put_nowait(conn)
+        except Full:
+            conn.close()
+
+    @contextmanager
+    def _conectar(self) -> Iterator[sqlite3.Connection]:
+        """
+        Empresta uma conexão do pool. Chamadas aninhadas na mesma thread
+        reutilizam a conexão já emprestada, então compartilham a transação.
+        """
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            yield conn
+            return
+
+        conn = self._obter_conexao()
+        self._local.conn = conn
+        try:
+            with conn:
+                yield conn
+        finally:
+            self._local.conn = None
+            self._devolver_conexao(conn)
+
+    @contextmanager
+    def _conectar_leitura(self) -> Iterator[sqlite3.Connection]:
+        """
+        Empresta uma conexão somente leitura (mode=ro e query_only), de um pool
+        separado do de escrita. Todas as consultas feitas com ela leem o mesmo
+        snapshot do WAL. Dentro de um _conectar na mesma thread, usa a conexão
+        de escrita, para enxergar a transação em andamento.
+        """
+        conn = getattr(self._local, 'conn', None) or getattr(self._local, 'conn_leitura', None)
+        if conn is not None:
+            yield conn
+            return
+
+        conn = self._obter_conexao(somente_leitura=True)
+        self._local.conn_leitura = conn
+        try:
+            conn.execute("BEGIN")  # o snapshot começa na primeira leitura e vai até o ROLLBACK
+            yield conn
+        finally:
+            self._local.conn_leitura = None
+            self._devolver_conexao(conn, somente_leitura=True)
+
+    def arquivos_com_checkpoint(self) -> List[str]:
+        """
+        Arquivos cujo WAL é checkpointado pela thread em segundo plano. Outras
+        conexões a eles (fila, sessões) devem desligar o checkpoint automático,
+        senão o checkpoint volta a rodar na thread da requisição que gravou.
+        """
+        if not self.intervalo_checkpoint:
+            return []
+        arquivos = [self.nome_banco] + ([self.banco_arquivo] if self.banco_arquivo else [])
+        return [os.path.abspath(arquivo) for arquivo in arquivos]
+
+    def estatisticas_pool(self) -> Dict[str, int]:
+        """Retorna os contadores de acerto/falha do pool de conexões."""
+        with self._lock_estatisticas:
+            return {
+                'acertos': self.pool_acertos,
+                'falhas': self.pool_falhas,
+                'ociosas': self._pool.qsize(),
+                'ociosas_leitura': self._pool_leitura.qsize(),
+                'tamanho_pool': self.tamanho_pool
+            }
+
+    def rastrear_consultas(self, callback) -> None:
+        """
+        Registra `callback(sql)`, chamado para cada comando executado em qualquer
+        conexão do pool (None desliga).
+        """
+        self._rastreador = callback
+
+    def fechar(self) -> None:
+        """Para as threads em segundo plano e fecha todas as conexões ociosas dos pools."""
+        if self._thread_sincronizacao is not None:
+            self._parar_sincronizacao.set()
+            self._thread_sincronizacao.join(self.timeout_ocupado)
+            self._thread_sincronizacao = None
+        if self._thread_checkpoint is not None:
+            self._parar_checkpoint.set()
+            self._thread_checkpoint.join(self.timeout_ocupado)
+            self._thread_checkpoint = None
+        for pool in (self._pool, self._pool_leitura):
+            while True:
+                try:
+                    pool.get_nowait().close()
+                except Empty:
+                    break
+
+    # --- CHECKPOINT DO WAL ---
+    def _executar_checkpoints(self) -> None:
+        """
+        Thread de checkpoint: PASSIVE a cada intervalo, que nunca espera por
+        ninguém, e TRUNCATE quando o WAL passa de limite_wal_paginas. O TRUNCATE
+        bloqueia novos escritores enquanto espera os leitores, por isso desiste
+        rápido (busy_timeout curto) e tenta de novo no próximo intervalo.
+        """
+        conn = self._nova_conexao()
+        conn.execute("PRAGMA busy_timeout = 100")
+        esquemas = ('main', 'arquivo') if self.banco_arquivo else ('main',)
+        try:
+            while not self._parar_checkpoint.wait(self.intervalo_checkpoint):
+                for esquema in esquemas:
+                    try:
+                        self._checkpoint(conn, esquema)
+                    except sqlite3.Error as e:
+                        print(f"Erro no checkpoint do WAL: {e}")
+        finally:
+            conn.close()
+
+    def _checkpoint(self, conn: sqlite3.Connection, esquema: str) -> None:
+        modo = 'TRUNCATE' if self._paginas_wal.get(esquema, 0) >= self.limite_wal_paginas else 'PASSIVE'
+        inicio = time.perf_counter()
+        ocupado, paginas, _ = conn.execute(f"PRAGMA {esquema}.wal_checkpoint({modo})").fetchone()
+        self._metrica_checkpoint.observar(time.perf_counter() - inicio, modo)
+        if ocupado:
+            self._metrica_checkpoint_ocupado.incrementar(esquema)
+        self._paginas_wal[esquema] = max(paginas, 0)
+
+    # --- SINCRONIZAÇÃO ENTRE PROCESSOS ---
+    def _sincronizar(self, ultimo: int) -> None:
+        """
+        Thread de sincronização: PRAGMA data_version só muda quando outra conexão
+        grava no arquivo, então a cada intervalo uma consulta barata diz se há
+        algo novo. Havendo, as linhas novas de eventos_status gravadas por outros
+        processos vão para os ouvintes de status, como se a mudança fosse local,
+        e, se a versão do cardápio em `versoes` passou da última já refletida no
+        cache (os commits deste processo a registram em _confirmar_cardapio), o
+        cardápio em memória é descartado.
+        """
+        conn = self._nova_conexao()
+        conn.execute("PRAGMA busy_timeout = 100")
+        versao = None
+        proxima_limpeza = 0.0
+        try:
+            while not self._parar_sincronizacao.wait(self.intervalo_sincronizacao):
+                try:
+                    atual = conn.execute("PRAGMA data_version").fetchone()[0]
+                    if atual != versao:
+                        versao = atual
+                        ultimo = self._repassar_eventos(conn, ultimo)
+                        novo = self._ler_versao_cardapio(conn)
+                        with self._lock_cardapio:
+                            if novo > self._versao_cardapio_banco:
+                                self._versao_cardapio_banco = novo
+                                self._versao_cardapio += 1
+                    if time.time() >= proxima_limpeza:
+                        proxima_limpeza = time.time() + INTERVALO_LIMPEZA_EVENTOS
+                        conn.execute("DELETE FROM eventos_status WHERE momento < ?",
+                                     (time.time() - RETENCAO_EVENTOS,))
+                        conn.commit()
+                except sqlite3.Error as e:
+                    print(f"Erro na sincronização entre processos: {e}")
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _ler_versao_cardapio(conn: sqlite3.Connection) -> int:
+        linha = conn.execute("SELECT versao FROM versoes WHERE nome = 'cardapio'").fetchone()
+        return linha[0] if linha else 0
+
+    def _repassar_eventos(self, conn: sqlite3.Connection, ultimo: int) -> int:
+        """Notifica as mudanças de outros processos com id > `ultimo`; retorna o maior id lido."""
+        linhas = conn.execute('''
+        SELECT id, origem, pedido_id, status_anterior, status, momento, cliente_id, valor_total
+        FROM eventos_status WHERE id > ? ORDER BY id
+        ''', (ultimo,)).fetchall()
+        if not linhas:
+            return ultimo
+        eventos = []
+        for row in linhas:
+            if row['origem'] == self._origem:
+                continue
+            evento = {'pedido_id': row['pedido_id'], 'status_anterior': row['status_anterior'],
+                      'status': row['status'], 'momento': row['momento']}
+            if row['status_anterior'] is None:
+                evento.update(cliente_id=row['cliente_id'], valor_total=row['valor_total'])
+            eventos.append(evento)
+        self._notificar_status(eventos)
+        return linhas[-1]['id']
+
+    def _registrar_eventos(self, conn: sqlite3.Connection, eventos: List[Dict]) -> None:
+        """Grava os eventos em eventos_status, na transação de `conn`, para os outros processos."""
+        if not self.intervalo_sincronizacao or not eventos:
+            return
+        conn.executemany('''
+        INSERT INTO eventos_status
+        (origem, pedido_id, status_anterior, status, momento, cliente_id, valor_total)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [
+            (self._origem, evento['pedido_id'], evento['status_anterior'], evento['status'],
+             evento['momento'], evento.get('cliente_id'), evento.get('valor_total'))
+            for evento in eventos
+        ])
+
+    # --- INICIALIZAÇÃO ---
+    def _marcar_etapa(self, etapa: str, inicio: float) -> float:
+        """Registra em relatorio_inicializacao o tempo (ms) desde `inicio` e retorna o instante atual."""
+        agora = time.perf_counter()
+        self.relatorio_inicializacao[etapa] = (agora - inicio) * 1000
+        return agora
+
+    def _inicializar_esquema(self, inicio_rapido: bool) -> None:
+        """
+        Garante tabelas, migrações e dados iniciais.
+
+        No início rápido, basta ler PRAGMA user_version: se já é a versão atual,
+        o banco foi criado e populado antes e nenhum DDL é executado. Por isso,
+        tabelas novas devem entrar como migração, não em _criar_tabelas.
+        """
+        instante = time.perf_counter()
+        with self._conectar() as conn:
+            versao = conn.execute("PRAGMA user_version").fetchone()[0]
+        instante = self._marcar_etapa('verificar_versao', instante)
+        if inicio_rapido and versao >= len(MIGRACOES):
+            return
+
+        self._criar_tabelas()
+        instante = self._marcar_etapa('criar_tabelas', instante)
+        self._migrar()
+        instante = self._marcar_etapa('migrar', instante)
+        self._popular_dados_iniciais()
+        self._marcar_etapa('dados_iniciais', instante)
+
+    def _criar_tabelas_arquivo(self) -> None:
+        with self._conectar() as conn:
+            for comando in ESQUEMA_ARQUIVO:
+                conn.execute(comando)
+            conn.commit()
+
     def _criar_tabelas(self) -> None:
         tabelas = [
             '''
@@ -98,6 +753,13 @@ class BancoDeDados:
                 FOREIGN KEY (pedido_id) REFERENCES pedidos(id) ON DELETE CASCADE,
                 FOREIGN KEY (pizza_id) REFERENCES pizzas(id)
             )
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS cep_cache (
+                cep TEXT PRIMARY KEY,
+                dados TEXT,
+                atualizado_em REAL NOT NULL
+            )
             '''
         ]
         
@@ -106,6 +768,41 @@ class BancoDeDados:
                 conn.execute(tabela)
             conn.commit()
 
+    def _migrar(self) -> int:
+        """
+        Aplica as migrações pendentes, uma transação por migração.
+
+        Pode rodar com o banco em uso: leitores continuam atendidos pelo WAL e
+        outros processos iniciando ao mesmo tempo esperam o lock de escrita e
+        então encontram a versão já atualizada.
+
+        Returns:
+            Versão do esquema após a execução
+        """
+        with self._conectar() as conn:
+            versao = conn.execute("PRAGMA user_version").fetchone()[0]
+            if versao >= len(MIGRACOES):
+                return versao
+
+            for alvo in range(versao + 1, len(MIGRACOES) + 1):
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    # Outro processo pode ter migrado enquanto esperávamos o lock
+                    if conn.execute("PRAGMA user_version").fetchone()[0] >= alvo:
+                        conn.rollback()
+                        continue
+                    for comando in MIGRACOES[alvo - 1]:
+                        conn.execute(comando)
+                    conn.execute(f"PRAGMA user_version = {alvo}")
+                    conn.commit()
+                except sqlite3.Error:
+                    conn.rollback()
+                    raise
+
+            conn.execute("ANALYZE")
+            conn.commit()
+            return len(MIGRACOES)
+
     def _popular_dados_iniciais(self) -> None:
         with self._conectar() as conn:
             # Verifica se já existem categorias para não duplicar
@@ -139,63 +836,99 @@ class BancoDeDados:
                     precos
                 )
                 
-                conn.commit()
+                self._confirmar_cardapio(conn)
 
     # --- CLIENTES ---
-def cadastrar_cliente(self, nome: str, telefone: str) -> bool:
-    """Cadastra um novo cliente"""
-    try:
-        with self._conectar() as conn:
-            conn.execute('''
-            INSERT INTO clientes (nome, telefone)
-            VALUES (?, ?)
-            ''', (nome.strip(), ''.join(filter(str.isdigit, telefone))))
-            conn.commit()
-            return True
-    except sqlite3.IntegrityError:
-        return False  # Telefone já existe
-    except Exception as e:
-        print(f"Erro ao cadastrar cliente: {e}")
-        return False
-
-def buscar_cliente(self, telefone: str) -> Optional[Dict]:
-    """Busca cliente pelo telefone"""
-    try:
-        with self._conectar() as conn:
-            cursor = conn.execute('''
-            SELECT id, nome FROM clientes WHERE telefone = ?
-            '''), (''.join(filter(str.isdigit, telefone)),)
-            resultado = cursor.fetchone()
-            return dict(resultado) if resultado else None
-    except Exception as e:
-        print(f"Erro ao buscar cliente: {e}")
-        return None
+    @staticmethod
+    def _normalizar_telefone(telefone: str) -> str:
+        return ''.join(filter(str.isdigit, telefone or ''))
 
+    @_instrumentado
+    def cadastrar_cliente(self, nome: str, telefone: str) -> bool:
+        """Cadastra um novo cliente"""
+        telefone = self._normalizar_telefone(telefone)
+        try:
+            with self._conectar() as conn:
+                conn.execute('''
+                INSERT INTO clientes (nome, telefone)
+                VALUES (?, ?)
+                ''', (nome.strip(), telefone))
+                conn.commit()
+                self._invalidar_cliente(telefone)
+                return True
+        except sqlite3.IntegrityError:
+            return False  # Telefone já existe
+        except Exception as e:
+            print(f"Erro ao cadastrar cliente: {e}")
+            return False
+
+    @_instrumentado
     def buscar_cliente(self, telefone: str) -> Optional[Dict]:
         """
         Busca um cliente pelo telefone.
-        
+
+        Clientes encontrados ficam em memória (LRU, com TTL) pelo telefone
+        normalizado; cadastrar_cliente e adicionar_endereco descartam a entrada.
+        Números não cadastrados não são guardados.
+
         Args:
-            telefone: Número de telefone do cliente
-            
+            telefone: Número de telefone do cliente, em qualquer formato
+
         Returns:
-            Dicionário com os dados do cliente ou None se não encontrado
+            Dicionário com os dados do cliente e 'endereco_padrao' (o primeiro
+            endereço por apelido, como em listar_enderecos, ou None), ou None se
+            não encontrado
         """
+        telefone = self._normalizar_telefone(telefone)
+        cliente = self._cache_clientes.obter(telefone)
+        if cliente is not AUSENTE:
+            return self._copiar_cliente(cliente)
+        with self._lock_clientes:
+            versao = self._versao_clientes
         try:
-            with self._conectar() as conn:
-                cursor = conn.execute('''
+            with self._conectar_leitura() as conn:
+                resultado = conn.execute('''
                 SELECT * FROM clientes WHERE telefone = ?
-                ''', (''.join(filter(str.isdigit, telefone)),))
-                resultado = cursor.fetchone()
-                return dict(resultado) if resultado else None
+                ''', (telefone,)).fetchone()
+                if resultado is None:
+                    return None
+                cliente = dict(resultado)
+                endereco = conn.execute(
+                    "SELECT * FROM enderecos WHERE cliente_id = ? ORDER BY apelido LIMIT 1",
+                    (cliente['id'],)
+                ).fetchone()
+                cliente['endereco_padrao'] = dict(endereco) if endereco else None
         except sqlite3.Error as e:
             print(f"Erro ao buscar cliente: {e}")
             return None
+        with self._lock_clientes:
+            # Uma invalidação durante a leitura torna o resultado suspeito: não guarda
+            if self._versao_clientes == versao:
+                self._cache_clientes.definir(telefone, cliente)
+        return self._copiar_cliente(cliente)
+
+    @staticmethod
+    def _copiar_cliente(cliente: Dict) -> Dict:
+        """Cópia do cliente em cache que o chamador pode alterar à vontade."""
+        copia = dict(cliente)
+        if copia['endereco_padrao'] is not None:
+            copia['endereco_padrao'] = dict(copia['endereco_padrao'])
+        return copia
+
+    def _invalidar_cliente(self, telefone: str) -> None:
+        with self._lock_clientes:
+            self._versao_clientes += 1
+            self._cache_clientes.remover(telefone)
+
+    def estatisticas_cache_clientes(self) -> Dict[str, float]:
+        return self._cache_clientes.estatisticas()
 
     # --- ENDEREÇOS ---
+    @_instrumentado
     def adicionar_endereco(self, cliente_id: int, apelido: str, cep: str, 
                         logradouro: str, numero: str, tipo_residencia: str, 
-                        complemento: str = None) -> bool:
+                        complemento: str = None, bairro: str = None,
+                        cidade: str = None, uf: str = None) -> bool:
         """
         Adiciona um novo endereço para um cliente
         
@@ -207,6 +940,9 @@ def buscar_cliente(self, telefone: str) -> Optional[Dict]:
             numero: Número do endereço
             tipo_residencia: 'Casa', 'Apartamento' ou 'Condomínio'
             complemento: Opcional (ex: "Bloco 2 Apt 301")
+            bairro: Opcional, normalmente vindo de validar_cep
+            cidade: Opcional, normalmente vindo de validar_cep
+            uf: Opcional, sigla do estado
             
         Returns:
             True se cadastrado com sucesso, False caso contrário
@@ -215,13 +951,17 @@ def buscar_cliente(self, telefone: str) -> Optional[Dict]:
             with self._conectar() as conn:
                 conn.execute('''
                 INSERT INTO enderecos 
-                (cliente_id, apelido, cep, logradouro, numero, tipo_residencia, complemento)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
+                (cliente_id, apelido, cep, logradouro, numero, tipo_residencia,
+                 complemento, bairro, cidade, uf)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                 ''', (
                     cliente_id, apelido, cep, logradouro, 
-                    numero, tipo_residencia, complemento
+                    numero, tipo_residencia, complemento, bairro, cidade, uf
                 ))
+                dono = conn.execute("SELECT telefone FROM clientes WHERE id = ?", (cliente_id,)).fetchone()
                 conn.commit()
+                if dono:
+                    self._invalidar_cliente(dono['telefone'])  # o endereço padrão pode ter mudado
                 return True
         except sqlite3.Error as e:
             print(f"Erro ao adicionar endereço: {e}")
@@ -229,9 +969,10 @@ def buscar_cliente(self, telefone: str) -> Optional[Dict]:
 
 
 
+    @_instrumentado
     def listar_enderecos(self, cliente_id: int) -> List[Dict]:
         try:
-            with self._conectar() as conn:
+            with self._conectar_leitura() as conn:
                 cursor = conn.execute(
                     "SELECT * FROM enderecos WHERE cliente_id = ? ORDER BY apelido",
                     (cliente_id,)
@@ -242,9 +983,10 @@ def buscar_cliente(self, telefone: str) -> Optional[Dict]:
             return []
 
     # --- CARDÁPIO ---
+    @_instrumentado
     def buscar_cardapio(self) -> List[Dict]:
         try:
-            with self._conectar() as conn:
+            with self._conectar_leitura() as conn:
                 cursor = conn.execute('''
                 SELECT p.id, p.nome, p.descricao, p.ingredientes, 
                        c.nome as categoria, p.disponivel
@@ -258,9 +1000,314 @@ def buscar_cliente(self, telefone: str) -> Optional[Dict]:
             print(f"Erro ao buscar cardápio: {e}")
             return []
 
-    def buscar_precos_pizza(self, pizza_id: int) -> List[Dict]:
+    @_instrumentado
+    def buscar_cardapio_completo(self) -> List[Dict]:
+        """
+        Retorna as pizzas disponíveis com categoria e preços, numa única consulta.
+
+        O resultado fica em memória e só é recarregado depois de uma chamada a
+        invalidar_cardapio(); enquanto isso, nenhuma consulta é feita ao banco.
+        A lista retornada é compartilhada e não deve ser alterada.
+
+        Returns:
+            Lista de pizzas, cada uma com as chaves 'precos' (lista de {'tamanho', 'valor'})
+            e 'apelidos' (lista de textos)
+        """
+        cache = self._cache_cardapio
+        if cache is not None and cache[0] == self._versao_cardapio:
+            return cache[1]
+
+        with self._lock_cardapio:
+            versao = self._versao_cardapio
+            cache = self._cache_cardapio
+            if cache is not None and cache[0] == versao:
+                return cache[1]
+            try:
+                with self._conectar_leitura() as conn:
+                    cursor = conn.execute('''
+                    SELECT p.id, p.nome, p.descricao, p.ingredientes,
+                           c.nome as categoria, p.disponivel,
+                           pr.tamanho, pr.valor,
+                           (SELECT group_concat(a.apelido, char(31)) FROM pizzas_apelidos a
+                            WHERE a.pizza_id = p.id) as apelidos
+                    FROM pizzas p
+                    JOIN categorias c ON p.categoria_id = c.id
+                    LEFT JOIN precos pr ON pr.pizza_id = p.id
+                    WHERE p.disponivel = 1
+                    ORDER BY c.nome, p.nome,
+                             CASE pr.tamanho WHEN 'P' THEN 1 WHEN 'M' THEN 2 ELSE 3 END
+                    ''')
+                    pizzas: List[Dict] = []
+                    atual = None
+                    for row in cursor:
+                        if atual is None or atual['id'] != row['id']:
+                            atual = {
+                                'id': row['id'],
+                                'nome': row['nome'],
+                                'descricao': row['descricao'],
+                                'ingredientes': row['ingredientes'],
+                                'categoria': row['categoria'],
+                                'disponivel': row['disponivel'],
+                                'apelidos': row['apelidos'].split('\x1f') if row['apelidos'] else [],
+                                'precos': []
+                            }
+                            pizzas.append(atual)
+                        if row['tamanho'] is not None:
+                            atual['precos'].append({'tamanho': row['tamanho'], 'valor': row['valor']})
+            except sqlite3.Error as e:
+                print(f"Erro ao buscar cardápio completo: {e}")
+                return []
+
+            self._cache_cardapio = (versao, pizzas)
+            return pizzas
+
+    @property
+    def versao_cardapio(self) -> int:
+        """Contador incrementado a cada alteração de pizzas, preços ou disponibilidade."""
+        return self._versao_cardapio
+
+    def invalidar_cardapio(self) -> None:
+        """
+        Descarta o cardápio em memória; a próxima leitura recarrega do banco.
+        Alterações feitas por outros processos (reset.py, Pizzas.py, outro worker)
+        chegam aqui pela thread de sincronização (intervalo_sincronizacao).
+        """
+        with self._lock_cardapio:
+            self._versao_cardapio += 1
+
+    def _confirmar_cardapio(self, conn: sqlite3.Connection) -> None:
+        """
+        Faz o commit de uma alteração do cardápio e invalida o cache uma vez.
+        A versão de `versoes` deste commit fica registrada, então a thread de
+        sincronização não invalida de novo por causa dele.
+        """
+        with self._lock_cardapio:
+            versao = self._ler_versao_cardapio(conn)
+            conn.commit()
+            self._versao_cardapio_banco = max(self._versao_cardapio_banco, versao)
+            self._versao_cardapio += 1
+
+    @_instrumentado
+    def atualizar_preco(self, pizza_id: int, tamanho: str, valor: float) -> bool:
+        """Define o preço de uma pizza num tamanho e invalida o cardápio em memória."""
+        try:
+            with self._conectar() as conn:
+                conn.execute('''
+                INSERT INTO precos (pizza_id, tamanho, valor) VALUES (?, ?, ?)
+                ON CONFLICT (pizza_id, tamanho) DO UPDATE SET valor = excluded.valor
+                ''', (pizza_id, tamanho, valor))
+                self._confirmar_cardapio(conn)
+            return True
+        except sqlite3.Error as e:
+            print(f"Erro ao atualizar preço: {e}")
+            return False
+
+    @_instrumentado
+    def definir_disponibilidade(self, pizza_id: int, disponivel: bool) -> bool:
+        """Liga ou desliga uma pizza no cardápio e invalida o cardápio em memória."""
         try:
             with self._conectar() as conn:
+                conn.execute(
+                    "UPDATE pizzas SET disponivel = ? WHERE id = ?",
+                    (1 if disponivel else 0, pizza_id)
+                )
+                self._confirmar_cardapio(conn)
+            return True
+        except sqlite3.Error as e:
+            print(f"Erro ao atualizar disponibilidade: {e}")
+            return False
+
+    @_instrumentado
+    def adicionar_apelido_pizza(self, pizza_id: int, apelido: str) -> bool:
+        """Cadastra outro nome pelo qual os clientes pedem a pizza; invalida o cardápio."""
+        try:
+            with self._conectar() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO pizzas_apelidos (apelido, pizza_id) VALUES (?, ?)",
+                    (apelido.strip(), pizza_id)
+                )
+                self._confirmar_cardapio(conn)
+            return True
+        except sqlite3.Error as e:
+            print(f"Erro ao adicionar apelido: {e}")
+            return False
+
+    @_instrumentado
+    def importar_cardapio(self, origem: Union[str, Iterable[Dict]], desativar_ausentes: bool = True,
+                          simular: bool = False, lote: int = 500) -> Optional[Dict]:
+        """
+        Importa um cardápio inteiro numa única transação.
+
+        Os itens são lidos em fluxo e gravados em lotes com executemany: só
+        categorias novas e pizzas e preços que mudaram são escritos. Pizzas são
+        identificadas pelo nome; tamanhos ausentes do arquivo mantêm o preço
+        atual. Com versoes.em_lote ligado durante a transação, os triggers não
+        contam cada linha: a versão do cardápio sobe uma vez no fim, e o
+        cardápio em memória é invalidado uma única vez.
+
+        Args:
+            origem: Caminho de um arquivo (ver ImportacaoCardapio) ou itens já lidos
+            desativar_ausentes: Desativa as pizzas disponíveis que não estão no arquivo
+            simular: Calcula o relatório e desfaz a transação
+            lote: Itens por executemany
+
+        Returns:
+            Relatório com adicionadas, alteradas ({'nome', 'mudancas': {campo: [antes,
+            depois]}}), desativadas, inalteradas (contagem) e ignoradas ({'linha',
+            'erro'}), ou None se a importação falhar e nada for gravado
+        """
+        itens = ler_cardapio(origem) if isinstance(origem, str) else origem
+        relatorio = {'adicionadas': [], 'alteradas': [], 'desativadas': [], 'inalteradas': 0,
+                     'ignoradas': [], 'simulado': simular}
+        try:
+            with self._conectar() as conn:
+                # O lock de escrita vem antes da leitura do cardápio atual, base do relatório
+                conn.execute("BEGIN IMMEDIATE")
+                conn.execute("UPDATE versoes SET em_lote = 1 WHERE nome = 'cardapio'")
+                atuais = {row['nome']: dict(row) for row in conn.execute('''
+                SELECT p.id, p.nome, p.descricao, p.ingredientes, c.nome AS categoria, p.disponivel
+                FROM pizzas p JOIN categorias c ON c.id = p.categoria_id
+                ''')}
+                precos_atuais: Dict[int, Dict[str, float]] = {}
+                for row in conn.execute("SELECT pizza_id, tamanho, valor FROM precos"):
+                    precos_atuais.setdefault(row['pizza_id'], {})[row['tamanho']] = row['valor']
+                categorias = {row[0] for row in conn.execute("SELECT nome FROM categorias")}
+                vistos = set()
+
+                itens = iter(itens)
+                while True:
+                    bloco = list(islice(itens, lote))
+                    if not bloco:
+                        break
+                    novas_categorias, pizzas, precos = [], [], []
+                    for bruto in bloco:
+                        linha = bruto.get('linha') if isinstance(bruto, dict) else None
+                        try:
+                            item = normalizar_item(bruto)
+                        except ValueError as e:
+                            relatorio['ignoradas'].append({'linha': linha, 'erro': str(e)})
+                            continue
+                        nome = item['nome']
+                        if nome in vistos:
+                            relatorio['ignoradas'].append({'linha': linha, 'erro': f"pizza repetida: {nome}"})
+                            continue
+                        vistos.add(nome)
+                        if item['categoria'] not in categorias:
+                            categorias.add(item['categoria'])
+                            novas_categorias.append((item['categoria'],))
+
+                        atual = atuais.get(nome)
+                        anteriores = precos_atuais.get(atual['id'], {}) if atual else {}
+                        mudancas = {
+                            campo: [atual[campo], item[campo]]
+                            for campo in ('descricao', 'ingredientes', 'categoria', 'disponivel')
+                            if atual and atual[campo] != item[campo]
+                        }
+                        if atual is None or mudancas:
+                            pizzas.append((nome, item['descricao'], item['ingredientes'],
+                                           item['categoria'], item['disponivel']))
+                        for tamanho, valor in item['precos'].items():
+                            if anteriores.get(tamanho) != valor:
+                                precos.append((nome, tamanho, valor))
+                                if atual:
+                                    mudancas[f'preco_{tamanho}'] = [anteriores.get(tamanho), valor]
+
+                        if atual is None:
+                            relatorio['adicionadas'].append(nome)
+                            continue
+                        desativada = mudancas.get('disponivel') == [1, 0]
+                        if desativada:
+                            relatorio['desativadas'].append(nome)
+                            del mudancas['disponivel']
+                        if mudancas:
+                            relatorio['alteradas'].append({'nome': nome, 'mudancas': mudancas})
+                        elif not desativada:
+                            relatorio['inalteradas'] += 1
+
+                    conn.executemany(
+                        "INSERT INTO categorias (nome) VALUES (?) ON CONFLICT (nome) DO NOTHING",
+                        novas_categorias
+                    )
+                    conn.executemany('''
+                    INSERT INTO pizzas (nome, descricao, ingredientes, categoria_id, disponivel)
+                    VALUES (?, ?, ?, (SELECT id FROM categorias WHERE nome = ?), ?)
+                    ON CONFLICT (nome) DO UPDATE SET
+                        descricao = excluded.descricao,
+                        ingredientes = excluded.ingredientes,
+                        categoria_id = excluded.categoria_id,
+                        disponivel = excluded.disponivel
+                    ''', pizzas)
+                    conn.executemany('''
+                    INSERT INTO precos (pizza_id, tamanho, valor)
+                    VALUES ((SELECT id FROM pizzas WHERE nome = ?), ?, ?)
+                    ON CONFLICT (pizza_id, tamanho) DO UPDATE SET valor = excluded.valor
+                    ''', precos)
+
+                if desativar_ausentes:
+                    ausentes = [nome for nome, atual in atuais.items()
+                                if atual['disponivel'] and nome not in vistos]
+                    conn.executemany("UPDATE pizzas SET disponivel = 0 WHERE nome = ?",
+                                     [(nome,) for nome in ausentes])
+                    relatorio['desativadas'].extend(ausentes)
+
+                if simular:
+                    conn.rollback()
+                    return relatorio
+                alterado = bool(relatorio['adicionadas'] or relatorio['alteradas'] or relatorio['desativadas'])
+                conn.execute(
+                    "UPDATE versoes SET em_lote = 0, versao = versao + ? WHERE nome = 'cardapio'",
+                    (1 if alterado else 0,)
+                )
+                if alterado:
+                    self._confirmar_cardapio(conn)
+                else:
+                    conn.commit()
+        except (sqlite3.Error, ValueError, OSError) as e:
+            print(f"Erro ao importar cardápio: {e}")
+            return None
+        return relatorio
+
+    @_instrumentado
+    def pesquisar_pizzas(self, termo: str, limite: int = 5, deslocamento: int = 0) -> List[Dict]:
+        """
+        Busca pizzas disponíveis por nome, descrição ou ingredientes.
+
+        Ignora acentos e maiúsculas, e cada palavra casa também como prefixo
+        ("calab" encontra "Calabresa"). Resultados ordenados por relevância,
+        com o nome pesando mais que os ingredientes e a descrição.
+
+        Args:
+            termo: Texto digitado pelo cliente
+            limite: Máximo de resultados
+            deslocamento: Quantos resultados pular (paginação)
+
+        Returns:
+            Lista de pizzas com id, nome, descricao, ingredientes e categoria
+        """
+        palavras = re.findall(r'\w+', termo)
+        if not palavras:
+            return []
+        consulta = ' '.join(f'"{palavra}"*' for palavra in palavras)
+        try:
+            with self._conectar_leitura() as conn:
+                cursor = conn.execute('''
+                SELECT p.id, p.nome, p.descricao, p.ingredientes, c.nome as categoria
+                FROM pizzas_busca b
+                JOIN pizzas p ON p.id = b.rowid
+                JOIN categorias c ON c.id = p.categoria_id
+                WHERE pizzas_busca MATCH ? AND p.disponivel = 1
+                ORDER BY bm25(pizzas_busca, 10.0, 1.0, 3.0)
+                LIMIT ? OFFSET ?
+                ''', (consulta, limite, deslocamento))
+                return [dict(row) for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            print(f"Erro ao pesquisar pizzas: {e}")
+            return []
+
+    @_instrumentado
+    def buscar_precos_pizza(self, pizza_id: int) -> List[Dict]:
+        try:
+            with self._conectar_leitura() as conn:
                 cursor = conn.execute(
                     "SELECT tamanho, valor FROM precos WHERE pizza_id = ?",
                     (pizza_id,)
@@ -271,6 +1318,87 @@ def buscar_cliente(self, telefone: str) -> Optional[Dict]:
             return []
 
     # --- PEDIDOS ---
+    @_instrumentado
+    def fazer_pedido(self, cliente_id: int, endereco_id: int, itens: List[Dict],
+                     forma_pagamento: Optional[str] = None, troco_para: float = 0,
+                     observacoes: Optional[str] = None) -> Optional[int]:
+        """
+        Registra um pedido completo numa única transação.
+
+        Os preços de todos os itens são buscados numa só consulta, os itens são
+        inseridos com executemany e o valor total é gravado uma única vez.
+
+        Args:
+            cliente_id: ID do cliente
+            endereco_id: ID do endereço de entrega
+            itens: Lista de dicionários com pizza_id, tamanho, quantidade e,
+                opcionalmente, observacoes
+            forma_pagamento: 'Dinheiro', 'Cartão' ou 'PIX'
+            troco_para: Valor para troco, se pagamento em dinheiro
+            observacoes: Observações gerais do pedido
+
+        Returns:
+            ID do pedido criado ou None se algum item for inválido ou houver erro
+        """
+        if not itens:
+            return None
+
+        chaves = {(item['pizza_id'], item['tamanho']) for item in itens}
+        marcadores = ', '.join(['(?, ?)'] * len(chaves))
+        parametros = [valor for chave in chaves for valor in chave]
+
+        try:
+            with self._conectar() as conn:
+                cursor = conn.execute(f'''
+                SELECT pizza_id, tamanho, valor FROM precos
+                WHERE (pizza_id, tamanho) IN (VALUES {marcadores})
+                ''', parametros)
+                precos = {(row['pizza_id'], row['tamanho']): row['valor'] for row in cursor}
+                if len(precos) != len(chaves):
+                    print(f"Erro ao fazer pedido: preço não encontrado para {chaves - precos.keys()}")
+                    return None
+
+                valor_total = sum(
+                    precos[(item['pizza_id'], item['tamanho'])] * item['quantidade']
+                    for item in itens
+                )
+                cursor = conn.execute('''
+                INSERT INTO pedidos
+                (cliente_id, endereco_id, forma_pagamento, troco_para, valor_total, observacoes)
+                VALUES (?, ?, ?, ?, ?, ?)
+                RETURNING id, date(data_pedido)
+                ''', (cliente_id, endereco_id, forma_pagamento, troco_para, valor_total, observacoes))
+                pedido_id, dia = cursor.fetchone()
+
+                conn.executemany('''
+                INSERT INTO itens_pedido
+                (pedido_id, pizza_id, tamanho, quantidade, valor_unitario, observacoes)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ''', [
+                    (pedido_id, item['pizza_id'], item['tamanho'], item['quantidade'],
+                     precos[(item['pizza_id'], item['tamanho'])], item.get('observacoes'))
+                    for item in itens
+                ])
+                self._atualizar_resumo_vendas(conn, [
+                    (dia, item['pizza_id'], item['tamanho'], item['quantidade'],
+                     precos[(item['pizza_id'], item['tamanho'])] * item['quantidade'])
+                    for item in itens
+                ])
+                self._atualizar_resumo_status(conn, [(dia, 'Recebido', 1, valor_total)])
+                eventos = [{
+                    'pedido_id': pedido_id, 'status_anterior': None, 'status': 'Recebido',
+                    'momento': time.time(), 'cliente_id': cliente_id, 'valor_total': valor_total
+                }]
+                self._registrar_eventos(conn, eventos)
+                conn.commit()
+        except sqlite3.Error as e:
+            print(f"Erro ao fazer pedido: {e}")
+            return None
+
+        self._notificar_status(eventos)
+        return pedido_id
+
+    @_instrumentado
     def criar_pedido(self, cliente_id: int, endereco_id: int, 
                     forma_pagamento: str, troco_para: float = 0) -> Optional[int]:
         try:
@@ -289,6 +1417,7 @@ def buscar_cliente(self, telefone: str) -> Optional[Dict]:
             print(f"Erro ao criar pedido: {e}")
             return None
 
+    @_instrumentado
     def adicionar_item_pedido(self, pedido_id: int, pizza_id: int, 
                             tamanho: str, quantidade: int, 
                             observacoes: str = None) -> bool:
@@ -332,45 +1461,98 @@ def buscar_cliente(self, telefone: str) -> Optional[Dict]:
             print(f"Erro ao buscar valor: {e}")
             return None
 
-    def buscar_pedidos_cliente(self, cliente_id: int, limit: int = 5) -> List[Dict]:
+    @_instrumentado
+    def buscar_pedidos_cliente(self, cliente_id: int, limit: int = 5, offset: int = 0) -> List[Dict]:
+        """
+        Histórico do cliente, do pedido mais recente para o mais antigo (o id
+        desempata pedidos do mesmo segundo, para as páginas não repetirem nem pularem).
+
+        Com banco de arquivo, as duas origens são intercaladas pela mesma ordem:
+        o arquivamento segue o status, então um pedido antigo que nunca foi
+        entregue continua no banco principal, atrás de pedidos já arquivados.
+        Cada lado lê no máximo offset + limit linhas pelo seu índice
+        (idx_pedidos_cliente_pagina).
+
+        Args:
+            cliente_id: ID do cliente
+            limit: Pedidos por página
+            offset: Pedidos a pular (página * limit)
+        """
         try:
-            with self._conectar() as conn:
+            with self._conectar_leitura() as conn:
+                if not self.banco_arquivo:
+                    cursor = conn.execute('''
+                    SELECT p.id, p.data_pedido, p.status, p.valor_total,
+                           e.apelido as endereco_apelido
+                    FROM pedidos p
+                    JOIN enderecos e ON p.endereco_id = e.id
+                    WHERE p.cliente_id = ?
+                    ORDER BY p.data_pedido DESC, p.id DESC
+                    LIMIT ? OFFSET ?
+                    ''', (cliente_id, limit, offset))
+                    return [dict(row) for row in cursor.fetchall()]
+
+                # Um pedido no meio do arquivamento está nos dois: vale o do principal
                 cursor = conn.execute('''
-                SELECT p.id, p.data_pedido, p.status, p.valor_total,
-                       e.apelido as endereco_apelido
-                FROM pedidos p
-                JOIN enderecos e ON p.endereco_id = e.id
-                WHERE p.cliente_id = ?
-                ORDER BY p.data_pedido DESC
-                LIMIT ?
-                ''', (cliente_id, limit))
-                
+                SELECT * FROM (
+                    SELECT * FROM (
+                        SELECT p.id, p.data_pedido, p.status, p.valor_total,
+                               e.apelido as endereco_apelido
+                        FROM main.pedidos p
+                        JOIN main.enderecos e ON p.endereco_id = e.id
+                        WHERE p.cliente_id = ?
+                        ORDER BY p.data_pedido DESC, p.id DESC
+                        LIMIT ?
+                    )
+                    UNION ALL
+                    SELECT * FROM (
+                        SELECT p.id, p.data_pedido, p.status, p.valor_total,
+                               e.apelido as endereco_apelido
+                        FROM arquivo.pedidos p
+                        JOIN main.enderecos e ON p.endereco_id = e.id
+                        WHERE p.cliente_id = ?
+                          AND NOT EXISTS (SELECT 1 FROM main.pedidos q WHERE q.id = p.id)
+                        ORDER BY p.data_pedido DESC, p.id DESC
+                        LIMIT ?
+                    )
+                )
+                ORDER BY data_pedido DESC, id DESC
+                LIMIT ? OFFSET ?
+                ''', (cliente_id, offset + limit, cliente_id, offset + limit, limit, offset))
                 return [dict(row) for row in cursor.fetchall()]
         except sqlite3.Error as e:
             print(f"Erro ao buscar pedidos: {e}")
             return []
 
+    @_instrumentado
     def buscar_detalhes_pedido(self, pedido_id: int) -> Optional[Dict]:
+        esquemas = ('main', 'arquivo') if self.banco_arquivo else ('main',)
         try:
-            with self._conectar() as conn:
-                # Informações básicas do pedido
-                cursor = conn.execute('''
-                SELECT p.*, c.nome as cliente_nome, 
-                       e.apelido as endereco_apelido, e.logradouro, e.numero,
-                       e.complemento, e.bairro, e.cidade, e.uf, e.cep
-                FROM pedidos p
-                JOIN clientes c ON p.cliente_id = c.id
-                JOIN enderecos e ON p.endereco_id = e.id
-                WHERE p.id = ?
-                ''', (pedido_id,))
-                
-                pedido = dict(cursor.fetchone())
+            with self._conectar_leitura() as conn:
+                for esquema in esquemas:
+                    # Informações básicas do pedido
+                    cursor = conn.execute(f'''
+                    SELECT p.*, c.nome as cliente_nome, 
+                           e.apelido as endereco_apelido, e.logradouro, e.numero,
+                           e.complemento, e.bairro, e.cidade, e.uf, e.cep
+                    FROM {esquema}.pedidos p
+                    JOIN main.clientes c ON p.cliente_id = c.id
+                    JOIN main.enderecos e ON p.endereco_id = e.id
+                    WHERE p.id = ?
+                    ''', (pedido_id,))
+                    
+                    resultado = cursor.fetchone()
+                    if resultado is not None:
+                        break
+                else:
+                    return None
+                pedido = dict(resultado)
                 
                 # Itens do pedido
-                cursor = conn.execute('''
+                cursor = conn.execute(f'''
                 SELECT i.*, p.nome as pizza_nome
-                FROM itens_pedido i
-                JOIN pizzas p ON i.pizza_id = p.id
+                FROM {esquema}.itens_pedido i
+                JOIN main.pizzas p ON i.pizza_id = p.id
                 WHERE i.pedido_id = ?
                 ''', (pedido_id,))
                 
@@ -380,37 +1562,458 @@ def buscar_cliente(self, telefone: str) -> Optional[Dict]:
             print(f"Erro ao buscar detalhes: {e}")
             return None
 
+    @_instrumentado
+    def arquivar_pedidos(self, dias: int = 90, lote: int = 500) -> Optional[int]:
+        """
+        Move um lote de pedidos entregues há mais de `dias` dias, com seus
+        itens, para o banco de arquivo.
+
+        Cada lote é uma transação curta, para não segurar o lock de escrita;
+        chame de novo até retornar 0 (ver Arquivamento.ArquivadorPedidos).
+        Com WAL o commit não é atômico entre os dois arquivos: se o processo
+        cair no meio, o pedido fica nos dois e o próximo lote termina a mudança.
+        Os resumos de vendas não mudam.
+
+        Returns:
+            Quantidade de pedidos movidos, ou None sem banco de arquivo ou em caso de erro
+        """
+        if not self.banco_arquivo:
+            return None
+        colunas_pedido = ', '.join(COLUNAS_PEDIDO)
+        colunas_item = ', '.join(COLUNAS_ITEM)
+        try:
+            with self._conectar() as conn:
+                ids = [row[0] for row in conn.execute('''
+                SELECT id FROM pedidos
+                WHERE status = 'Entregue' AND data_pedido < datetime('now', ?)
+                ORDER BY data_pedido
+                LIMIT ?
+                ''', (f'-{int(dias)} days', lote))]
+                if not ids:
+                    return 0
+                marcadores = ', '.join('?' * len(ids))
+                conn.execute(f'''
+                INSERT OR IGNORE INTO arquivo.pedidos ({colunas_pedido})
+                SELECT {colunas_pedido} FROM main.pedidos WHERE id IN ({marcadores})
+                ''', ids)
+                conn.execute(f'''
+                INSERT OR IGNORE INTO arquivo.itens_pedido ({colunas_item})
+                SELECT {colunas_item} FROM main.itens_pedido WHERE pedido_id IN ({marcadores})
+                ''', ids)
+                conn.execute(f"DELETE FROM main.itens_pedido WHERE pedido_id IN ({marcadores})", ids)
+                conn.execute(f"DELETE FROM main.pedidos WHERE id IN ({marcadores})", ids)
+                conn.commit()
+                return len(ids)
+        except sqlite3.Error as e:
+            print(f"Erro ao arquivar pedidos: {e}")
+            return None
+
     # --- UTILITÁRIOS ---
+    @_instrumentado
     def validar_cep(self, cep: str) -> Optional[Dict]:
+        """
+        Consulta um CEP, passando pelo índice offline e por dois níveis de cache
+        antes do serviço remoto.
+
+        A ordem é: índice mapeado em memória (se configurado), cache em memória
+        (LRU), tabela cep_cache e, por último, o serviço remoto. CEPs inexistentes também são guardados (cache negativo)
+        com validade menor; falhas de rede não são guardadas.
+
+        Args:
+            cep: CEP com ou sem pontuação
+
+        Returns:
+            Dicionário com os dados do endereço ou None se inválido/indisponível
+        """
+        cep = ''.join(filter(str.isdigit, cep))
+        if len(cep) != 8:
+            return None
+
+        if self._indice_cep is not None:
+            dados = self._indice_cep.buscar(cep)
+            if dados is not None:
+                self._estatisticas_cep['indice'] += 1
+                return dados
+
+        dados = self._cache_cep.obter(cep)
+        if dados is not AUSENTE:
+            self._estatisticas_cep['memoria'] += 1
+            return dados
+
+        dados = self._buscar_cep_cache(cep)
+        if dados is not AUSENTE:
+            self._estatisticas_cep['banco'] += 1
+            return dados
+
+        dados = self._consultar_cep_remoto(cep)
+        if dados is AUSENTE:
+            self._estatisticas_cep['erros'] += 1
+            return None
+        self._estatisticas_cep['remoto'] += 1
+        self._guardar_cep_cache(cep, dados)
+        return dados
+
+    def _buscar_cep_cache(self, cep: str):
+        try:
+            with self._conectar() as conn:
+                resultado = conn.execute(
+                    "SELECT dados, atualizado_em FROM cep_cache WHERE cep = ?",
+                    (cep,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Erro ao buscar CEP em cache: {e}")
+            return AUSENTE
+
+        if resultado is None:
+            return AUSENTE
+        dados = json.loads(resultado['dados']) if resultado['dados'] else None
+        ttl = self.ttl_cep if dados else self.ttl_cep_invalido
+        idade = time.time() - resultado['atualizado_em']
+        if idade >= ttl:
+            return AUSENTE
+        self._cache_cep.definir(cep, dados, ttl=ttl - idade)
+        return dados
+
+    def _guardar_cep_cache(self, cep: str, dados: Optional[Dict]) -> None:
+        self._cache_cep.definir(cep, dados, ttl=self.ttl_cep if dados else self.ttl_cep_invalido)
+        try:
+            with self._conectar() as conn:
+                conn.execute('''
+                INSERT OR REPLACE INTO cep_cache (cep, dados, atualizado_em)
+                VALUES (?, ?, ?)
+                ''', (cep, json.dumps(dados, ensure_ascii=False) if dados else None, time.time()))
+                conn.commit()
+        except sqlite3.Error as e:
+            print(f"Erro ao guardar CEP em cache: {e}")
+
+    def _consultar_cep_remoto(self, cep: str):
+        """Retorna os dados do CEP, None se o CEP não existe ou AUSENTE em caso de falha."""
+        import requests  # importado só quando há consulta remota; acelera o início
+
+        if self._sessao_http is None:
+            sessao = requests.Session()
+            adaptador = requests.adapters.HTTPAdapter(
+                pool_connections=1, pool_maxsize=self.tamanho_pool, max_retries=0
+            )
+            sessao.mount('http://', adaptador)
+            sessao.mount('https://', adaptador)
+            self._sessao_http = sessao
+
         try:
-            response = requests.get(f'https://viacep.com.br/ws/{cep}/json/')
+            response = self._sessao_http.get(self.url_cep.format(cep=cep), timeout=self.timeout_cep)
             if response.status_code == 200:
                 dados = response.json()
                 return dados if not dados.get('erro') else None
-        except requests.RequestException as e:
+            if response.status_code in (400, 404):
+                return None
+        except (requests.RequestException, ValueError) as e:
             print(f"Erro ao validar CEP: {e}")
-        return None
+        return AUSENTE
+
+    def estatisticas_cep(self) -> Dict[str, float]:
+        """Retorna de onde vieram as respostas de validar_cep e a taxa de acerto do cache."""
+        estatisticas = dict(self._estatisticas_cep)
+        total = sum(estatisticas.values())
+        acertos = estatisticas['indice'] + estatisticas['memoria'] + estatisticas['banco']
+        estatisticas['taxa_acerto'] = acertos / total if total else 0.0
+        return estatisticas
 
     def atualizar_status_pedido(self, pedido_id: int, novo_status: str) -> bool:
-        status_validos = {'Recebido', 'Confirmado', 'Em preparo', 'Assando', 'Saiu para entrega', 'Entregue'}
-        if novo_status not in status_validos:
-            return False
-            
+        return self.atualizar_status_pedidos({pedido_id: novo_status}) is not None
+
+    @_instrumentado
+    def atualizar_status_pedidos(self, transicoes: Dict[int, str],
+                                 apenas_de: Optional[Iterable[str]] = None) -> Optional[List[int]]:
+        """
+        Aplica várias mudanças de status numa única transação.
+
+        Depois do commit, os ouvintes registrados com adicionar_ouvinte_status
+        recebem um evento por pedido que de fato mudou de status.
+
+        Args:
+            transicoes: Dicionário {pedido_id: novo_status}
+            apenas_de: Status atuais aceitos; se algum pedido não existir ou
+                estiver em outro status, nada é alterado (lote tudo ou nada)
+
+        Returns:
+            IDs dos pedidos alterados, ou None se algum status for inválido,
+            algum pedido não estiver num status de `apenas_de` ou houver erro
+        """
+        if not transicoes:
+            return []
+        if any(status not in STATUS_PEDIDO for status in transicoes.values()):
+            return None
+        apenas_de = set(apenas_de) if apenas_de is not None else None
+
+        marcadores = ', '.join('?' * len(transicoes))
         try:
             with self._conectar() as conn:
-                conn.execute(
+                # Lock de escrita antes de ler o status anterior: senão duas escritas
+                # concorrentes leem o mesmo status e aplicam a mesma variação ao
+                # resumo_status_diario duas vezes (e dois despachos levam o mesmo pedido)
+                conn.execute("BEGIN IMMEDIATE")
+                linhas = conn.execute(f'''
+                SELECT id, status, date(data_pedido) AS dia, valor_total
+                FROM pedidos WHERE id IN ({marcadores})
+                ''', list(transicoes)).fetchall()
+                if apenas_de is not None and (
+                        len(linhas) != len(transicoes) or any(row['status'] not in apenas_de for row in linhas)):
+                    conn.rollback()
+                    return None
+                alterados = [row for row in linhas if row['status'] != transicoes[row['id']]]
+                eventos = [
+                    {'pedido_id': row['id'], 'status_anterior': row['status'],
+                     'status': transicoes[row['id']], 'momento': time.time()}
+                    for row in alterados
+                ]
+                conn.executemany(
                     "UPDATE pedidos SET status = ? WHERE id = ?",
-                    (novo_status, pedido_id)
+                    [(evento['status'], evento['pedido_id']) for evento in eventos]
                 )
+                self._atualizar_resumo_status(conn, [
+                    linha
+                    for row in alterados
+                    for linha in (
+                        (row['dia'], row['status'], -1, -row['valor_total']),
+                        (row['dia'], transicoes[row['id']], 1, row['valor_total'])
+                    )
+                ])
+                self._registrar_eventos(conn, eventos)
                 conn.commit()
-                return True
         except sqlite3.Error as e:
             print(f"Erro ao atualizar status: {e}")
+            return None
+
+        self._notificar_status(eventos)
+        return [evento['pedido_id'] for evento in eventos]
+
+    # --- RELATÓRIOS ---
+    def _atualizar_resumo_vendas(self, conn: sqlite3.Connection,
+                                 linhas: List[Tuple[str, int, str, int, float]]) -> None:
+        """Soma (dia, pizza_id, tamanho, quantidade, receita) em resumo_vendas_diario, na transação de `conn`."""
+        conn.executemany('''
+        INSERT INTO resumo_vendas_diario (dia, pizza_id, tamanho, quantidade, receita)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (dia, pizza_id, tamanho) DO UPDATE SET
+            quantidade = quantidade + excluded.quantidade,
+            receita = receita + excluded.receita
+        ''', linhas)
+
+    def _atualizar_resumo_status(self, conn: sqlite3.Connection,
+                                 linhas: List[Tuple[str, str, int, float]]) -> None:
+        """Soma (dia, status, pedidos, valor) em resumo_status_diario, na transação de `conn`."""
+        conn.executemany('''
+        INSERT INTO resumo_status_diario (dia, status, pedidos, valor)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (dia, status) DO UPDATE SET
+            pedidos = pedidos + excluded.pedidos,
+            valor = valor + excluded.valor
+        ''', linhas)
+
+    @_instrumentado
+    def reconstruir_resumos(self) -> bool:
+        """Recalcula os resumos a partir de pedidos e itens_pedido, numa única transação."""
+        try:
+            with self._conectar() as conn:
+                conn.execute("DELETE FROM resumo_vendas_diario")
+                conn.execute("DELETE FROM resumo_status_diario")
+                # Os mesmos comandos de preenchimento da migração 3
+                for comando in MIGRACOES[2][2:]:
+                    conn.execute(comando)
+                if self.banco_arquivo:
+                    self._somar_resumos_arquivo(conn)
+                conn.commit()
+                return True
+        except sqlite3.Error as e:
+            print(f"Erro ao reconstruir resumos: {e}")
             return False
+
+    def _somar_resumos_arquivo(self, conn: sqlite3.Connection) -> None:
+        """Acrescenta aos resumos os pedidos já movidos para o banco de arquivo."""
+        conn.execute('''
+        INSERT INTO resumo_vendas_diario (dia, pizza_id, tamanho, quantidade, receita)
+        SELECT date(p.data_pedido), i.pizza_id, i.tamanho,
+               SUM(i.quantidade), SUM(i.quantidade * i.valor_unitario)
+        FROM arquivo.itens_pedido i JOIN arquivo.pedidos p ON p.id = i.pedido_id
+        WHERE p.id NOT IN (SELECT id FROM main.pedidos)
+        GROUP BY 1, 2, 3
+        ON CONFLICT (dia, pizza_id, tamanho) DO UPDATE SET
+            quantidade = quantidade + excluded.quantidade,
+            receita = receita + excluded.receita
+        ''')
+        conn.execute('''
+        INSERT INTO resumo_status_diario (dia, status, pedidos, valor)
+        SELECT date(data_pedido), status, COUNT(*), SUM(valor_total)
+        FROM arquivo.pedidos
+        WHERE id NOT IN (SELECT id FROM main.pedidos)
+        GROUP BY 1, 2
+        ON CONFLICT (dia, status) DO UPDATE SET
+            pedidos = pedidos + excluded.pedidos,
+            valor = valor + excluded.valor
+        ''')
+
+    @_instrumentado
+    def relatorio_vendas(self, inicio: str, fim: str, limite_pizzas: int = 10) -> Optional[Dict]:
+        """
+        Relatório de vendas de um período, lido só das tabelas de resumo.
+
+        Args:
+            inicio: Primeiro dia, 'AAAA-MM-DD' (inclusive)
+            fim: Último dia, 'AAAA-MM-DD' (inclusive)
+            limite_pizzas: Quantas combinações pizza/tamanho listar em top_pizzas
+
+        Returns:
+            Dicionário com receita, pedidos, ticket_medio, por_dia, por_status
+            e top_pizzas, ou None em caso de erro
+        """
+        try:
+            with self._conectar_leitura() as conn:
+                por_dia = [dict(row) for row in conn.execute('''
+                SELECT dia, SUM(pedidos) AS pedidos, SUM(valor) AS receita
+                FROM resumo_status_diario
+                WHERE dia BETWEEN ? AND ?
+                GROUP BY dia
+                ORDER BY dia
+                ''', (inicio, fim))]
+                por_status = {row['status']: row['pedidos'] for row in conn.execute('''
+                SELECT status, SUM(pedidos) AS pedidos
+                FROM resumo_status_diario
+                WHERE dia BETWEEN ? AND ?
+                GROUP BY status
+                ''', (inicio, fim))}
+                top_pizzas = [dict(row) for row in conn.execute('''
+                SELECT r.pizza_id, p.nome, r.tamanho,
+                       SUM(r.quantidade) AS quantidade, SUM(r.receita) AS receita
+                FROM resumo_vendas_diario r
+                JOIN pizzas p ON p.id = r.pizza_id
+                WHERE r.dia BETWEEN ? AND ?
+                GROUP BY r.pizza_id, r.tamanho
+                ORDER BY quantidade DESC
+                LIMIT ?
+                ''', (inicio, fim, limite_pizzas))]
+        except sqlite3.Error as e:
+            print(f"Erro ao gerar relatório: {e}")
+            return None
+
+        pedidos = sum(dia['pedidos'] for dia in por_dia)
+        receita = sum(dia['receita'] for dia in por_dia)
+        return {
+            'inicio': inicio,
+            'fim': fim,
+            'pedidos': pedidos,
+            'receita': round(receita, 2),
+            'ticket_medio': round(receita / pedidos, 2) if pedidos else 0.0,
+            'por_dia': por_dia,
+            'por_status': {status: total for status, total in por_status.items() if total},
+            'top_pizzas': top_pizzas
+        }
+
+    @_instrumentado
+    def buscar_pedidos_ativos(self) -> List[Dict]:
+        """Pedidos ainda não entregues, do mais antigo para o mais novo."""
+        try:
+            with self._conectar() as conn:
+                cursor = conn.execute('''
+                SELECT id, cliente_id, data_pedido, status, valor_total
+                FROM pedidos
+                WHERE status != 'Entregue'
+                ORDER BY data_pedido
+                ''')
+                return [dict(row) for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            print(f"Erro ao buscar pedidos ativos: {e}")
+            return []
+
+    @_instrumentado
+    def buscar_pedidos_para_entrega(self, status: Iterable[str] = ('Assando',)) -> List[Dict]:
+        """Pedidos nos status dados com o CEP de entrega, do mais antigo para o mais novo."""
+        status = list(status)
+        try:
+            with self._conectar_leitura() as conn:
+                cursor = conn.execute(f'''
+                SELECT p.id, p.cliente_id, p.data_pedido, p.status, p.valor_total,
+                       e.cep, e.bairro
+                FROM pedidos p
+                JOIN enderecos e ON e.id = p.endereco_id
+                WHERE p.status IN ({', '.join('?' * len(status))})
+                ORDER BY p.data_pedido
+                ''', status)
+                return [dict(row) for row in cursor.fetchall()]
+        except sqlite3.Error as e:
+            print(f"Erro ao buscar pedidos para entrega: {e}")
+            return []
+
+    @_instrumentado
+    def carregar_vizinhanca_cep(self) -> Dict[str, Dict[str, float]]:
+        """Tabela vizinhanca_cep inteira: {prefixo: {vizinho: distancia_km}}."""
+        vizinhanca: Dict[str, Dict[str, float]] = {}
+        try:
+            with self._conectar_leitura() as conn:
+                for row in conn.execute("SELECT prefixo, vizinho, distancia_km FROM vizinhanca_cep"):
+                    vizinhanca.setdefault(row['prefixo'], {})[row['vizinho']] = row['distancia_km']
+        except sqlite3.Error as e:
+            print(f"Erro ao carregar vizinhança de CEP: {e}")
+        return vizinhanca
+
+    @_instrumentado
+    def importar_vizinhanca_cep(self, linhas: Iterable[Tuple[str, str, float]],
+                                simetrica: bool = True, lote: int = 1000) -> Optional[int]:
+        """
+        Grava pares (prefixo, vizinho, distancia_km) numa única transação.
+
+        Args:
+            linhas: Pares de prefixos de 5 dígitos e a distância entre eles
+            simetrica: Grava também o par invertido
+            lote: Linhas por executemany
+
+        Returns:
+            Linhas gravadas, ou None em caso de erro
+        """
+        total = 0
+        linhas = iter(linhas)
+        try:
+            with self._conectar() as conn:
+                while True:
+                    bloco = [(str(a)[:5], str(b)[:5], float(d)) for a, b, d in islice(linhas, lote)]
+                    if not bloco:
+                        break
+                    if simetrica:
+                        bloco += [(b, a, d) for a, b, d in bloco if a != b]
+                    conn.executemany('''
+                    INSERT INTO vizinhanca_cep (prefixo, vizinho, distancia_km) VALUES (?, ?, ?)
+                    ON CONFLICT (prefixo, vizinho) DO UPDATE SET distancia_km = excluded.distancia_km
+                    ''', bloco)
+                    total += len(bloco)
+                conn.commit()
+                return total
+        except (sqlite3.Error, ValueError) as e:
+            print(f"Erro ao importar vizinhança de CEP: {e}")
+            return None
+
+    def adicionar_ouvinte_status(self, callback: Callable[[List[Dict]], None]) -> None:
+        """
+        Registra `callback(eventos)`, chamado após cada commit que cria pedidos ou
+        muda status. Cada evento tem pedido_id, status_anterior (None para pedido
+        novo), status e momento (time.time()). Com intervalo_sincronizacao, as
+        mudanças feitas por outros processos também chegam, pela thread de
+        sincronização, com até um intervalo de atraso.
+        """
+        self._ouvintes_status.append(callback)
+
+    def _notificar_status(self, eventos: List[Dict]) -> None:
+        if not eventos:
+            return
+        for callback in self._ouvintes_status:
+            try:
+                callback(eventos)
+            except Exception as e:
+                print(f"Erro em ouvinte de status: {e}")
+
+    @_instrumentado
     def buscar_pizzas(self, apenas_disponiveis: bool = True) -> List[Dict]:
         """Busca todas as pizzas disponíveis no cardápio."""
         try:
-            with self._conectar() as conn:
+            with self._conectar_leitura() as conn:
                 query = '''
                 SELECT p.id, p.nome, p.descricao, p.ingredientes, 
                     c.nome as categoria, p.disponivel
@@ -425,4 +2028,18 @@ def buscar_cliente(self, telefone: str) -> Optional[Dict]:
                 return [dict(row) for row in cursor.fetchall()]
         except sqlite3.Error as e:
             print(f"Erro ao buscar pizzas: {e}")
-            return []
\ No newline at end of file
+            return []
+
+
+if __name__ == "__main__":
+    import sys
+
+    comandos = {
+        'reconstruir-resumos': lambda db: print(
+            "Resumos reconstruídos." if db.reconstruir_resumos() else "Falha ao reconstruir resumos."
+        ),
+    }
+    if len(sys.argv) < 2 or sys.argv[1] not in comandos:
+        print(f"Uso: python BancoDeDados.py <{'|'.join(comandos)}> [banco]")
+        sys.exit(1)
+    comandos[sys.argv[1]](BancoDeDados(sys.argv[2] if len(sys.argv) > 2 else 'pizzaria.db'))
@@ -1,22 +1,226 @@
-from flask import Flask, request
+import time
+_inicio_processo = time.perf_counter()
+
+import os
+from flask import Flask, request, Response, jsonify
 from twilio.twiml.messaging_response import MessagingResponse
 from BancoDeDados import BancoDeDados
-from datetime import datetime
-import re
+from Sessoes import criar_armazem
+from Cozinha import Cozinha
+from FilaMensagens import FilaMensagens, EnviadorTwilio, EnviadorMemoria
+from Metricas import REGISTRO, TIPO_CONTEUDO
+from PedidoTexto import IndiceCardapio, TAMANHOS, normalizar
+from Limitador import LimitadorTaxa
+from Arquivamento import ArquivadorPedidos
+from Entregas import DespachoEntregas
+from PrevisaoEntrega import EstimadorEntrega
+import threading
 
 app = Flask(__name__)
-db = BancoDeDados()
-db._popular_dados_iniciais()
+db = BancoDeDados(
+    os.environ.get('PIZZAP_BANCO', 'pizzaria.db'),
+    url_cep=os.environ.get('PIZZAP_URL_CEP', 'https://viacep.com.br/ws/{cep}/json/'),
+    # PIZZAP_CONSULTA_LENTA_MS liga o log de consultas lentas com EXPLAIN QUERY PLAN
+    limite_consulta_lenta=(float(os.environ['PIZZAP_CONSULTA_LENTA_MS']) / 1000
+                           if os.environ.get('PIZZAP_CONSULTA_LENTA_MS') else None),
+    log_consultas_lentas=os.environ.get('PIZZAP_LOG_CONSULTAS_LENTAS', 'consultas_lentas.log'),
+    # PIZZAP_BANCO_ARQUIVO liga o arquivamento dos pedidos entregues há PIZZAP_ARQUIVAR_DIAS
+    banco_arquivo=os.environ.get('PIZZAP_BANCO_ARQUIVO') or None,
+    # Checkpoints do WAL numa thread própria, fora das requisições (0 volta ao automático)
+    intervalo_checkpoint=float(os.environ.get('PIZZAP_CHECKPOINT_S', '1')) or None,
+    # Mudanças de status feitas por outros workers chegam à cozinha, às entregas e
+    # à previsão com até este atraso (0 desliga; só vale com um único worker)
+    intervalo_sincronizacao=float(os.environ.get('PIZZAP_SINCRONIZACAO_S', '0.5')) or None
+)
+arquivador = None
+if db.banco_arquivo:
+    arquivador = ArquivadorPedidos(db, dias=int(os.environ.get('PIZZAP_ARQUIVAR_DIAS', '90')))
+    arquivador.iniciar()
+
+# Arquivos cujo checkpoint do WAL já roda em segundo plano: fila, sessões e
+# deduplicação gravadas neles não fazem checkpoint na thread da requisição
+SEM_CHECKPOINT = db.arquivos_com_checkpoint()
+
+# Estado das conversas; com PIZZAP_SESSOES=sqlite:<arquivo> é compartilhado entre workers
+cadastro_em_andamento = criar_armazem('cadastro', sem_checkpoint=SEM_CHECKPOINT)
+login_em_andamento = criar_armazem('login', sem_checkpoint=SEM_CHECKPOINT)
+pedido_em_andamento = criar_armazem('pedido', sem_checkpoint=SEM_CHECKPOINT)
+
+# Respostas por MessageSid: uma nova tentativa do Twilio recebe a mesma resposta
+# sem reprocessar a mensagem. PIZZAP_DEDUPLICACAO=sqlite:<arquivo> compartilha
+# entre workers (sem ela, segue PIZZAP_SESSOES)
+TTL_DEDUPLICACAO = 3600
+ESPERA_DUPLICADA = 10.0  # segundos que uma repetição espera a resposta da original
+respostas_webhook = criar_armazem('respostas', os.environ.get('PIZZAP_DEDUPLICACAO'), ttl=TTL_DEDUPLICACAO,
+                                  sem_checkpoint=SEM_CHECKPOINT, renovar=False)
+cozinha = Cozinha(db)
+entregas = DespachoEntregas(
+    db,
+    capacidade=int(os.environ.get('PIZZAP_ENTREGA_CAPACIDADE', '4')),
+    espera_maxima=float(os.environ.get('PIZZAP_ENTREGA_ESPERA_MIN', '15')) * 60,
+    raio_km=float(os.environ.get('PIZZAP_ENTREGA_RAIO_KM', '2'))
+)
+estimador = EstimadorEntrega(db, paralelo=int(os.environ.get('PIZZAP_COZINHA_PARALELO', '4')))
+
+# Modo assíncrono (PIZZAP_ASSINCRONO=1): o webhook só enfileira e as respostas
+# saem pela API de mensagens do Twilio (ou ficam em memória, sem credenciais)
+fila_mensagens = None
+enviador = None
+if os.environ.get('PIZZAP_ASSINCRONO') == '1':
+    if os.environ.get('TWILIO_ACCOUNT_SID'):
+        enviador = EnviadorTwilio(
+            os.environ['TWILIO_ACCOUNT_SID'],
+            os.environ['TWILIO_AUTH_TOKEN'],
+            os.environ['TWILIO_NUMERO'],
+            url_api=os.environ.get('TWILIO_API_URL', 'https://api.twilio.com')
+        )
+    else:
+        enviador = EnviadorMemoria()
+    caminho_fila = os.environ.get('PIZZAP_FILA', db.nome_banco)
+    fila_mensagens = FilaMensagens(
+        caminho_fila,
+        lambda numero, corpo: processar_mensagem_assincrona(numero, corpo),
+        enviador,
+        workers=int(os.environ.get('PIZZAP_WORKERS_FILA', '4')),
+        checkpoint_automatico=os.path.abspath(caminho_fila) not in SEM_CHECKPOINT
+    )
+    fila_mensagens.iniciar()
+
+# Limite de taxa (mensagens/s por número e no total) e carga máxima: profundidade
+# da fila no modo assíncrono ou requisições simultâneas no síncrono
+limitador = LimitadorTaxa(
+    taxa_numero=float(os.environ.get('PIZZAP_TAXA_NUMERO', '1')),
+    rajada_numero=float(os.environ.get('PIZZAP_RAJADA_NUMERO', '5')),
+    taxa_global=float(os.environ.get('PIZZAP_TAXA_GLOBAL', '50')),
+    rajada_global=float(os.environ.get('PIZZAP_RAJADA_GLOBAL', '100'))
+)
+CARGA_MAXIMA = int(os.environ.get('PIZZAP_CARGA_MAXIMA', '200' if fila_mensagens else '32'))
+# Acima de CARGA_MAXIMA o modo assíncrono ainda aceita mensagens na fila (respondidas
+# depois) até esta profundidade; só então pede para o cliente tentar de novo
+ADIAMENTO_MAXIMO = int(os.environ.get('PIZZAP_ADIAMENTO_MAXIMO', str(CARGA_MAXIMA * 4)))
+
+# Orçamento de inicialização do worker, em ms (importações + banco + sessões)
+ORCAMENTO_INICIO_MS = float(os.environ.get('PIZZAP_ORCAMENTO_INICIO_MS', '500'))
+
+def relatorio_inicializacao():
+    relatorio = {f"banco.{etapa}": ms for etapa, ms in db.relatorio_inicializacao.items()}
+    relatorio['total'] = (_tempo_pronto - _inicio_processo) * 1000
+    return relatorio
+
+_tempo_pronto = time.perf_counter()
+_relatorio = relatorio_inicializacao()
+print("Inicialização: " + ", ".join(f"{etapa}={ms:.1f}ms" for etapa, ms in _relatorio.items()))
+if _relatorio['total'] > ORCAMENTO_INICIO_MS:
+    print(f"⚠️ Inicialização levou {_relatorio['total']:.1f}ms, acima do orçamento de {ORCAMENTO_INICIO_MS:.0f}ms")
+
+# --- MÉTRICAS ---
+duracao_webhook = REGISTRO.histograma(
+    'pizzap_webhook_duracao_segundos', 'Tempo total de resposta do /whatsapp', ('modo',))
+duracao_conversa = REGISTRO.histograma(
+    'pizzap_conversa_duracao_segundos', 'Tempo de processamento de uma mensagem por etapa da conversa', ('etapa',))
+erros_conversa = REGISTRO.contador(
+    'pizzap_conversa_erros_total', 'Mensagens cujo processamento terminou em exceção', ('etapa',))
+duplicadas_webhook = REGISTRO.contador(
+    'pizzap_webhook_duplicadas_total', 'Repetições de um MessageSid já recebido', ('estado',))
+degradadas_webhook = REGISTRO.contador(
+    'pizzap_webhook_degradadas_total', 'Mensagens respondidas em modo degradado por excesso de carga',
+    ('resposta',))
+REGISTRO.medidor('pizzap_banco_pool_conexoes', 'Estado do pool de conexões do banco',
+                 db.estatisticas_pool, ('estado',))
+REGISTRO.medidor('pizzap_cep_consultas', 'Origem das respostas de validar_cep',
+                 lambda: {chave: valor for chave, valor in db.estatisticas_cep().items() if chave != 'taxa_acerto'},
+                 ('origem',))
+REGISTRO.medidor('pizzap_cache_clientes', 'Estado do cache de clientes de buscar_cliente',
+                 lambda: {chave: valor for chave, valor in db.estatisticas_cache_clientes().items()
+                          if chave != 'taxa_acerto'},
+                 ('estado',))
+REGISTRO.medidor('pizzap_cozinha_pedidos', 'Pedidos ativos na fila da cozinha',
+                 lambda: cozinha.fila.contagem_por_status(), ('status',))
+if fila_mensagens is not None:
+    REGISTRO.medidor('pizzap_fila_mensagens_profundidade', 'Mensagens pendentes ou em processamento',
+                     fila_mensagens.profundidade)
+    REGISTRO.medidor('pizzap_fila_respostas_profundidade', 'Respostas gravadas ainda não enviadas',
+                     fila_mensagens.profundidade_saida)
+REGISTRO.medidor('pizzap_webhook_carga', 'Carga comparada a PIZZAP_CARGA_MAXIMA', lambda: carga_atual())
+
+# --- CARGA ---
+_em_andamento = 0
+_lock_carga = threading.Lock()
+_profundidade_fila = (0.0, 0)  # (instante da leitura, profundidade)
 
-# Dicionários para controle de estado
-cadastro_em_andamento = {}
-login_em_andamento = {}
-pedido_em_andamento = {}
+def carga_atual():
+    """Profundidade da fila (lida no máximo a cada 0,5s) ou requisições em andamento."""
+    global _profundidade_fila
+    if fila_mensagens is None:
+        return _em_andamento
+    lido_em, profundidade = _profundidade_fila
+    if time.monotonic() - lido_em > 0.5:
+        _profundidade_fila = (time.monotonic(), fila_mensagens.profundidade())
+    return _profundidade_fila[1]
+
+def resposta_sobrecarga(numero, mensagem, motivo, message_sid=None):
+    """
+    Resposta que não escreve no banco agora: o cardápio sai do texto já
+    renderizado; no modo assíncrono o resto vai para a fila (enquanto ela
+    estiver abaixo de ADIAMENTO_MAXIMO) e é respondido depois. Sem fila, ou
+    com ela cheia, pede para o cliente repetir a mensagem em instantes.
+    Devolve o TwiML e se a mensagem foi para a fila.
+    """
+    adiada = False
+    resposta = MessagingResponse()
+    menu = renderizar_cardapio() if mensagem.lower() in ('cardapio', 'cardápio') else None
+    if menu is not None:
+        degradadas_webhook.incrementar('cardapio')
+        resposta.message(menu)
+    elif motivo == 'numero':
+        resposta.message("⏳ Muitas mensagens seguidas. Aguarde alguns segundos e tente novamente.")
+    elif fila_mensagens is not None and carga_atual() < ADIAMENTO_MAXIMO:
+        fila_mensagens.enfileirar(numero, mensagem, message_sid)
+        adiada = True
+        degradadas_webhook.incrementar('adiada')
+        resposta.message("⏳ Estamos com muitos pedidos agora. Recebemos sua mensagem e já respondemos.")
+    else:
+        degradadas_webhook.incrementar('tente_novamente')
+        resposta.message("⏳ Estamos com muitos pedidos agora. Por favor, tente novamente em instantes.")
+    return str(resposta), adiada
+
+# Etapa da conversa em que a mensagem atual caiu, usada como rótulo das métricas
+_etapa_conversa = threading.local()
+
+def marcar_etapa(etapa):
+    _etapa_conversa.nome = etapa
+
+@app.route("/metrics", methods=['GET'])
+def metricas():
+    return Response(REGISTRO.exportar(), content_type=TIPO_CONTEUDO)
+
+def resposta_duplicada(message_sid):
+    """
+    TwiML já dado a este MessageSid. Se a original ainda está em processamento,
+    espera por ela; passado ESPERA_DUPLICADA, responde vazio em vez de reprocessar.
+    """
+    limite = time.monotonic() + ESPERA_DUPLICADA
+    estado = 'respondida'
+    while True:
+        registro = respostas_webhook.obter(message_sid)
+        if registro is None or registro.get('twiml') is not None:
+            break
+        estado = 'em_andamento'
+        if time.monotonic() >= limite:
+            break
+        time.sleep(0.05)
+    duplicadas_webhook.incrementar(estado)
+    if registro and registro.get('twiml') is not None:
+        return registro['twiml']
+    return str(MessagingResponse())
 
 @app.route("/whatsapp", methods=['POST'])
 def whatsapp():
+    global _em_andamento
+    inicio = time.perf_counter()
     mensagem = request.form.get('Body', '').strip()
-    numero = request.form.get('From').replace('whatsapp:', '')
+    numero = request.form.get('From', '').replace('whatsapp:', '')
+    message_sid = request.form.get('MessageSid')
     
     # Bloqueia mensagens vazias
     if not mensagem:
@@ -24,24 +228,77 @@ def whatsapp():
         resposta.message("❌ Mensagem vazia. Por favor, digite algo.")
         return str(resposta)
 
+    if message_sid and not respostas_webhook.reservar(message_sid, {'twiml': None}):
+        return resposta_duplicada(message_sid)
+
+    motivo = limitador.permitir(numero)
+    if motivo is None and carga_atual() >= CARGA_MAXIMA:
+        motivo = 'carga'
+    if motivo is not None:
+        twiml, adiada = resposta_sobrecarga(numero, mensagem, motivo, message_sid)
+        if message_sid:
+            if adiada:
+                respostas_webhook.salvar(message_sid, {'twiml': twiml})
+            else:
+                respostas_webhook.remover(message_sid)  # a nova tentativa pode ser atendida
+        return twiml
+
+    with _lock_carga:
+        _em_andamento += 1
     resposta = MessagingResponse()
-    msg = resposta.message()
+    try:
+        if fila_mensagens is not None:
+            # Modo assíncrono: a resposta vai depois, pelo enviador
+            fila_mensagens.enfileirar(numero, mensagem, message_sid)
+            modo = 'assincrono'
+        else:
+            atender_mensagem(numero, mensagem, resposta.message())
+            modo = 'sincrono'
+    except Exception:
+        if message_sid:
+            respostas_webhook.remover(message_sid)  # deixa a nova tentativa reprocessar
+        raise
+    finally:
+        with _lock_carga:
+            _em_andamento -= 1
+
+    twiml = str(resposta)
+    if message_sid:
+        respostas_webhook.salvar(message_sid, {'twiml': twiml})
+    duracao_webhook.observar(time.perf_counter() - inicio, modo)
+    return twiml
+
+def atender_mensagem(numero, mensagem, msg):
+    """Processa a mensagem registrando o tempo gasto na etapa da conversa."""
+    marcar_etapa('inicio')
+    inicio = time.perf_counter()
+    try:
+        processar_mensagem(numero, mensagem, msg)
+    except Exception:
+        erros_conversa.incrementar(_etapa_conversa.nome)
+        raise
+    finally:
+        duracao_conversa.observar(time.perf_counter() - inicio, _etapa_conversa.nome)
+
+def processar_mensagem(numero, mensagem, msg):
     mensagem = mensagem.lower()
 
     # Verifica se já está logado
     if numero in login_em_andamento:
         processar_pedido(numero, mensagem, msg)
-        return str(resposta)
+        return
 
     # Fluxo de cadastro
     if numero in cadastro_em_andamento:
         continuar_cadastro(numero, mensagem, msg)
-        return str(resposta)
+        return
 
     # Menu inicial
     if mensagem == 'cadastrar':
+        marcar_etapa('cadastrar')
         iniciar_cadastro(numero, msg)
     elif mensagem == 'login':
+        marcar_etapa('login')
         verificar_login(numero, msg)
     else:
         msg.body("""
@@ -49,19 +306,34 @@ def whatsapp():
     📝 Digite *CADASTRAR* para se registrar
     🔐 Digite *LOGIN* para acessar sua conta
         """)
-    
-    return str(resposta)
+
+class RespostaColetada:
+    """Substitui a mensagem TwiML no modo assíncrono, guardando os textos para envio."""
+
+    def __init__(self):
+        self.textos = []
+
+    def body(self, texto):
+        self.textos.append(texto)
+
+def processar_mensagem_assincrona(numero, mensagem):
+    """Retorna as respostas; a FilaMensagens as grava e envia, com novas tentativas."""
+    msg = RespostaColetada()
+    atender_mensagem(numero, mensagem, msg)
+    return msg.textos
 
 def iniciar_cadastro(numero, msg):
-    cadastro_em_andamento[numero] = {'etapa': 'nome'}
+    cadastro_em_andamento.salvar(numero, {'etapa': 'nome'})
     msg.body("📝 Qual seu nome? (mínimo 3 letras)")
 
 def continuar_cadastro(numero, mensagem, msg):
-    dados = cadastro_em_andamento[numero]
+    dados = cadastro_em_andamento.obter(numero)
+    marcar_etapa(f"cadastro_{dados['etapa']}")
     
     if dados['etapa'] == 'nome':
         dados['nome'] = mensagem.strip()
         dados['etapa'] = 'cep'
+        cadastro_em_andamento.salvar(numero, dados)
         msg.body("📮 Qual o CEP do seu endereço? (somente números)")
 
     elif dados['etapa'] == 'cep':
@@ -69,13 +341,23 @@ def continuar_cadastro(numero, mensagem, msg):
         if not cep.isdigit() or len(cep) != 8:
             msg.body("❌ CEP inválido. Envie apenas 8 números.")
             return
+        endereco = db.validar_cep(cep)
+        if endereco is None:
+            msg.body("❌ CEP não encontrado. Confira e envie novamente.")
+            return
         dados['cep'] = cep
+        dados['logradouro'] = endereco.get('logradouro') or 'Não informado'
+        dados['bairro'] = endereco.get('bairro')
+        dados['cidade'] = endereco.get('localidade')
+        dados['uf'] = endereco.get('uf')
         dados['etapa'] = 'numero'
+        cadastro_em_andamento.salvar(numero, dados)
         msg.body("🏠 Qual o número da residência?")
 
     elif dados['etapa'] == 'numero':
         dados['numero'] = mensagem.strip()
         dados['etapa'] = 'tipo_residencia'
+        cadastro_em_andamento.salvar(numero, dados)
         msg.body("🏘️ O local é:\n1️⃣ Casa\n2️⃣ Apartamento\n3️⃣ Condomínio\nDigite o número correspondente.")
 
     elif dados['etapa'] == 'tipo_residencia':
@@ -85,6 +367,7 @@ def continuar_cadastro(numero, mensagem, msg):
             return
         dados['tipo'] = tipos[mensagem]
         dados['etapa'] = 'complemento'
+        cadastro_em_andamento.salvar(numero, dados)
         msg.body("🔢 Deseja informar complemento (ex: bloco, andar)? Se não tiver, digite 'não'.")
 
     elif dados['etapa'] == 'complemento':
@@ -101,7 +384,7 @@ def continuar_cadastro(numero, mensagem, msg):
             )
             if not sucesso_cliente:
                 msg.body("⚠️ Este número já está cadastrado. Digite *MENU*.")
-                del cadastro_em_andamento[numero]
+                cadastro_em_andamento.remover(numero)
                 return
 
             # Busca cliente para obter ID
@@ -117,7 +400,10 @@ def continuar_cadastro(numero, mensagem, msg):
                 logradouro=dados['logradouro'],
                 numero=dados['numero'],
                 tipo_residencia=dados['tipo'],
-                complemento=dados.get('complemento')
+                complemento=dados.get('complemento'),
+                bairro=dados.get('bairro'),
+                cidade=dados.get('cidade'),
+                uf=dados.get('uf')
             )
 
             if sucesso_endereco:
@@ -137,7 +423,7 @@ Digite *MENU* para começar.
             print(f"Erro no cadastro: {e}")
             msg.body("❌ Erro ao finalizar cadastro. Tente novamente.")
         
-        del cadastro_em_andamento[numero]
+        cadastro_em_andamento.remover(numero)
 
 
 def verificar_login(numero, msg):
@@ -155,10 +441,10 @@ Digite *CADASTRAR* para se registrar.
         print(f"Erro: cliente retornado não é um dicionário: {cliente}")
         return
 
-    login_em_andamento[numero] = {
+    login_em_andamento.salvar(numero, {
         'id': cliente.get('id'),
         'nome': cliente.get('nome', 'Cliente')
-    }
+    })
     
     msg.body(f"""
 🎉 *Login realizado, {cliente.get('nome', 'Cliente')}!*
@@ -167,111 +453,146 @@ Digite *CADASTRAR* para se registrar.
 🛒 Digite *PEDIR* para fazer um pedido
 ━━━━━━━━━━━━━━━━━
 """)
+COMANDOS_LOGADO = ('cardapio', 'pedir', 'buscar', 'mais', 'sair')
+
 def processar_pedido(numero, mensagem, msg):
+    comando = mensagem.split(' ', 1)[0]
+    marcar_etapa(comando if comando in COMANDOS_LOGADO else 'menu')
+
     if mensagem == 'cardapio':
         mostrar_cardapio(numero, msg)
         return
     
     if mensagem == 'pedir':
-        mostrar_cardapio(numero, msg, apenas_inteiras=True)
+        pedido_em_andamento.salvar(numero, {'etapa': 'escolher_pizza'})
+        mostrar_cardapio(numero, msg)
         return
 
+    if mensagem.startswith('buscar '):
+        buscar_no_cardapio(numero, mensagem[len('buscar '):].strip(), 0, msg)
+        return
+
+    if mensagem == 'mais':
+        sessao = login_em_andamento.obter(numero)
+        if sessao and sessao.get('busca'):
+            buscar_no_cardapio(numero, sessao['busca'], sessao['pagina_busca'] + 1, msg)
+            return
+
     if mensagem == 'sair':
-        del login_em_andamento[numero]
+        login_em_andamento.remover(numero)
         msg.body("🚪 Você saiu. Digite *LOGIN* para acessar novamente.")
         return
 
-    if numero not in pedido_em_andamento:
+    dados = pedido_em_andamento.obter(numero)
+    if dados is None:
+        if pedido_em_texto(numero, mensagem, msg):
+            return
+        marcar_etapa('menu')
         msg.body("""
         📋 *MENU PRINCIPAL*
         ━━━━━━━━━━━━━━━━━
         🍕 Digite *CARDÁPIO* para ver opções
         🛒 Digite *PEDIR* para fazer um pedido
+        🔎 Digite *BUSCAR* e um sabor ou ingrediente
+        ✍️ Ou escreva o pedido: *2 calabresa G e 1 marguerita M*
         🚪 Digite *SAIR* para encerrar
         ━━━━━━━━━━━━━━━━━
         """)
         return
+    marcar_etapa(f"pedido_{dados['etapa']}")
 
-    dados = pedido_em_andamento[numero]
-    
     if dados['etapa'] == 'escolher_pizza':
+        pizzas = db.buscar_cardapio_completo()
         try:
             escolha = int(mensagem) - 1
-            if 0 <= escolha < len(dados['pizzas']):
-                pizza = dados['pizzas'][escolha]
-                dados.update({
-                    'pizza_id': pizza['id'],
-                    'pizza_nome': pizza['nome'],
-                    'preco_inteira': pizza['preco_inteira'],
-                    'preco_meia': pizza['preco_meia'],
-                    'etapa': 'escolher_tipo'
-                })
-                
-                if pizza['preco_meia'] is None:  # Se não tem meia pizza
-                    dados['tipo'] = 'Inteira'
-                    dados['preco'] = pizza['preco_inteira']
-                    dados['etapa'] = 'quantidade'
-                    msg.body(f"Você escolheu: *{pizza['nome']}*\nQuantas unidades deseja?")
-                else:
-                    msg.body(f"""
-                    🍕 {pizza['nome']}
-                    ━━━━━━━━━━━━━━━━━
-                    1️⃣ Inteira - R${pizza['preco_inteira']:.2f}
-                    2️⃣ Meia - R${pizza['preco_meia']:.2f}
-                    ━━━━━━━━━━━━━━━━━
-                    Digite *1* ou *2*:
-                    """)
-            else:
-                msg.body("❌ Número inválido. Escolha uma opção do cardápio.")
         except ValueError:
-            msg.body("❌ Por favor, digite apenas números.")
-
-    elif dados['etapa'] == 'escolher_tipo':
-        if mensagem == '1':
-            dados['tipo'] = 'Inteira'
-            dados['preco'] = dados['preco_inteira']
-        elif mensagem == '2':
-            dados['tipo'] = 'Meia'
-            dados['preco'] = dados['preco_meia']
-        else:
-            msg.body("❌ Opção inválida. Digite *1* (Inteira) ou *2* (Meia)")
+            if not pedido_em_texto(numero, mensagem, msg):
+                msg.body("❌ Digite o número da pizza ou escreva o pedido, ex.: *2 calabresa G*.")
+            return
+        if not 0 <= escolha < len(pizzas) or not pizzas[escolha]['precos']:
+            msg.body("❌ Número inválido. Escolha uma opção do cardápio.")
+            return
+
+        pizza = pizzas[escolha]
+        dados.update({
+            'pizza_id': pizza['id'],
+            'pizza_nome': pizza['nome'],
+            'precos': {p['tamanho']: p['valor'] for p in pizza['precos']},
+            'etapa': 'escolher_tamanho'
+        })
+        pedido_em_andamento.salvar(numero, dados)
+        opcoes = "\n".join(f"*{p['tamanho']}* - R${p['valor']:.2f}" for p in pizza['precos'])
+        msg.body(f"""
+🍕 {pizza['nome']}
+━━━━━━━━━━━━━━━━━
+{opcoes}
+━━━━━━━━━━━━━━━━━
+Digite o tamanho desejado:
+""")
+
+    elif dados['etapa'] == 'escolher_tamanho':
+        tamanho = mensagem.upper()
+        if tamanho not in dados['precos']:
+            msg.body(f"❌ Tamanho inválido. Escolha entre {', '.join(dados['precos'])}.")
             return
 
+        dados['tamanho'] = tamanho
+        dados['preco'] = dados['precos'][tamanho]
         dados['etapa'] = 'quantidade'
-        msg.body(f"Você escolheu: *{dados['pizza_nome']} ({dados['tipo']})*\nQuantas unidades deseja?")
+        pedido_em_andamento.salvar(numero, dados)
+        msg.body(f"Você escolheu: *{dados['pizza_nome']} ({tamanho})*\nQuantas unidades deseja?")
 
     elif dados['etapa'] == 'quantidade':
         if mensagem.isdigit() and (quantidade := int(mensagem)) > 0:
-            dados['quantidade'] = quantidade
-            dados['total'] = quantidade * dados['preco']
-            dados['etapa'] = 'confirmar'
-            
-            msg.body(f"""
-            ✅ *RESUMO DO PEDIDO*
-            ━━━━━━━━━━━━━━━━━
-            🍕 Pizza: {dados['pizza_nome']} ({dados['tipo']})
-            🔢 Quantidade: {dados['quantidade']}
-            💰 Total: R${dados['total']:.2f}
-            ━━━━━━━━━━━━━━━━━
-            Digite *CONFIRMAR* para finalizar ou *CANCELAR* para voltar.
-            """)
+            carrinho = {'etapa': 'confirmar', 'itens': [{
+                'pizza_id': dados['pizza_id'],
+                'pizza_nome': dados['pizza_nome'],
+                'tamanho': dados['tamanho'],
+                'quantidade': quantidade,
+                'valor_unitario': dados['preco'],
+                'observacoes': None
+            }]}
+            pedido_em_andamento.salvar(numero, carrinho)
+            mostrar_resumo(carrinho, msg)
         else:
             msg.body("❌ Quantidade inválida. Digite um número maior que zero.")
 
+    elif dados['etapa'] == 'tamanho_carrinho':
+        if mensagem == 'cancelar':
+            pedido_em_andamento.salvar(numero, {'etapa': 'escolher_pizza'})
+            mostrar_cardapio(numero, msg)
+            return
+        item = next(item for item in dados['itens'] if item['tamanho'] is None)
+        precos = precos_da_pizza(item['pizza_id'])
+        tamanho = TAMANHOS.get(normalizar(mensagem), mensagem.strip().upper())
+        if tamanho not in precos:
+            msg.body(f"❌ Tamanho inválido. Escolha entre {', '.join(precos)}.")
+            return
+        item['tamanho'] = tamanho
+        item['valor_unitario'] = precos[tamanho]
+        continuar_carrinho(numero, dados, msg)
+
     elif dados['etapa'] == 'confirmar':
         if mensagem == 'confirmar':
             try:
-                db.fazer_pedido(
-                    cliente_id=login_em_andamento[numero]['id'],
-                    pizza_id=dados['pizza_id'],
-                    tipo=dados['tipo'],
-                    quantidade=dados['quantidade']
+                cliente_id = login_em_andamento.obter(numero)['id']
+                cliente = db.buscar_cliente(numero)  # em memória desde o login
+                if not cliente or not cliente['endereco_padrao']:
+                    raise Exception("Cliente sem endereço cadastrado")
+
+                pedido_id = db.fazer_pedido(
+                    cliente_id=cliente_id,
+                    endereco_id=cliente['endereco_padrao']['id'],
+                    itens=dados['itens']
                 )
+                if pedido_id is None:
+                    raise Exception("Pedido não registrado")
+                minutos = estimador.prometer(pedido_id)
                 msg.body(f"""
-                🎉 *PEDIDO CONFIRMADO!*
+                🎉 *PEDIDO #{pedido_id} CONFIRMADO!*
                 ━━━━━━━━━━━━━━━━━
                 Seu pedido está sendo preparado e
-                chegará em até 50 minutos.
+                chegará em cerca de {minutos} minutos.
                 ━━━━━━━━━━━━━━━━━
                 Obrigado pela preferência!
                 """)
@@ -279,34 +600,190 @@ def processar_pedido(numero, mensagem, msg):
                 print(f"Erro ao registrar pedido: {e}")
                 msg.body("❌ Erro ao processar pedido. Tente novamente.")
             
-            del pedido_em_andamento[numero]
+            pedido_em_andamento.remover(numero)
         else:
+            pedido_em_andamento.salvar(numero, {'etapa': 'escolher_pizza'})
             mostrar_cardapio(numero, msg)
 
-def mostrar_cardapio(numero, msg):
-    pizzas = db.buscar_pizzas(apenas_disponiveis=True)
-    
-    if not pizzas:
-        msg.body("⚠️ Nenhuma pizza disponível no momento.")
+# --- PEDIDO EM TEXTO LIVRE ---
+# Índice de nomes e apelidos, junto da versão do cardápio que o gerou
+_indice_pedido = (None, None)
+
+def indice_pedido():
+    global _indice_pedido
+    versao = db.versao_cardapio
+    if _indice_pedido[0] != versao:
+        _indice_pedido = (versao, IndiceCardapio(db.buscar_cardapio_completo()))
+    return _indice_pedido[1]
+
+def precos_da_pizza(pizza_id):
+    pizza = indice_pedido().pizzas.get(pizza_id)
+    return {p['tamanho']: p['valor'] for p in pizza['precos']} if pizza else {}
+
+def pedido_em_texto(numero, mensagem, msg):
+    """
+    Tenta montar o carrinho inteiro a partir da mensagem ("2 calabresa G e
+    1 marguerita M sem cebola"). Retorna False se nenhuma pizza foi reconhecida.
+    """
+    interpretacao = indice_pedido().interpretar(mensagem)
+    if not interpretacao['itens']:
+        return False
+    marcar_etapa('pedido_texto')
+    for item in interpretacao['itens']:
+        item['valor_unitario'] = precos_da_pizza(item['pizza_id']).get(item['tamanho'])
+    continuar_carrinho(numero, {
+        'itens': interpretacao['itens'],
+        'nao_entendidos': interpretacao['nao_entendidos']
+    }, msg)
+    return True
+
+def continuar_carrinho(numero, dados, msg):
+    """Pergunta o tamanho do próximo item que não tem; com todos definidos, mostra o resumo."""
+    pendente = next((item for item in dados['itens'] if item['tamanho'] is None), None)
+    if pendente is not None:
+        dados['etapa'] = 'tamanho_carrinho'
+        pedido_em_andamento.salvar(numero, dados)
+        opcoes = " | ".join(f"*{t}* R${v:.2f}" for t, v in precos_da_pizza(pendente['pizza_id']).items())
+        msg.body(f"📏 Qual o tamanho da *{pendente['pizza_nome']}*?\n{opcoes}")
         return
+    dados['etapa'] = 'confirmar'
+    pedido_em_andamento.salvar(numero, dados)
+    mostrar_resumo(dados, msg)
+
+def mostrar_resumo(dados, msg):
+    partes = ["✅ *RESUMO DO PEDIDO*\n━━━━━━━━━━━━━━━━━\n"]
+    total = 0
+    for item in dados['itens']:
+        subtotal = item['quantidade'] * item['valor_unitario']
+        total += subtotal
+        partes.append(f"🍕 {item['quantidade']}x {item['pizza_nome']} ({item['tamanho']}) - R${subtotal:.2f}\n")
+        if item.get('observacoes'):
+            partes.append(f"   📝 {item['observacoes']}\n")
+    partes.append(f"━━━━━━━━━━━━━━━━━\n💰 Total: R${total:.2f}\n")
+    if dados.get('nao_entendidos'):
+        partes.append(f"⚠️ Não entendi: {' '.join(dados['nao_entendidos'])}\n")
+    partes.append("Digite *CONFIRMAR* para finalizar ou *CANCELAR* para voltar.")
+    msg.body("".join(partes))
+
+# Texto do cardápio já renderizado, junto da versão do cardápio que o gerou
+_cardapio_renderizado = (None, None)
 
-    menu = "🍕 *NOSSO CARDÁPIO* 🍕\n━━━━━━━━━━━━━━━━━\n"
+def renderizar_cardapio():
+    global _cardapio_renderizado
+    versao = db.versao_cardapio
+    if _cardapio_renderizado[0] == versao:
+        return _cardapio_renderizado[1]
+
+    pizzas = db.buscar_cardapio_completo()
+    if not pizzas:
+        return None
+
+    partes = ["🍕 *NOSSO CARDÁPIO* 🍕\n━━━━━━━━━━━━━━━━━\n"]
     for idx, pizza in enumerate(pizzas, 1):
-        menu += f"{idx}. {pizza['nome']} ({pizza['categoria']})\n"
-        menu += f"   📝 {pizza['descricao']}\n"
-        menu += f"   🧀 Ingredientes: {pizza['ingredientes']}\n"
-        
-        # Busca os preços para esta pizza
-        precos = db.buscar_precos_pizza(pizza['id'])
-        if precos:
-            menu += "   💰 Valores: "
-            menu += " | ".join([f"{p['tamanho']}: R${p['valor']:.2f}" for p in precos])
-            menu += "\n"
-        
-        menu += "━━━━━━━━━━━━━━━━━\n"
-    
-    menu += "Digite o *NÚMERO* da pizza desejada ou *VOLTAR*:"
+        partes.append(f"{idx}. {pizza['nome']} ({pizza['categoria']})\n")
+        partes.append(f"   📝 {pizza['descricao']}\n")
+        partes.append(f"   🧀 Ingredientes: {pizza['ingredientes']}\n")
+        if pizza['precos']:
+            valores = " | ".join(f"{p['tamanho']}: R${p['valor']:.2f}" for p in pizza['precos'])
+            partes.append(f"   💰 Valores: {valores}\n")
+        partes.append("━━━━━━━━━━━━━━━━━\n")
+    partes.append("Digite o *NÚMERO* da pizza desejada ou *VOLTAR*:")
+
+    texto = "".join(partes)
+    _cardapio_renderizado = (versao, texto)
+    return texto
+
+RESULTADOS_POR_PAGINA = 5
+
+def buscar_no_cardapio(numero, termo, pagina, msg):
+    resultados = db.pesquisar_pizzas(
+        termo, limite=RESULTADOS_POR_PAGINA + 1, deslocamento=pagina * RESULTADOS_POR_PAGINA
+    )
+    ha_mais = len(resultados) > RESULTADOS_POR_PAGINA
+    resultados = resultados[:RESULTADOS_POR_PAGINA]
+
+    sessao = login_em_andamento.obter(numero)
+    sessao.update({'busca': termo if ha_mais else None, 'pagina_busca': pagina})
+    login_em_andamento.salvar(numero, sessao)
+
+    if not resultados:
+        msg.body(f"🔎 Nada encontrado para *{termo}*." if pagina == 0 else "🔎 Não há mais resultados.")
+        return
+
+    # Mostra o número da pizza no cardápio completo, que é o usado no fluxo do PEDIR
+    cardapio = db.buscar_cardapio_completo()
+    posicoes = {pizza['id']: (idx, pizza) for idx, pizza in enumerate(cardapio, 1)}
+    partes = [f"🔎 *Resultados para {termo}*\n━━━━━━━━━━━━━━━━━\n"]
+    for resultado in resultados:
+        idx, pizza = posicoes.get(resultado['id'], ('-', resultado))
+        valores = " | ".join(f"{p['tamanho']}: R${p['valor']:.2f}" for p in pizza.get('precos', []))
+        partes.append(f"{idx}. {resultado['nome']} ({resultado['categoria']})\n")
+        partes.append(f"   🧀 {resultado['ingredientes']}\n")
+        if valores:
+            partes.append(f"   💰 {valores}\n")
+    partes.append("━━━━━━━━━━━━━━━━━\n")
+    if ha_mais:
+        partes.append("Digite *MAIS* para ver outros resultados.\n")
+    partes.append("Digite *PEDIR* e depois o número da pizza para pedir.")
+    msg.body("".join(partes))
+
+def mostrar_cardapio(numero, msg):
+    menu = renderizar_cardapio()
+    if menu is None:
+        msg.body("⚠️ Nenhuma pizza disponível no momento.")
+        return
     msg.body(menu)
 
+# --- COZINHA ---
+@app.route("/cozinha/fila", methods=['GET'])
+def cozinha_fila():
+    return jsonify({
+        'pedidos': cozinha.fila.proximos(),
+        'por_status': cozinha.fila.contagem_por_status()
+    })
+
+@app.route("/cozinha/status", methods=['POST'])
+def cozinha_status():
+    """
+    Aceita {"transicoes": {"<pedido_id>": "<status>", ...}} ou
+    {"avancar": [<pedido_id>, ...]} e aplica tudo numa transação.
+    """
+    dados = request.get_json(silent=True) or {}
+    if 'avancar' in dados:
+        alterados = cozinha.avancar([int(pedido_id) for pedido_id in dados['avancar']])
+    else:
+        transicoes = {int(pedido_id): status for pedido_id, status in dados.get('transicoes', {}).items()}
+        alterados = cozinha.atualizar_status(transicoes)
+    if alterados is None:
+        return jsonify({'erro': 'Status inválido ou falha ao atualizar'}), 400
+    return jsonify({'alterados': alterados})
+
+@app.route("/cozinha/eventos", methods=['GET'])
+def cozinha_eventos():
+    # Cada tela conectada ocupa uma thread; rode com servidor threaded ou gevent
+    return Response(
+        cozinha.eventos_sse(),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route("/entregas/lotes", methods=['GET'])
+def entregas_lotes():
+    return jsonify({'lotes': entregas.propor_lotes()})
+
+@app.route("/entregas/despachar", methods=['POST'])
+def entregas_despachar():
+    """
+    Aceita {"pedidos": [<pedido_id>, ...]} para despachar um lote escolhido,
+    ou um corpo vazio para despachar todos os lotes prontos.
+    """
+    dados = request.get_json(silent=True) or {}
+    if 'pedidos' in dados:
+        alterados = entregas.despachar([int(pedido_id) for pedido_id in dados['pedidos']])
+        if alterados is None:
+            return jsonify({'erro': 'Algum pedido do lote não está pronto para entrega'}), 409
+        return jsonify({'alterados': alterados})
+    return jsonify({'lotes': entregas.despachar_prontos()})
+
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,94 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+# Sentinela para diferenciar "chave ausente" de um valor None guardado no cache
+AUSENTE = object()
+
+
+class CacheLRU:
+    """
+    Cache em memória com limite de tamanho (descarte LRU) e expiração por TTL.
+
+    Seguro para uso entre threads. Valores None são guardados normalmente,
+    o que permite cache negativo; use a sentinela AUSENTE para detectar falta.
+    """
+
+    def __init__(self, tamanho_maximo: int = 1024, ttl: Optional[float] = None) -> None:
+        """
+        Args:
+            tamanho_maximo: Quantidade máxima de chaves mantidas
+            ttl: Tempo de vida padrão em segundos (None = não expira)
+        """
+        self.tamanho_maximo = tamanho_maximo
+        self.ttl = ttl
+        self._dados: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.descartes = 0
+
+    def obter(self, chave: Hashable, padrao: Any = AUSENTE) -> Any:
+        with self._lock:
+            item = self._dados.get(chave)
+            if item is None:
+                self.falhas += 1
+                return padrao
+            valor, expira_em = item
+            if expira_em is not None and expira_em <= time.monotonic():
+                del self._dados[chave]
+                self.falhas += 1
+                return padrao
+            self._dados.move_to_end(chave)
+            self.acertos += 1
+            return valor
+
+    def definir(self, chave: Hashable, valor: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.ttl if ttl is None else ttl
+        expira_em = time.monotonic() + ttl if ttl is not None else None
+        with self._lock:
+            self._dados[chave] = (valor, expira_em)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.tamanho_maximo:
+                self._dados.popitem(last=False)
+                self.descartes += 1
+
+    def remover(self, chave: Hashable) -> None:
+        with self._lock:
+            self._dados.pop(chave, None)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._dados.clear()
+
+    def remover_expirados(self) -> int:
+        """Remove as entradas vencidas e retorna quantas foram removidas."""
+        agora = time.monotonic()
+        with self._lock:
+            vencidas = [
+                chave for chave, (_, expira_em) in self._dados.items()
+                if expira_em is not None and expira_em <= agora
+            ]
+            for chave in vencidas:
+                del self._dados[chave]
+        return len(vencidas)
+
+    def __contains__(self, chave: Hashable) -> bool:
+        with self._lock:
+            item = self._dados.get(chave)
+            return item is not None and (item[1] is None or item[1] > time.monotonic())
+
+    def __len__(self) -> int:
+        return len(self._dados)
+
+    def estatisticas(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.acertos + self.falhas
+            return {
+                'itens': len(self._dados),
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'descartes': self.descartes,
+                'taxa_acerto': self.acertos / total if total else 0.0
+            }
@@ -0,0 +1,191 @@
+"""
+Log de consultas lentas do BancoDeDados, com o EXPLAIN QUERY PLAN de cada uma.
+
+Quando o BancoDeDados recebe um limite_consulta_lenta, suas conexões passam a
+ser ConexaoMonitorada: cada execute/executemany (e o fetchall que vem depois)
+é cronometrado e, passando do limite, vira uma linha JSON num arquivo com
+rotação. O plano é capturado na mesma conexão e guardado por texto de SQL
+(e versão do esquema), então uma consulta lenta repetida não paga o EXPLAIN
+de novo.
+
+Cada linha traz "varreduras": as tabelas percorridas inteiras (SCAN, mesmo
+que na ordem de um índice), que apontam os índices que faltam.
+"""
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import deque
+from logging.handlers import RotatingFileHandler
+from typing import Callable, Dict, List, Optional
+
+from Cache import CacheLRU, AUSENTE
+from Metricas import REGISTRO, RegistroMetricas
+
+# Só estes comandos aceitam EXPLAIN QUERY PLAN com proveito
+COMANDOS_COM_PLANO = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH', 'REPLACE')
+
+
+def formato_parametros(parametros) -> object:
+    """
+    Descreve os parâmetros sem expor os valores (telefones, endereços):
+    os tipos em ordem, ou o nome e o tipo com parâmetros nomeados.
+    """
+    if parametros is None:
+        return []
+    if isinstance(parametros, dict):
+        return {nome: type(valor).__name__ for nome, valor in parametros.items()}
+    return [type(valor).__name__ for valor in parametros]
+
+
+def resumir_plano(linhas: List[tuple]) -> Dict:
+    """Monta o plano indentado e aponta varreduras completas e ordenações temporárias."""
+    profundidade = {0: -1}
+    plano, varreduras = [], []
+    for id_no, pai, _, detalhe in linhas:
+        nivel = profundidade.get(pai, -1) + 1
+        profundidade[id_no] = nivel
+        plano.append('  ' * nivel + detalhe)
+        if detalhe.startswith('SCAN ') and 'CONSTANT ROW' not in detalhe and 'VIRTUAL TABLE' not in detalhe:
+            varreduras.append(detalhe[5:].split(' ', 1)[0])
+    return {
+        'plano': plano,
+        'varreduras': varreduras,
+        'ordenacao_temporaria': any('USE TEMP B-TREE' in linha for linha in plano),
+    }
+
+
+class MonitorConsultas:
+    def __init__(self, limite: float, arquivo: Optional[str] = 'consultas_lentas.log',
+                 tamanho_arquivo: int = 5 * 1024 * 1024, copias: int = 3,
+                 metricas: Optional[RegistroMetricas] = None) -> None:
+        """
+        Args:
+            limite: Duração em segundos a partir da qual a consulta é registrada
+            arquivo: Log JSON (uma consulta por linha); None guarda só em memória
+            tamanho_arquivo: Bytes antes de rotacionar o arquivo
+            copias: Arquivos antigos mantidos (.1, .2, ...)
+            metricas: Onde contar as consultas lentas (padrão: Metricas.REGISTRO)
+        """
+        self.limite = limite
+        self.arquivo = arquivo
+        self.recentes: deque = deque(maxlen=100)
+        self._planos = CacheLRU(tamanho_maximo=512, ttl=600)
+        self._lock = threading.Lock()
+        self._logger = None
+        if arquivo:
+            self._logger = logging.getLogger(f'pizzap.consultas_lentas.{arquivo}')
+            self._logger.setLevel(logging.INFO)
+            self._logger.propagate = False
+            if not self._logger.handlers:
+                manipulador = RotatingFileHandler(arquivo, maxBytes=tamanho_arquivo,
+                                                  backupCount=copias, encoding='utf-8')
+                manipulador.setFormatter(logging.Formatter('%(message)s'))
+                self._logger.addHandler(manipulador)
+        self._metrica = (metricas or REGISTRO).contador(
+            'pizzap_banco_consultas_lentas_total',
+            'Consultas acima do limite de lentidão, por método e se houve varredura completa',
+            ('metodo', 'varredura')
+        )
+
+    def _plano(self, conn: sqlite3.Connection, sql: str, parametros) -> Dict:
+        # A versão do esquema entra na chave: criar ou remover um índice muda o plano
+        chave = (sqlite3.Connection.execute(conn, "PRAGMA schema_version").fetchone()[0], sql)
+        plano = self._planos.obter(chave)
+        if plano is not AUSENTE:
+            return plano
+        comando = sql.lstrip()[:8].split(None, 1)
+        if not comando or comando[0].upper() not in COMANDOS_COM_PLANO:
+            plano = resumir_plano([])
+        else:
+            try:
+                cursor = sqlite3.Connection.execute(conn, f"EXPLAIN QUERY PLAN {sql}", parametros or ())
+                plano = resumir_plano([tuple(linha) for linha in cursor.fetchall()])
+            except sqlite3.Error as e:
+                plano = dict(resumir_plano([]), erro=str(e))
+        self._planos.definir(chave, plano)
+        return plano
+
+    def registrar(self, conn: sqlite3.Connection, sql: str, parametros, duracao: float,
+                  metodo: Optional[str] = None, lote: Optional[int] = None) -> Dict:
+        """
+        Registra uma consulta que passou do limite. Num executemany, `parametros`
+        é a primeira linha e `lote` o número de linhas.
+        """
+        plano = self._plano(conn, sql, parametros)
+        entrada = {
+            'momento': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'metodo': metodo or 'interno',
+            'duracao_ms': round(duracao * 1000, 3),
+            'sql': ' '.join(sql.split()),
+            'parametros': formato_parametros(parametros),
+            **({'lote': lote} if lote is not None else {}),
+            **plano,
+        }
+        self._metrica.incrementar(entrada['metodo'], 'sim' if plano['varreduras'] else 'nao')
+        with self._lock:
+            self.recentes.append(entrada)
+        if self._logger is not None:
+            self._logger.info(json.dumps(entrada, ensure_ascii=False))
+        return entrada
+
+
+class CursorMonitorado(sqlite3.Cursor):
+    """Soma o tempo do execute e do fetchall e avisa o monitor se passar do limite."""
+
+    def execute(self, sql, parametros=()):
+        self._sql, self._parametros, self._lote, self._registrada = sql, parametros, None, False
+        inicio = time.perf_counter()
+        try:
+            return super().execute(sql, parametros)
+        finally:
+            self._duracao = time.perf_counter() - inicio
+            self._verificar()
+
+    def executemany(self, sql, sequencia):
+        sequencia = sequencia if isinstance(sequencia, (list, tuple)) else list(sequencia)
+        primeiro = sequencia[0] if sequencia else ()
+        self._sql, self._parametros, self._lote, self._registrada = sql, primeiro, len(sequencia), False
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(sql, sequencia)
+        finally:
+            self._duracao = time.perf_counter() - inicio
+            self._verificar()
+
+    def fetchall(self):
+        inicio = time.perf_counter()
+        try:
+            return super().fetchall()
+        finally:
+            if hasattr(self, '_sql'):
+                self._duracao += time.perf_counter() - inicio
+                self._verificar()
+
+    def _verificar(self) -> None:
+        conn = self.connection
+        if self._registrada or self._duracao < conn.monitor.limite:
+            return
+        self._registrada = True
+        try:
+            conn.monitor.registrar(conn, self._sql, self._parametros, self._duracao,
+                                   conn.contexto() if conn.contexto else None, self._lote)
+        except Exception as e:
+            print(f"Erro ao registrar consulta lenta: {e}")
+
+
+class ConexaoMonitorada(sqlite3.Connection):
+    """
+    Fábrica de conexão (sqlite3.connect(factory=...)). Quem cria a conexão
+    define `monitor` e, opcionalmente, `contexto()`, que informa o método em
+    execução para o log.
+    """
+    monitor: MonitorConsultas
+    contexto: Optional[Callable[[], Optional[str]]] = None
+
+    def execute(self, sql, parametros=()):
+        return self.cursor(CursorMonitorado).execute(sql, parametros)
+
+    def executemany(self, sql, sequencia):
+        return self.cursor(CursorMonitorado).executemany(sql, sequencia)
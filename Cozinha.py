@@ -0,0 +1,191 @@
+"""
+Fila da cozinha sobre pedidos.status, com envio das mudanças por Server-Sent Events.
+
+A Cozinha escuta o BancoDeDados (adicionar_ouvinte_status), então pedidos novos
+e mudanças de status feitas neste processo atualizam a fila em memória e são
+enviadas às telas inscritas sem nenhuma consulta extra ao banco.
+
+Com vários workers do gunicorn, cada um tem sua própria fila e suas telas.
+As mudanças feitas em outro worker só chegam se o BancoDeDados tiver
+intervalo_sincronizacao (PIZZAP_SINCRONIZACAO_S no Bot). Nesse caso, a thread de
+sincronização lê eventos_status quando PRAGMA data_version muda e repassa as
+mudanças a este ouvinte. Sem ela, use um único worker para as telas da cozinha.
+"""
+import heapq
+import itertools
+import json
+import queue
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional
+
+from BancoDeDados import BancoDeDados, STATUS_PEDIDO
+
+# Menor valor = mais urgente. Pedidos no forno vêm antes dos que nem começaram.
+PRIORIDADE_STATUS = {
+    'Assando': 0,
+    'Em preparo': 1,
+    'Confirmado': 2,
+    'Recebido': 3,
+    'Saiu para entrega': 4,
+}
+
+
+def _para_epoch(data_pedido: str) -> float:
+    """Converte o CURRENT_TIMESTAMP do SQLite (UTC) para segundos desde a época."""
+    return datetime.strptime(data_pedido, '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc).timestamp()
+
+
+class FilaCozinha:
+    """
+    Pedidos ativos ordenados por status (PRIORIDADE_STATUS) e depois por idade.
+
+    Usa um heap com remoção preguiçosa: mudar o status empilha uma nova entrada
+    e a antiga é ignorada quando aparece, então cada atualização custa O(log n).
+    """
+
+    def __init__(self) -> None:
+        self._heap: List[tuple] = []
+        self._pedidos: Dict[int, Dict] = {}
+        self._sequencia = itertools.count()
+        self._lock = threading.Lock()
+
+    def atualizar(self, pedido_id: int, status: str, momento: float,
+                  criado_em: Optional[float] = None) -> None:
+        """Insere ou move um pedido; pedidos entregues saem da fila."""
+        with self._lock:
+            atual = self._pedidos.get(pedido_id)
+            if status not in PRIORIDADE_STATUS:
+                self._pedidos.pop(pedido_id, None)
+                return
+            criado_em = criado_em or (atual['criado_em'] if atual else momento)
+            versao = next(self._sequencia)
+            self._pedidos[pedido_id] = {
+                'pedido_id': pedido_id, 'status': status,
+                'criado_em': criado_em, 'status_desde': momento, 'versao': versao
+            }
+            heapq.heappush(self._heap, (PRIORIDADE_STATUS[status], criado_em, versao, pedido_id))
+            if len(self._heap) > 2 * len(self._pedidos) + 64:
+                self._compactar()
+
+    def _compactar(self) -> None:
+        self._heap = [
+            entrada for entrada in self._heap
+            if self._pedidos.get(entrada[3], {}).get('versao') == entrada[2]
+        ]
+        heapq.heapify(self._heap)
+
+    def proximos(self, limite: Optional[int] = None) -> List[Dict]:
+        """Pedidos ativos em ordem de prioridade, sem removê-los da fila."""
+        with self._lock:
+            validos = (
+                entrada for entrada in self._heap
+                if self._pedidos.get(entrada[3], {}).get('versao') == entrada[2]
+            )
+            entradas = heapq.nsmallest(limite, validos) if limite else sorted(validos)
+            return [dict(self._pedidos[entrada[3]]) for entrada in entradas]
+
+    def obter(self, pedido_id: int) -> Optional[Dict]:
+        with self._lock:
+            pedido = self._pedidos.get(pedido_id)
+            return dict(pedido) if pedido else None
+
+    def contagem_por_status(self) -> Dict[str, int]:
+        with self._lock:
+            contagem = dict.fromkeys(PRIORIDADE_STATUS, 0)
+            for pedido in self._pedidos.values():
+                contagem[pedido['status']] += 1
+            return contagem
+
+    def __len__(self) -> int:
+        return len(self._pedidos)
+
+
+class TransmissorEventos:
+    """Distribui eventos para várias telas; cada inscrito tem sua própria fila limitada."""
+
+    def __init__(self, tamanho_fila: int = 256) -> None:
+        self.tamanho_fila = tamanho_fila
+        self._inscritos: List[queue.Queue] = []
+        self._lock = threading.Lock()
+
+    def inscrever(self) -> queue.Queue:
+        fila: queue.Queue = queue.Queue(maxsize=self.tamanho_fila)
+        with self._lock:
+            self._inscritos.append(fila)
+        return fila
+
+    def cancelar(self, fila: queue.Queue) -> None:
+        with self._lock:
+            if fila in self._inscritos:
+                self._inscritos.remove(fila)
+
+    def publicar(self, evento: Dict) -> None:
+        with self._lock:
+            inscritos = list(self._inscritos)
+        for fila in inscritos:
+            try:
+                fila.put_nowait(evento)
+            except queue.Full:
+                # Tela lenta: descarta o evento mais antigo em vez de travar quem publica
+                try:
+                    fila.get_nowait()
+                    fila.put_nowait(evento)
+                except (queue.Empty, queue.Full):
+                    pass
+
+    def __len__(self) -> int:
+        return len(self._inscritos)
+
+
+def formatar_sse(evento: Dict, nome: str = 'status') -> str:
+    return f"event: {nome}\ndata: {json.dumps(evento, ensure_ascii=False)}\n\n"
+
+
+class Cozinha:
+    def __init__(self, db: BancoDeDados, intervalo_keepalive: float = 15.0) -> None:
+        self.db = db
+        self.intervalo_keepalive = intervalo_keepalive
+        self.fila = FilaCozinha()
+        self.transmissor = TransmissorEventos()
+        for pedido in db.buscar_pedidos_ativos():
+            criado_em = _para_epoch(pedido['data_pedido'])
+            self.fila.atualizar(pedido['id'], pedido['status'], criado_em, criado_em)
+        db.adicionar_ouvinte_status(self._ao_mudar_status)
+
+    def atualizar_status(self, transicoes: Dict[int, str]) -> Optional[List[int]]:
+        """Muda o status de vários pedidos numa única transação."""
+        return self.db.atualizar_status_pedidos(transicoes)
+
+    def avancar(self, pedido_ids: List[int]) -> Optional[List[int]]:
+        """Leva cada pedido ao status seguinte do fluxo, numa única transação."""
+        transicoes = {}
+        for pedido_id in pedido_ids:
+            pedido = self.fila.obter(pedido_id)
+            if pedido is not None:
+                transicoes[pedido_id] = STATUS_PEDIDO[STATUS_PEDIDO.index(pedido['status']) + 1]
+        return self.atualizar_status(transicoes)
+
+    def _ao_mudar_status(self, eventos: List[Dict]) -> None:
+        for evento in eventos:
+            self.fila.atualizar(evento['pedido_id'], evento['status'], evento['momento'])
+            self.transmissor.publicar(evento)
+
+    def eventos_sse(self) -> Iterator[str]:
+        """
+        Gerador para a resposta text/event-stream: envia a fila atual e depois
+        cada mudança de status, com comentários de keepalive nos intervalos.
+        """
+        fila = self.transmissor.inscrever()
+        try:
+            yield formatar_sse({'pedidos': self.fila.proximos()}, nome='fila')
+            while True:
+                try:
+                    evento = fila.get(timeout=self.intervalo_keepalive)
+                except queue.Empty:
+                    yield f": keepalive {int(time.time())}\n\n"
+                    continue
+                yield formatar_sse(evento)
+        finally:
+            self.transmissor.cancelar(fila)
@@ -0,0 +1,192 @@
+"""
+Despacho de entregas em lotes, agrupando pedidos prontos por proximidade do CEP.
+
+A proximidade vem da tabela vizinhanca_cep (prefixos de 5 dígitos e a
+distância entre eles, pré-calculada); prefixos sem vizinhos cadastrados usam
+os 4 primeiros dígitos como aproximação. O agrupamento é guloso: o pedido
+pronto há mais tempo abre um lote e leva os vizinhos mais próximos até a
+capacidade do entregador. Um lote só sai cheio ou quando seu pedido mais
+antigo chega à espera máxima; antes disso fica aguardando companhia.
+
+agrupar_entregas não acessa o banco, então a mesma regra roda na simulação
+(benchmarks/simulacao_entregas.py) e no DespachoEntregas.
+"""
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from BancoDeDados import BancoDeDados
+from Cozinha import _para_epoch
+from Metricas import REGISTRO, RegistroMetricas
+
+STATUS_SAIDA = 'Saiu para entrega'
+DIGITOS_PREFIXO = 5
+DIGITOS_APROXIMACAO = 4
+
+
+def prefixo_cep(cep: str) -> str:
+    return ''.join(filter(str.isdigit, cep or ''))[:DIGITOS_PREFIXO]
+
+
+def _vizinhos(prefixo: str, vizinhanca: Dict[str, Dict[str, float]], raio_km: float,
+              por_aproximacao: Dict[str, List[str]]) -> List[Tuple[float, str]]:
+    """(distância, prefixo) dos prefixos a até raio_km de `prefixo`, incluindo ele mesmo."""
+    cadastrados = vizinhanca.get(prefixo)
+    if cadastrados is None:
+        # Sem vizinhança pré-calculada: mesmo prefixo de 4 dígitos conta como no limite do raio
+        return [(0.0 if outro == prefixo else raio_km, outro)
+                for outro in por_aproximacao[prefixo[:DIGITOS_APROXIMACAO]]]
+    vizinhos = [(distancia, outro) for outro, distancia in cadastrados.items() if distancia <= raio_km]
+    if prefixo not in cadastrados:
+        vizinhos.append((0.0, prefixo))
+    return vizinhos
+
+
+def agrupar_entregas(pedidos: Iterable[Dict], vizinhanca: Dict[str, Dict[str, float]], agora: float,
+                     capacidade: int = 4, espera_maxima: float = 900.0,
+                     raio_km: float = 2.0) -> List[Dict]:
+    """
+    Propõe lotes de entrega.
+
+    Args:
+        pedidos: Dicionários com 'id', 'cep' e 'pronto_desde' (epoch em segundos)
+        vizinhanca: {prefixo: {vizinho: distancia_km}}, como carregar_vizinhanca_cep()
+        agora: Instante da decisão (epoch em segundos)
+        capacidade: Pedidos por entregador
+        espera_maxima: Segundos que um pedido pronto pode esperar por companhia
+        raio_km: Distância máxima entre o primeiro pedido do lote e os demais
+
+    Returns:
+        Lotes do mais antigo para o mais novo: {'pedidos' (IDs), 'ceps', 'espera_s'
+        (do pedido mais antigo), 'distancia_km' (maior distância ao primeiro),
+        'pronto' e 'motivo' ('capacidade', 'espera' ou 'aguardando')}
+    """
+    pedidos = sorted(pedidos, key=lambda pedido: pedido['pronto_desde'])
+    por_prefixo: Dict[str, List[Dict]] = defaultdict(list)
+    por_aproximacao: Dict[str, List[str]] = defaultdict(list)
+    for pedido in pedidos:
+        prefixo = prefixo_cep(pedido['cep'])
+        if prefixo not in por_prefixo:
+            por_aproximacao[prefixo[:DIGITOS_APROXIMACAO]].append(prefixo)
+        por_prefixo[prefixo].append(pedido)
+
+    livres = {pedido['id'] for pedido in pedidos}
+    lotes = []
+    for semente in pedidos:
+        if semente['id'] not in livres:
+            continue
+        livres.discard(semente['id'])
+        candidatos = [
+            (distancia, pedido['pronto_desde'], pedido['id'], pedido)
+            for distancia, prefixo in _vizinhos(prefixo_cep(semente['cep']), vizinhanca, raio_km, por_aproximacao)
+            for pedido in por_prefixo.get(prefixo, ())
+            if pedido['id'] in livres
+        ]
+        candidatos.sort(key=lambda candidato: candidato[:3])
+        escolhidos = candidatos[:capacidade - 1]
+        for _, _, pedido_id, _ in escolhidos:
+            livres.discard(pedido_id)
+
+        membros = [semente] + [candidato[3] for candidato in escolhidos]
+        espera = agora - semente['pronto_desde']
+        if len(membros) >= capacidade:
+            motivo = 'capacidade'
+        elif espera >= espera_maxima:
+            motivo = 'espera'
+        else:
+            motivo = 'aguardando'
+        lotes.append({
+            'pedidos': [pedido['id'] for pedido in membros],
+            'ceps': [pedido['cep'] for pedido in membros],
+            'espera_s': round(espera, 1),
+            'distancia_km': max((candidato[0] for candidato in escolhidos), default=0.0),
+            'pronto': motivo != 'aguardando',
+            'motivo': motivo,
+        })
+    return lotes
+
+
+class DespachoEntregas:
+    def __init__(self, db: BancoDeDados, capacidade: int = 4, espera_maxima: float = 900.0,
+                 raio_km: float = 2.0, status_prontos: Tuple[str, ...] = ('Assando',),
+                 metricas: Optional[RegistroMetricas] = None) -> None:
+        """
+        Args:
+            db: Banco com os pedidos e a tabela vizinhanca_cep
+            capacidade: Pedidos por entregador
+            espera_maxima: Segundos que um pedido pronto pode esperar por companhia
+            raio_km: Distância máxima entre pedidos do mesmo lote
+            status_prontos: Status em que o pedido está pronto para sair
+            metricas: Onde registrar as métricas (padrão: Metricas.REGISTRO)
+        """
+        self.db = db
+        self.capacidade = capacidade
+        self.espera_maxima = espera_maxima
+        self.raio_km = raio_km
+        self.status_prontos = status_prontos
+        self.vizinhanca = db.carregar_vizinhanca_cep()
+        # Momento em que cada pedido ficou pronto, visto pelos eventos de status
+        self._pronto_desde: Dict[int, float] = {}
+        self._lock = threading.Lock()
+        metricas = metricas or REGISTRO
+        self._lotes = metricas.contador(
+            'pizzap_entregas_lotes_total', 'Lotes despachados, por motivo da saída', ('motivo',))
+        self._tamanho = metricas.histograma(
+            'pizzap_entregas_lote_pedidos', 'Pedidos por lote despachado', limites=(1, 2, 3, 4, 6, 8))
+        db.adicionar_ouvinte_status(self._ao_mudar_status)
+
+    def recarregar_vizinhanca(self) -> None:
+        self.vizinhanca = self.db.carregar_vizinhanca_cep()
+
+    def _ao_mudar_status(self, eventos: List[Dict]) -> None:
+        with self._lock:
+            for evento in eventos:
+                if evento['status'] in self.status_prontos:
+                    self._pronto_desde.setdefault(evento['pedido_id'], evento['momento'])
+                else:
+                    self._pronto_desde.pop(evento['pedido_id'], None)
+
+    def propor_lotes(self, agora: Optional[float] = None) -> List[Dict]:
+        """Lotes para os pedidos prontos agora, sem alterar nada."""
+        pedidos = self.db.buscar_pedidos_para_entrega(self.status_prontos)
+        with self._lock:
+            for pedido in pedidos:
+                # Pedidos que ficaram prontos antes deste processo subir: conta desde a criação
+                pedido['pronto_desde'] = self._pronto_desde.get(pedido['id']) or _para_epoch(pedido['data_pedido'])
+        return agrupar_entregas(pedidos, self.vizinhanca, agora or time.time(), self.capacidade,
+                                self.espera_maxima, self.raio_km)
+
+    def despachar(self, pedido_ids: List[int], motivo: str = 'manual') -> Optional[List[int]]:
+        """
+        Marca o lote inteiro como 'Saiu para entrega' numa transação. Se algum
+        pedido já saiu ou não está pronto, nenhum é alterado e retorna None.
+        """
+        alterados = self.db.atualizar_status_pedidos(
+            {pedido_id: STATUS_SAIDA for pedido_id in pedido_ids}, apenas_de=self.status_prontos)
+        if alterados:
+            self._lotes.incrementar(motivo)
+            self._tamanho.observar(len(alterados))
+        return alterados
+
+    def despachar_prontos(self, agora: Optional[float] = None) -> List[Dict]:
+        """Despacha todos os lotes cheios ou com espera vencida; retorna os lotes que saíram."""
+        despachados = []
+        for lote in self.propor_lotes(agora):
+            if lote['pronto'] and self.despachar(lote['pedidos'], lote['motivo']) is not None:
+                despachados.append(lote)
+        return despachados
+
+
+if __name__ == "__main__":
+    import csv
+    import sys
+
+    if len(sys.argv) < 2:
+        print("Uso: python Entregas.py <vizinhanca.csv: prefixo,vizinho,distancia_km> [banco]")
+        sys.exit(1)
+    with open(sys.argv[1], encoding='utf-8-sig', newline='') as arquivo:
+        gravadas = BancoDeDados(sys.argv[2] if len(sys.argv) > 2 else 'pizzaria.db').importar_vizinhanca_cep(
+            (linha['prefixo'], linha['vizinho'], linha['distancia_km']) for linha in csv.DictReader(arquivo)
+        )
+    print(f"{gravadas} pares de vizinhança gravados." if gravadas is not None else "Falha ao importar.")
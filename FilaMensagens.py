@@ -0,0 +1,384 @@
+"""
+Processamento assíncrono do webhook: fila durável de entrada e envio de respostas.
+
+O webhook só grava a mensagem em mensagens_entrada e responde na hora; um pool
+de threads consome a fila. As respostas de cada mensagem vão para
+mensagens_saida na mesma transação que a retira da entrada, então uma falha de
+envio nunca faz a mensagem (e um pedido) ser processada de novo: só o envio é
+repetido, com backoff, até MAXIMO_TENTATIVAS, e depois fica em 'erro'.
+
+Ordem por número: cada número cai sempre na mesma partição (crc32 % workers);
+uma mensagem de entrada só é reservada depois de todas as anteriores do mesmo
+número terem sido processadas ou desistido (uma que falhou e espera o backoff
+segura as seguintes), e o mesmo vale para cada resposta. As duas regras também valem entre processos que
+compartilham o arquivo.
+"""
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Callable, List, Optional, Tuple
+
+MAXIMO_TENTATIVAS = 3
+ESPERA_BASE = 2.0  # segundos antes da 2ª tentativa; dobra a cada nova falha
+
+
+class EnviadorMensagens:
+    """Interface de saída: entrega um texto a um número de WhatsApp."""
+
+    def enviar(self, numero: str, texto: str) -> bool:
+        raise NotImplementedError
+
+
+class EnviadorMemoria(EnviadorMensagens):
+    """Guarda as mensagens enviadas; útil em desenvolvimento e testes."""
+
+    def __init__(self) -> None:
+        self.enviadas: List[Tuple[str, str]] = []
+        self._lock = threading.Lock()
+
+    def enviar(self, numero: str, texto: str) -> bool:
+        with self._lock:
+            self.enviadas.append((numero, texto))
+        return True
+
+
+class EnviadorTwilio(EnviadorMensagens):
+    """
+    Envia pela API REST de mensagens do Twilio.
+
+    `url_api` pode apontar para um servidor local que imita a API.
+    """
+
+    def __init__(self, conta_sid: str, token: str, remetente: str,
+                 url_api: str = 'https://api.twilio.com', timeout: Tuple[float, float] = (2.0, 5.0)) -> None:
+        import requests  # só carregado quando o modo assíncrono está ligado
+
+        self.remetente = remetente
+        self.timeout = timeout
+        self.url = f"{url_api.rstrip('/')}/2010-04-01/Accounts/{conta_sid}/Messages.json"
+        self._sessao = requests.Session()
+        self._sessao.auth = (conta_sid, token)
+        self._erro_rede = requests.RequestException
+
+    def enviar(self, numero: str, texto: str) -> bool:
+        try:
+            response = self._sessao.post(self.url, data={
+                'From': f'whatsapp:{self.remetente}',
+                'To': f'whatsapp:{numero}',
+                'Body': texto
+            }, timeout=self.timeout)
+            if response.status_code < 300:
+                return True
+            print(f"Erro ao enviar mensagem: HTTP {response.status_code} {response.text[:200]}")
+        except self._erro_rede as e:
+            print(f"Erro ao enviar mensagem: {e}")
+        return False
+
+
+class FilaMensagens:
+    def __init__(self, caminho: str, processar: Callable[[str, str], List[str]],
+                 enviador: EnviadorMensagens, workers: int = 4, intervalo_consulta: float = 0.5,
+                 timeout_processamento: float = 60.0, espera_base: float = ESPERA_BASE,
+                 checkpoint_automatico: bool = True) -> None:
+        """
+        Args:
+            caminho: Arquivo SQLite da fila (pode ser o pizzaria.db)
+            processar: Função processar(numero, corpo) chamada para cada mensagem;
+                retorna os textos de resposta, na ordem de envio
+            enviador: Por onde as respostas saem
+            workers: Threads consumidoras; também é o número de partições
+            intervalo_consulta: Espera máxima entre consultas quando a fila está vazia
+            timeout_processamento: Mensagens "processando" (ou respostas "enviando") há
+                mais tempo voltam para a fila
+            espera_base: Espera após a primeira falha; dobra a cada tentativa seguinte
+            checkpoint_automatico: False quando outro componente já faz o checkpoint
+                do WAL deste arquivo (ex.: BancoDeDados com intervalo_checkpoint)
+        """
+        self.caminho = caminho
+        self.processar = processar
+        self.enviador = enviador
+        self.workers = workers
+        self.intervalo_consulta = intervalo_consulta
+        self.timeout_processamento = timeout_processamento
+        self.espera_base = espera_base
+        self.checkpoint_automatico = checkpoint_automatico
+        self._local = threading.local()
+        self._avisos = [threading.Event() for _ in range(workers)]
+        self._parar = threading.Event()
+        self._lock_recuperacao = threading.Lock()
+        self._proxima_recuperacao = 0.0
+        self._threads: List[threading.Thread] = []
+        conn = self._conexao()
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS mensagens_entrada (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            numero TEXT NOT NULL,
+            corpo TEXT NOT NULL,
+            message_sid TEXT,
+            particao INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pendente'
+                CHECK(status IN ('pendente', 'processando', 'erro')),
+            tentativas INTEGER NOT NULL DEFAULT 0,
+            recebida_em REAL NOT NULL,
+            reservada_em REAL,
+            disponivel_em REAL NOT NULL DEFAULT 0
+        )
+        ''')
+        colunas = {linha[1] for linha in conn.execute("PRAGMA table_info(mensagens_entrada)")}
+        if 'disponivel_em' not in colunas:  # fila criada antes do backoff entre tentativas
+            conn.execute("ALTER TABLE mensagens_entrada ADD COLUMN disponivel_em REAL NOT NULL DEFAULT 0")
+        conn.execute('''CREATE INDEX IF NOT EXISTS idx_mensagens_entrada_particao
+                        ON mensagens_entrada (particao, status, id)''')
+        conn.execute('''CREATE INDEX IF NOT EXISTS idx_mensagens_entrada_numero
+                        ON mensagens_entrada (numero, status)''')
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS mensagens_saida (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            numero TEXT NOT NULL,
+            texto TEXT NOT NULL,
+            particao INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pendente'
+                CHECK(status IN ('pendente', 'enviando', 'erro')),
+            tentativas INTEGER NOT NULL DEFAULT 0,
+            criada_em REAL NOT NULL,
+            reservada_em REAL,
+            disponivel_em REAL NOT NULL DEFAULT 0
+        )
+        ''')
+        conn.execute('''CREATE INDEX IF NOT EXISTS idx_mensagens_saida_particao
+                        ON mensagens_saida (particao, status, id)''')
+        conn.execute('''CREATE INDEX IF NOT EXISTS idx_mensagens_saida_numero
+                        ON mensagens_saida (numero, id)''')
+
+    def _conexao(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.caminho, timeout=10.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            if not self.checkpoint_automatico:
+                conn.execute("PRAGMA wal_autocheckpoint = 0")  # enfileirar roda na thread da requisição
+            self._local.conn = conn
+        return conn
+
+    def _particao(self, numero: str) -> int:
+        return zlib.crc32(numero.encode('utf-8')) % self.workers
+
+    def enfileirar(self, numero: str, corpo: str, message_sid: Optional[str] = None) -> int:
+        """Grava a mensagem de forma durável e acorda o worker da partição."""
+        particao = self._particao(numero)
+        cursor = self._conexao().execute('''
+        INSERT INTO mensagens_entrada (numero, corpo, message_sid, particao, recebida_em)
+        VALUES (?, ?, ?, ?, ?)
+        ''', (numero, corpo, message_sid, particao, time.time()))
+        self._avisos[particao].set()
+        return cursor.lastrowid
+
+    def profundidade(self) -> int:
+        """Mensagens pendentes ou em processamento."""
+        return self._conexao().execute(
+            "SELECT COUNT(*) FROM mensagens_entrada WHERE status != 'erro'"
+        ).fetchone()[0]
+
+    def profundidade_saida(self) -> int:
+        """Respostas ainda não enviadas (sem contar as que desistiram)."""
+        return self._conexao().execute(
+            "SELECT COUNT(*) FROM mensagens_saida WHERE status != 'erro'"
+        ).fetchone()[0]
+
+    def _reservar(self, particao: int) -> Optional[Tuple[int, str, str, float]]:
+        conn = self._conexao()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            linha = conn.execute('''
+            SELECT id, numero, corpo FROM mensagens_entrada m
+            WHERE particao = ? AND status = 'pendente' AND disponivel_em <= ?
+              AND NOT EXISTS (
+                  SELECT 1 FROM mensagens_entrada p
+                  WHERE p.numero = m.numero AND p.id < m.id AND p.status != 'erro'
+              )
+            ORDER BY id
+            LIMIT 1
+            ''', (particao, time.time())).fetchone()
+            if linha is not None:
+                reservada_em = time.time()
+                conn.execute('''
+                UPDATE mensagens_entrada
+                SET status = 'processando', reservada_em = ?, tentativas = tentativas + 1
+                WHERE id = ?
+                ''', (reservada_em, linha[0]))
+                linha = (*linha, reservada_em)
+            conn.execute("COMMIT")
+            return linha
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _concluir(self, mensagem_id: int, reservada_em: float, respostas: Optional[List[str]]) -> None:
+        """
+        Encerra a reserva: com `respostas` (sucesso), retira a mensagem da entrada
+        e grava as respostas na saída numa única transação; com None, agenda uma
+        nova tentativa. Se a mensagem foi devolvida por recuperar_travadas
+        (reservada_em mudou), a nova reserva não é tocada.
+        """
+        conn = self._conexao()
+        if respostas is not None:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursor = conn.execute(
+                    "DELETE FROM mensagens_entrada WHERE id = ? AND reservada_em = ? RETURNING numero, particao",
+                    (mensagem_id, reservada_em))
+                linha = cursor.fetchone()
+                if linha is not None:
+                    agora = time.time()
+                    conn.executemany('''
+                    INSERT INTO mensagens_saida (numero, texto, particao, criada_em) VALUES (?, ?, ?, ?)
+                    ''', [(linha[0], texto, linha[1], agora) for texto in respostas])
+                conn.execute("COMMIT")
+            except sqlite3.Error:
+                conn.execute("ROLLBACK")
+                raise
+        else:
+            # Backoff exponencial: a mensagem só volta a ser reservada depois da espera
+            conn.execute('''
+            UPDATE mensagens_entrada
+            SET status = CASE WHEN tentativas >= ? THEN 'erro' ELSE 'pendente' END,
+                disponivel_em = ? * (1 << (tentativas - 1)) + ?
+            WHERE id = ? AND status = 'processando' AND reservada_em = ?
+            ''', (MAXIMO_TENTATIVAS, self.espera_base, time.time(), mensagem_id, reservada_em))
+
+    def recuperar_travadas(self) -> int:
+        """
+        Devolve à fila as mensagens reservadas por um worker que morreu ou travou;
+        as que já gastaram todas as tentativas vão para 'erro'.
+        """
+        cursor = self._conexao().execute('''
+        UPDATE mensagens_entrada
+        SET status = CASE WHEN tentativas >= ? THEN 'erro' ELSE 'pendente' END
+        WHERE status = 'processando' AND reservada_em < ?
+        ''', (MAXIMO_TENTATIVAS, time.time() - self.timeout_processamento))
+        devolvidas = cursor.rowcount
+        cursor = self._conexao().execute('''
+        UPDATE mensagens_saida
+        SET status = CASE WHEN tentativas >= ? THEN 'erro' ELSE 'pendente' END
+        WHERE status = 'enviando' AND reservada_em < ?
+        ''', (MAXIMO_TENTATIVAS, time.time() - self.timeout_processamento))
+        return devolvidas + cursor.rowcount
+
+    def _recuperar_periodicamente(self) -> None:
+        """
+        recuperar_travadas no máximo uma vez por intervalo_consulta entre todas
+        as threads: uma reserva presa em 'processando' bloqueia o número inteiro.
+        """
+        with self._lock_recuperacao:
+            agora = time.time()
+            if agora < self._proxima_recuperacao:
+                return
+            self._proxima_recuperacao = agora + self.intervalo_consulta
+        devolvidas = self.recuperar_travadas()
+        if devolvidas:
+            print(f"Fila de mensagens: {devolvidas} mensagens travadas voltaram para a fila")
+
+    def processar_pendentes(self, particao: int) -> int:
+        """Processa tudo o que estiver disponível na partição; retorna quantas mensagens."""
+        processadas = 0
+        while not self._parar.is_set():
+            linha = self._reservar(particao)
+            if linha is None:
+                return processadas
+            mensagem_id, numero, corpo, reservada_em = linha
+            try:
+                respostas = list(self.processar(numero, corpo) or [])
+            except Exception as e:
+                print(f"Erro ao processar mensagem {mensagem_id}: {e}")
+                respostas = None
+            self._concluir(mensagem_id, reservada_em, respostas)
+            self.enviar_pendentes(particao)
+            processadas += 1
+        return processadas
+
+    def _reservar_envio(self, particao: int) -> Optional[Tuple[int, str, str, float]]:
+        conn = self._conexao()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Só a resposta mais antiga ainda viva de cada número pode sair
+            linha = conn.execute('''
+            SELECT id, numero, texto FROM mensagens_saida s
+            WHERE particao = ? AND status = 'pendente' AND disponivel_em <= ?
+              AND NOT EXISTS (
+                  SELECT 1 FROM mensagens_saida a
+                  WHERE a.numero = s.numero AND a.id < s.id AND a.status != 'erro'
+              )
+            ORDER BY id
+            LIMIT 1
+            ''', (particao, time.time())).fetchone()
+            if linha is not None:
+                reservada_em = time.time()
+                conn.execute('''
+                UPDATE mensagens_saida
+                SET status = 'enviando', reservada_em = ?, tentativas = tentativas + 1
+                WHERE id = ?
+                ''', (reservada_em, linha[0]))
+                linha = (*linha, reservada_em)
+            conn.execute("COMMIT")
+            return linha
+        except sqlite3.Error:
+            conn.execute("ROLLBACK")
+            raise
+
+    def enviar_pendentes(self, particao: int) -> int:
+        """Envia as respostas disponíveis da partição; retorna quantas saíram."""
+        enviadas = 0
+        while not self._parar.is_set():
+            linha = self._reservar_envio(particao)
+            if linha is None:
+                return enviadas
+            resposta_id, numero, texto, reservada_em = linha
+            try:
+                sucesso = self.enviador.enviar(numero, texto)
+            except Exception as e:
+                print(f"Erro ao enviar resposta {resposta_id}: {e}")
+                sucesso = False
+            conn = self._conexao()
+            if sucesso:
+                conn.execute("DELETE FROM mensagens_saida WHERE id = ? AND reservada_em = ?",
+                             (resposta_id, reservada_em))
+                enviadas += 1
+            else:
+                conn.execute('''
+                UPDATE mensagens_saida
+                SET status = CASE WHEN tentativas >= ? THEN 'erro' ELSE 'pendente' END,
+                    disponivel_em = ? * (1 << (tentativas - 1)) + ?
+                WHERE id = ? AND status = 'enviando' AND reservada_em = ?
+                ''', (MAXIMO_TENTATIVAS, self.espera_base, time.time(), resposta_id, reservada_em))
+        return enviadas
+
+    def _executar(self, particao: int) -> None:
+        aviso = self._avisos[particao]
+        while not self._parar.is_set():
+            aviso.clear()
+            try:
+                self._recuperar_periodicamente()
+                self.processar_pendentes(particao)
+                self.enviar_pendentes(particao)  # novas tentativas de envio
+            except sqlite3.Error as e:
+                print(f"Erro na fila de mensagens: {e}")
+            aviso.wait(self.intervalo_consulta)
+
+    def iniciar(self) -> None:
+        for particao in range(self.workers):
+            thread = threading.Thread(
+                target=self._executar, args=(particao,),
+                name=f'fila-mensagens-{particao}', daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def parar(self, timeout: float = 5.0) -> None:
+        self._parar.set()
+        for aviso in self._avisos:
+            aviso.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads.clear()
@@ -0,0 +1,168 @@
+"""
+Leitura de arquivos de cardápio para BancoDeDados.importar_cardapio.
+
+Formatos aceitos, pela extensão:
+
+- .csv: cabeçalho com nome, descricao, ingredientes, categoria, preco_p,
+  preco_m, preco_g e, opcionalmente, disponivel. Preços aceitam vírgula decimal.
+- .json: um array de objetos com as mesmas chaves; os preços também podem vir
+  em "precos": {"P": 35.9, "M": 45.9}.
+- .jsonl / .ndjson: um objeto por linha.
+
+Os arquivos são lidos item a item (o array JSON inclusive), então o tamanho
+do cardápio não pesa na memória.
+"""
+import csv
+import json
+import os
+from typing import Dict, Iterator, Optional, Union
+
+TAMANHOS_PRECO = ('P', 'M', 'G')
+VERDADEIROS = {'1', 'sim', 's', 'true', 'verdadeiro', 'yes', 'y'}
+FALSOS = {'0', 'nao', 'não', 'n', 'false', 'falso', 'no'}
+
+
+def _objetos_json(arquivo, tamanho_bloco: int = 65536) -> Iterator[Dict]:
+    """Objetos de um array JSON, decodificados à medida que o arquivo é lido."""
+    decodificador = json.JSONDecoder()
+    buffer = ''
+    dentro = False
+    for bloco in iter(lambda: arquivo.read(tamanho_bloco), ''):
+        buffer += bloco
+        while True:
+            buffer = buffer.lstrip()
+            if not dentro:
+                if not buffer:
+                    break
+                if buffer[0] != '[':
+                    raise ValueError("o cardápio JSON deve ser um array de objetos")
+                buffer, dentro = buffer[1:], True
+            elif buffer.startswith(','):
+                buffer = buffer[1:]
+            elif buffer.startswith(']'):
+                return
+            else:
+                try:
+                    objeto, fim = decodificador.raw_decode(buffer)
+                except json.JSONDecodeError:
+                    break  # objeto ainda incompleto: lê o próximo bloco
+                yield objeto
+                buffer = buffer[fim:]
+    raise ValueError("array JSON incompleto")
+
+
+def _texto(item: Dict, chave: str, minimo: int) -> str:
+    valor = str(item.get(chave) or '').strip()
+    if len(valor) < minimo:
+        raise ValueError(f"'{chave}' ausente ou com menos de {minimo} caracteres")
+    return valor
+
+
+def _preco(valor: Union[str, float, int, None]) -> Optional[float]:
+    if valor is None or (isinstance(valor, str) and not valor.strip()):
+        return None
+    if isinstance(valor, str):
+        valor = valor.strip().replace('R$', '').strip()
+        if ',' in valor:
+            valor = valor.replace('.', '').replace(',', '.')
+    preco = round(float(valor), 2)
+    if preco <= 0:
+        raise ValueError(f"preço deve ser positivo: {valor}")
+    return preco
+
+
+def _resumo(valor, limite: int = 50) -> str:
+    texto = json.dumps(valor, ensure_ascii=False)
+    return texto if len(texto) <= limite else texto[:limite] + '...'
+
+
+def _com_linha(item, linha: int) -> Dict:
+    """Acrescenta 'linha' ao item; um valor que não é objeto vai em '_invalido'."""
+    if isinstance(item, dict):
+        return {**item, 'linha': linha}
+    return {'_invalido': item, 'linha': linha}
+
+
+def normalizar_item(item: Dict) -> Dict:
+    """
+    Valida um item bruto de ler_cardapio com as mesmas regras das tabelas
+    pizzas e precos.
+
+    Returns:
+        {'nome', 'descricao', 'ingredientes', 'categoria', 'disponivel' (0/1),
+         'precos': {tamanho: valor}}
+
+    Raises:
+        ValueError: Item incompleto ou com valores inválidos
+    """
+    if not isinstance(item, dict):
+        raise ValueError(f"item não é um objeto: {_resumo(item)}")
+    if '_invalido' in item:  # marcado por ler_cardapio
+        raise ValueError(f"item não é um objeto: {_resumo(item['_invalido'])}")
+    disponivel = item.get('disponivel')
+    if disponivel is None or (isinstance(disponivel, str) and not disponivel.strip()):
+        disponivel = 1
+    elif isinstance(disponivel, str):
+        texto = disponivel.strip().lower()
+        if texto not in VERDADEIROS | FALSOS:
+            raise ValueError(f"'disponivel' inválido: {disponivel}")
+        disponivel = 1 if texto in VERDADEIROS else 0
+    else:
+        disponivel = 1 if disponivel else 0
+
+    brutos = item.get('precos') or {}
+    if not isinstance(brutos, dict):
+        raise ValueError("'precos' deve ser um objeto {tamanho: valor}")
+    brutos = {str(tamanho).strip().upper(): valor for tamanho, valor in brutos.items()}
+    for tamanho in TAMANHOS_PRECO:
+        coluna = item.get(f'preco_{tamanho.lower()}')
+        if coluna is not None:
+            brutos.setdefault(tamanho, coluna)
+    invalidos = set(brutos) - set(TAMANHOS_PRECO)
+    if invalidos:
+        raise ValueError(f"tamanho inválido: {', '.join(sorted(invalidos))}")
+    precos = {}
+    for tamanho, valor in brutos.items():
+        try:
+            preco = _preco(valor)
+        except (TypeError, ValueError):
+            raise ValueError(f"preço {tamanho} inválido: {valor}") from None
+        if preco is not None:
+            precos[tamanho] = preco
+    if not precos:
+        raise ValueError("nenhum preço informado")
+
+    return {
+        'nome': _texto(item, 'nome', 3),
+        'descricao': _texto(item, 'descricao', 10),
+        'ingredientes': _texto(item, 'ingredientes', 5),
+        'categoria': _texto(item, 'categoria', 1),
+        'disponivel': disponivel,
+        'precos': precos,
+    }
+
+
+def ler_cardapio(caminho: str, formato: Optional[str] = None) -> Iterator[Dict]:
+    """
+    Lê os itens brutos de um arquivo de cardápio, cada um com a chave 'linha'
+    (linha do CSV/JSONL ou posição no array JSON) para o relatório de erros.
+
+    Args:
+        caminho: Arquivo .csv, .json, .jsonl ou .ndjson
+        formato: 'csv', 'json' ou 'jsonl'; por padrão, deduzido da extensão
+    """
+    formato = formato or os.path.splitext(caminho)[1].lstrip('.').lower()
+    with open(caminho, encoding='utf-8-sig', newline='') as arquivo:
+        if formato == 'csv':
+            leitor = csv.DictReader(arquivo)
+            for item in leitor:
+                yield {**item, 'linha': leitor.line_num}
+        elif formato == 'json':
+            for posicao, item in enumerate(_objetos_json(arquivo), 1):
+                yield _com_linha(item, posicao)
+        elif formato in ('jsonl', 'ndjson'):
+            for numero, texto in enumerate(arquivo, 1):
+                if texto.strip():
+                    yield _com_linha(json.loads(texto), numero)
+        else:
+            raise ValueError(f"Formato de cardápio não suportado: {formato}")
@@ -0,0 +1,119 @@
+"""
+Índice offline de CEPs em arquivo binário ordenado, lido via mmap.
+
+Formato do arquivo (little-endian):
+    cabeçalho  : MAGICO (8 bytes) + quantidade de CEPs (uint32) + reservado (uint32)
+    registros  : quantidade x (cep uint32, deslocamento uint32), ordenados por CEP
+    dados      : para cada deslocamento, tamanho (uint16) + campos UTF-8 separados por \\x1f
+
+Uso:
+    python IndiceCep.py ceps.csv ceps.idx
+
+O CSV precisa das colunas cep, logradouro, bairro, cidade (ou localidade) e uf.
+"""
+import csv
+import mmap
+import struct
+import sys
+from typing import Dict, Iterable, Optional
+
+MAGICO = b'CEPIDX1\x00'
+CABECALHO = struct.Struct('<8sII')
+REGISTRO = struct.Struct('<II')
+TAMANHO = struct.Struct('<H')
+SEPARADOR = '\x1f'
+CAMPOS = ('logradouro', 'bairro', 'localidade', 'uf')
+
+
+def construir_indice(linhas: Iterable[Dict[str, str]], destino: str) -> int:
+    """
+    Gera o arquivo de índice a partir de linhas no formato do CSV.
+
+    Endereços idênticos são gravados uma única vez no bloco de dados.
+
+    Returns:
+        Quantidade de CEPs gravados
+    """
+    registros = {}
+    blocos: Dict[bytes, int] = {}
+    dados = bytearray()
+    for linha in linhas:
+        cep = ''.join(filter(str.isdigit, linha.get('cep') or ''))
+        if len(cep) != 8:
+            continue
+        campos = (
+            linha.get('logradouro') or '',
+            linha.get('bairro') or '',
+            linha.get('cidade') or linha.get('localidade') or '',
+            linha.get('uf') or ''
+        )
+        conteudo = SEPARADOR.join(c.strip() for c in campos).encode('utf-8')
+        deslocamento = blocos.get(conteudo)
+        if deslocamento is None:
+            deslocamento = blocos[conteudo] = len(dados)
+            dados += TAMANHO.pack(len(conteudo)) + conteudo
+        registros[int(cep)] = deslocamento
+
+    with open(destino, 'wb') as arquivo:
+        arquivo.write(CABECALHO.pack(MAGICO, len(registros), 0))
+        for cep in sorted(registros):
+            arquivo.write(REGISTRO.pack(cep, registros[cep]))
+        arquivo.write(dados)
+    return len(registros)
+
+
+def construir_indice_csv(caminho_csv: str, destino: str) -> int:
+    with open(caminho_csv, newline='', encoding='utf-8') as arquivo:
+        return construir_indice(csv.DictReader(arquivo), destino)
+
+
+class IndiceCep:
+    """Consulta o arquivo de índice por busca binária, sem carregá-lo na memória."""
+
+    def __init__(self, caminho: str) -> None:
+        self.caminho = caminho
+        with open(caminho, 'rb') as arquivo:
+            self._mapa = mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ)
+        magico, self.quantidade, _ = CABECALHO.unpack_from(self._mapa, 0)
+        if magico != MAGICO:
+            self._mapa.close()
+            raise ValueError(f"Arquivo de índice de CEP inválido: {caminho}")
+        self._inicio_dados = CABECALHO.size + self.quantidade * REGISTRO.size
+
+    def buscar(self, cep: str) -> Optional[Dict[str, str]]:
+        """Retorna o endereço do CEP no formato do ViaCEP, ou None se não estiver no índice."""
+        if len(cep) != 8 or not cep.isdigit():
+            return None
+        alvo = int(cep)
+        mapa = self._mapa
+        baixo, alto = 0, self.quantidade - 1
+        while baixo <= alto:
+            meio = (baixo + alto) // 2
+            chave, deslocamento = REGISTRO.unpack_from(mapa, CABECALHO.size + meio * REGISTRO.size)
+            if chave < alvo:
+                baixo = meio + 1
+            elif chave > alvo:
+                alto = meio - 1
+            else:
+                inicio = self._inicio_dados + deslocamento
+                (tamanho,) = TAMANHO.unpack_from(mapa, inicio)
+                inicio += TAMANHO.size
+                campos = mapa[inicio:inicio + tamanho].decode('utf-8').split(SEPARADOR)
+                endereco = dict(zip(CAMPOS, campos))
+                endereco['cep'] = cep
+                return endereco
+        return None
+
+    def __len__(self) -> int:
+        return self.quantidade
+
+    def fechar(self) -> None:
+        self._mapa.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Uso: python IndiceCep.py <ceps.csv> <destino.idx>")
+        sys.exit(1)
+    total = construir_indice_csv(sys.argv[1], sys.argv[2])
+    print(f"{total} CEPs gravados em {sys.argv[2]}")
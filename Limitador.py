@@ -0,0 +1,106 @@
+"""
+Limite de taxa do webhook por número e global, com baldes de fichas (token bucket).
+
+Cada número ocupa uma entrada [fichas, último acesso] num OrderedDict em ordem
+de uso. Um balde parado por tempo suficiente para encher de novo é igual a um
+balde novo, então é descartado; o tamanho_maximo limita a memória mesmo sob
+uma avalanche de números diferentes.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from Metricas import REGISTRO, RegistroMetricas
+
+
+class BaldeFichas:
+    """Balde único: `taxa` fichas por segundo, acumulando até `rajada`."""
+
+    def __init__(self, taxa: float, rajada: float) -> None:
+        self.taxa = taxa
+        self.rajada = rajada
+        self._fichas = rajada
+        self._ultimo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consumir(self, fichas: float = 1.0) -> bool:
+        with self._lock:
+            agora = time.monotonic()
+            self._fichas = min(self.rajada, self._fichas + (agora - self._ultimo) * self.taxa)
+            self._ultimo = agora
+            if self._fichas < fichas:
+                return False
+            self._fichas -= fichas
+            return True
+
+
+class LimitadorTaxa:
+    def __init__(self, taxa_numero: float = 1.0, rajada_numero: float = 5.0,
+                 taxa_global: float = 50.0, rajada_global: float = 100.0,
+                 tamanho_maximo: int = 100000,
+                 metricas: Optional[RegistroMetricas] = None) -> None:
+        """
+        Args:
+            taxa_numero: Mensagens por segundo sustentadas por número
+            rajada_numero: Mensagens seguidas aceitas de um número parado
+            taxa_global: Mensagens por segundo somando todos os números
+            rajada_global: Pico global aceito acima da taxa
+            tamanho_maximo: Números acompanhados ao mesmo tempo (os mais antigos saem)
+            metricas: Onde registrar os contadores (padrão: Metricas.REGISTRO)
+        """
+        self.taxa_numero = taxa_numero
+        self.rajada_numero = rajada_numero
+        self.tamanho_maximo = tamanho_maximo
+        # Depois disso parado, o balde está cheio de novo e pode ser esquecido
+        self.tempo_ocioso = rajada_numero / taxa_numero
+        self.balde_global = BaldeFichas(taxa_global, rajada_global)
+        self._baldes: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+        metricas = metricas or REGISTRO
+        self._recusadas = metricas.contador(
+            'pizzap_limitador_recusadas_total', 'Mensagens recusadas pelo limite de taxa', ('motivo',))
+        self._descartados = metricas.contador(
+            'pizzap_limitador_baldes_descartados_total', 'Baldes de números removidos por ociosidade ou limite')
+        metricas.medidor('pizzap_limitador_numeros', 'Números com balde em memória', self.__len__)
+
+    def _limpar(self, agora: float) -> None:
+        descartados = 0
+        while self._baldes:
+            numero, (_, ultimo) = next(iter(self._baldes.items()))
+            if agora - ultimo < self.tempo_ocioso and len(self._baldes) <= self.tamanho_maximo:
+                break
+            del self._baldes[numero]
+            descartados += 1
+        if descartados:
+            self._descartados.incrementar(valor=descartados)
+
+    def permitir(self, numero: str) -> Optional[str]:
+        """
+        Consome uma ficha do número e uma do balde global.
+
+        Returns:
+            None se a mensagem pode seguir, ou o motivo da recusa: 'numero' ou 'global'
+        """
+        with self._lock:
+            agora = time.monotonic()
+            balde = self._baldes.get(numero)
+            if balde is None:
+                balde = self._baldes[numero] = [self.rajada_numero, agora]
+            else:
+                self._baldes.move_to_end(numero)
+                balde[0] = min(self.rajada_numero, balde[0] + (agora - balde[1]) * self.taxa_numero)
+                balde[1] = agora
+            self._limpar(agora)
+            if balde[0] < 1:
+                self._recusadas.incrementar('numero')
+                return 'numero'
+            balde[0] -= 1
+        # O global fica por último: um número já barrado não gasta a cota de todos
+        if not self.balde_global.consumir():
+            self._recusadas.incrementar('global')
+            return 'global'
+        return None
+
+    def __len__(self) -> int:
+        return len(self._baldes)
@@ -0,0 +1,230 @@
+"""
+Métricas em memória exportadas no formato texto do Prometheus (GET /metrics).
+
+Contadores e histogramas guardam os valores separados por thread: cada thread
+só escreve no seu próprio fragmento, então registrar uma medida não pega lock
+nenhum; a exportação soma os fragmentos. Threads que já terminaram têm os
+valores consolidados na exportação seguinte, o que mantém a memória limitada
+mesmo com o servidor criando uma thread por requisição.
+"""
+import bisect
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+TIPO_CONTEUDO = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Limites (em segundos) pensados para consultas SQLite e respostas do webhook
+LIMITES_LATENCIA = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _formatar_rotulos(nomes: Sequence[str], valores: Sequence[str], extra: str = '') -> str:
+    pares = [f'{nome}="{_escapar(valor)}"' for nome, valor in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+
+def _formatar_numero(valor: float) -> str:
+    if valor == float('inf'):
+        return '+Inf'
+    return repr(float(valor)) if valor != int(valor) else str(int(valor))
+
+
+class _Fragmentos:
+    """Células de uma métrica, uma lista de floats por combinação de rótulos e por thread."""
+
+    def __init__(self, largura: int) -> None:
+        self.largura = largura
+        self._por_thread: Dict[int, Dict[tuple, List[float]]] = {}
+        self._consolidado: Dict[tuple, List[float]] = {}
+        self._lock = threading.Lock()  # só a exportação usa
+
+    def celulas(self, rotulos: tuple) -> List[float]:
+        fragmento = self._por_thread.get(threading.get_ident())
+        if fragmento is None:
+            fragmento = self._por_thread.setdefault(threading.get_ident(), {})
+        celulas = fragmento.get(rotulos)
+        if celulas is None:
+            celulas = fragmento[rotulos] = [0.0] * self.largura
+        return celulas
+
+    @staticmethod
+    def _acumular(destino: Dict[tuple, List[float]], rotulos: tuple, celulas: List[float]) -> None:
+        atual = destino.get(rotulos)
+        if atual is None:
+            destino[rotulos] = list(celulas)
+        else:
+            for i, valor in enumerate(celulas):
+                atual[i] += valor
+
+    def somar(self) -> Dict[tuple, List[float]]:
+        with self._lock:
+            vivas = {thread.ident for thread in threading.enumerate()}
+            total = {rotulos: list(celulas) for rotulos, celulas in self._consolidado.items()}
+            for ident, fragmento in list(self._por_thread.items()):
+                encerrada = ident not in vivas
+                for rotulos, celulas in list(fragmento.items()):
+                    self._acumular(total, rotulos, celulas)
+                    if encerrada:
+                        self._acumular(self._consolidado, rotulos, celulas)
+                if encerrada:
+                    del self._por_thread[ident]
+            return total
+
+
+class Contador:
+    tipo = 'counter'
+
+    def __init__(self, nome: str, ajuda: str, rotulos: Sequence[str] = ()) -> None:
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self._valores = _Fragmentos(1)
+
+    def incrementar(self, *rotulos: str, valor: float = 1.0) -> None:
+        self._valores.celulas(rotulos)[0] += valor
+
+    def valores(self) -> Dict[tuple, float]:
+        return {rotulos: celulas[0] for rotulos, celulas in self._valores.somar().items()}
+
+    def exportar(self) -> List[str]:
+        return [f"{self.nome}{_formatar_rotulos(self.rotulos, rotulos)} {_formatar_numero(valor)}"
+                for rotulos, valor in sorted(self.valores().items())]
+
+
+class Histograma:
+    """
+    Distribuição em faixas fixas, como o histogram do Prometheus; os percentis
+    (p99 etc.) são calculados no servidor com histogram_quantile.
+    """
+    tipo = 'histogram'
+
+    def __init__(self, nome: str, ajuda: str, rotulos: Sequence[str] = (),
+                 limites: Sequence[float] = LIMITES_LATENCIA) -> None:
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self.limites = tuple(sorted(limites))
+        # Células: uma por faixa, mais a faixa +Inf, a soma e a contagem
+        self._valores = _Fragmentos(len(self.limites) + 3)
+
+    def observar(self, valor: float, *rotulos: str) -> None:
+        celulas = self._valores.celulas(rotulos)
+        celulas[bisect.bisect_left(self.limites, valor)] += 1
+        celulas[-2] += valor
+        celulas[-1] += 1
+
+    def valores(self) -> Dict[tuple, Dict[str, Union[float, List[float]]]]:
+        """Por rótulos: contagens acumuladas por faixa, soma e contagem."""
+        resultado = {}
+        for rotulos, celulas in self._valores.somar().items():
+            acumulado, faixas = 0.0, []
+            for quantidade in celulas[:-2]:
+                acumulado += quantidade
+                faixas.append(acumulado)
+            resultado[rotulos] = {'faixas': faixas, 'soma': celulas[-2], 'contagem': celulas[-1]}
+        return resultado
+
+    def exportar(self) -> List[str]:
+        linhas = []
+        limites = [*self.limites, float('inf')]
+        for rotulos, dados in sorted(self.valores().items()):
+            for limite, acumulado in zip(limites, dados['faixas']):
+                extra = f'le="{_formatar_numero(limite)}"'
+                linhas.append(f"{self.nome}_bucket{_formatar_rotulos(self.rotulos, rotulos, extra)} "
+                              f"{_formatar_numero(acumulado)}")
+            sufixo = _formatar_rotulos(self.rotulos, rotulos)
+            linhas.append(f"{self.nome}_sum{sufixo} {_formatar_numero(dados['soma'])}")
+            linhas.append(f"{self.nome}_count{sufixo} {_formatar_numero(dados['contagem'])}")
+        return linhas
+
+
+class Medidor:
+    """
+    Valor instantâneo (gauge) lido na hora da exportação.
+
+    `funcao` retorna um número ou, com rótulos, um dict {valor_do_rotulo: número}
+    (tuplas de valores quando há mais de um rótulo).
+    """
+    tipo = 'gauge'
+
+    def __init__(self, nome: str, ajuda: str, funcao: Callable[[], Union[float, Dict]],
+                 rotulos: Sequence[str] = ()) -> None:
+        self.nome = nome
+        self.ajuda = ajuda
+        self.funcao = funcao
+        self.rotulos = tuple(rotulos)
+
+    def exportar(self) -> List[str]:
+        valor = self.funcao()
+        if not self.rotulos:
+            return [f"{self.nome} {_formatar_numero(valor)}"]
+        linhas = []
+        for rotulos, numero in sorted(valor.items()):
+            rotulos = rotulos if isinstance(rotulos, tuple) else (rotulos,)
+            linhas.append(f"{self.nome}{_formatar_rotulos(self.rotulos, rotulos)} {_formatar_numero(numero)}")
+        return linhas
+
+
+Metrica = Union[Contador, Histograma, Medidor]
+
+
+class RegistroMetricas:
+    """
+    Conjunto de métricas de um processo. Pedir de novo uma métrica já
+    registrada devolve a mesma instância (vários BancoDeDados somam juntos);
+    um Medidor registrado de novo troca a função de leitura.
+    """
+
+    def __init__(self) -> None:
+        self._metricas: Dict[str, Metrica] = {}
+        self._lock = threading.Lock()
+
+    def _registrar(self, classe, nome: str, *args, **kwargs) -> Metrica:
+        with self._lock:
+            metrica = self._metricas.get(nome)
+            if metrica is None or classe is Medidor:
+                metrica = self._metricas[nome] = classe(nome, *args, **kwargs)
+            elif not isinstance(metrica, classe):
+                raise ValueError(f"Métrica {nome} já registrada como {metrica.tipo}")
+            return metrica
+
+    def contador(self, nome: str, ajuda: str, rotulos: Sequence[str] = ()) -> Contador:
+        return self._registrar(Contador, nome, ajuda, rotulos)
+
+    def histograma(self, nome: str, ajuda: str, rotulos: Sequence[str] = (),
+                   limites: Sequence[float] = LIMITES_LATENCIA) -> Histograma:
+        return self._registrar(Histograma, nome, ajuda, rotulos, limites)
+
+    def medidor(self, nome: str, ajuda: str, funcao: Callable[[], Union[float, Dict]],
+                rotulos: Sequence[str] = ()) -> Medidor:
+        return self._registrar(Medidor, nome, ajuda, funcao, rotulos)
+
+    def obter(self, nome: str) -> Optional[Metrica]:
+        return self._metricas.get(nome)
+
+    def exportar(self) -> str:
+        """Texto no formato de exposição do Prometheus (versão 0.0.4)."""
+        with self._lock:
+            metricas = sorted(self._metricas.items())
+        linhas: List[str] = []
+        for nome, metrica in metricas:
+            try:
+                amostras = metrica.exportar()
+            except Exception as e:
+                print(f"Erro ao exportar métrica {nome}: {e}")
+                continue
+            ajuda = metrica.ajuda.replace('\\', '\\\\').replace('\n', '\\n')
+            linhas.append(f"# HELP {nome} {ajuda}")
+            linhas.append(f"# TYPE {nome} {metrica.tipo}")
+            linhas.extend(amostras)
+        return '\n'.join(linhas) + '\n'
+
+
+# Registro padrão do processo, usado pelo BancoDeDados e pelo Bot
+REGISTRO = RegistroMetricas()
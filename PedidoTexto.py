@@ -0,0 +1,226 @@
+"""
+Interpreta um pedido inteiro escrito numa mensagem, como
+"2 calabresa G e 1 marguerita M sem cebola".
+
+O IndiceCardapio é montado uma vez por versão do cardápio a partir de
+BancoDeDados.buscar_cardapio_completo(): nomes e apelidos das pizzas ficam
+normalizados (minúsculas, sem acento) num dicionário para busca exata e
+agrupados por tamanho para a busca aproximada, que aceita poucos erros de
+digitação (distância de edição limitada).
+"""
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+TAMANHOS = {
+    'p': 'P', 'pequena': 'P', 'pequeno': 'P', 'broto': 'P',
+    'm': 'M', 'media': 'M', 'medio': 'M',
+    'g': 'G', 'grande': 'G',
+}
+QUANTIDADES = {
+    'um': 1, 'uma': 1, 'dois': 2, 'duas': 2, 'tres': 3, 'quatro': 4, 'cinco': 5,
+    'seis': 6, 'sete': 7, 'oito': 8, 'nove': 9, 'dez': 10,
+}
+SEPARADORES = {',', ';', '+', 'e', 'mais'}
+# Começam uma observação do item ("sem cebola", "com borda")
+OBSERVACOES = {'sem', 'com', 'obs'}
+IGNORADAS = {'pizza', 'pizzas', 'de', 'da', 'do', 'tamanho', 'quero', 'queria', 'manda',
+             'me', 'por', 'favor', 'pf', 'pfv', 'x', 'unidade', 'unidades'}
+QUANTIDADE_MAXIMA = 20
+
+# "2x" e "x2" viram duas palavras ("2", "x"), para a quantidade ser reconhecida
+_PALAVRA = re.compile(r"\d+(?=[xX](?![^\W_]))|(?<=\d)[xX](?![^\W_])|[xX](?=\d)|[^\W_]+|[,;+]")
+
+
+def normalizar(texto: str) -> str:
+    """Minúsculas, sem acentos e com espaços simples."""
+    texto = unicodedata.normalize('NFKD', texto.lower())
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(re.findall(r"[^\W_]+", texto))
+
+
+def distancia_limitada(a: str, b: str, limite: int) -> int:
+    """
+    Distância de Levenshtein entre a e b, parando cedo: qualquer valor acima
+    de `limite` é retornado como limite + 1.
+    """
+    if abs(len(a) - len(b)) > limite:
+        return limite + 1
+    anterior = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        atual = [i] + [0] * len(b)
+        menor = i
+        for j, cb in enumerate(b, 1):
+            atual[j] = min(anterior[j] + 1, atual[j - 1] + 1, anterior[j - 1] + (ca != cb))
+            menor = min(menor, atual[j])
+        if menor > limite:
+            return limite + 1
+        anterior = atual
+    return min(anterior[-1], limite + 1)
+
+
+def erros_aceitos(termo: str) -> int:
+    """Erros de digitação tolerados conforme o tamanho do termo."""
+    if len(termo) <= 3:
+        return 0
+    return 1 if len(termo) <= 6 else 2
+
+
+class IndiceCardapio:
+    def __init__(self, pizzas: List[Dict]) -> None:
+        """
+        Args:
+            pizzas: Cardápio no formato de buscar_cardapio_completo(), com a
+                chave opcional 'apelidos' (lista de textos)
+        """
+        self.pizzas = {pizza['id']: pizza for pizza in pizzas}
+        self._exatos: Dict[str, int] = {}
+        # Busca aproximada: termos agrupados por (número de palavras, tamanho)
+        self._por_tamanho: Dict[Tuple[int, int], List[Tuple[str, int]]] = defaultdict(list)
+        self.maximo_palavras = 1
+
+        # Uma palavra do nome que só aparece numa pizza também a identifica ("catupiry")
+        contagem = defaultdict(set)
+        for pizza in pizzas:
+            for palavra in normalizar(pizza['nome']).split():
+                contagem[palavra].add(pizza['id'])
+
+        for pizza in pizzas:
+            nome = normalizar(pizza['nome'])
+            termos = {nome, ' '.join(p for p in nome.split() if p not in IGNORADAS)}
+            termos.add(' '.join(str(QUANTIDADES.get(p, p)) for p in nome.split()))  # "4 queijos"
+            termos.update(normalizar(apelido) for apelido in pizza.get('apelidos') or ())
+            termos.update(
+                palavra for palavra in nome.split()
+                if len(palavra) >= 4 and palavra not in IGNORADAS and len(contagem[palavra]) == 1
+            )
+            for termo in termos:
+                if termo and termo not in TAMANHOS and termo not in QUANTIDADES:
+                    self._adicionar(termo, pizza['id'])
+
+    def _adicionar(self, termo: str, pizza_id: int) -> None:
+        if self._exatos.setdefault(termo, pizza_id) != pizza_id:
+            return  # termo ambíguo: fica com a primeira pizza e não entra na busca aproximada
+        self._por_tamanho[(len(termo.split()), len(termo))].append((termo, pizza_id))
+        self.maximo_palavras = max(self.maximo_palavras, len(termo.split()))
+
+    def encontrar_termo(self, termo: str) -> Optional[int]:
+        """ID da pizza com nome ou apelido igual a `termo` ou a poucos erros dele."""
+        pizza_id = self._exatos.get(termo)
+        if pizza_id is not None:
+            return pizza_id
+        limite = erros_aceitos(termo)
+        melhor, melhor_distancia = None, limite + 1
+        palavras = len(termo.split())
+        for tamanho in range(len(termo) - limite, len(termo) + limite + 1):
+            for candidato, candidato_id in self._por_tamanho.get((palavras, tamanho), ()):
+                distancia = distancia_limitada(termo, candidato, min(limite, erros_aceitos(candidato)))
+                if distancia < melhor_distancia:
+                    melhor, melhor_distancia = candidato_id, distancia
+        return melhor
+
+    def encontrar(self, palavras: List[str], inicio: int) -> Optional[Tuple[int, int]]:
+        """Maior sequência de palavras a partir de `inicio` que nomeia uma pizza: (pizza_id, fim)."""
+        for fim in range(min(len(palavras), inicio + self.maximo_palavras), inicio, -1):
+            pizza_id = self.encontrar_termo(' '.join(palavras[inicio:fim]))
+            if pizza_id is not None:
+                return pizza_id, fim
+        return None
+
+    def _nome_com_numero(self, palavras: List[str], posicao: int) -> bool:
+        """Se o número em `posicao` faz parte do nome de uma pizza ("4 queijos")."""
+        encontrado = self.encontrar(palavras, posicao)
+        return encontrado is not None and encontrado[1] - posicao > 1
+
+    def _inicia_item(self, palavras: List[str], posicao: int) -> bool:
+        if posicao >= len(palavras):
+            return False
+        palavra = palavras[posicao]
+        return palavra.isdigit() or palavra in QUANTIDADES or self.encontrar(palavras, posicao) is not None
+
+    def interpretar(self, mensagem: str) -> Dict:
+        """
+        Monta o carrinho descrito na mensagem.
+
+        Returns:
+            {'itens': [{'pizza_id', 'pizza_nome', 'tamanho', 'quantidade', 'observacoes'}],
+             'nao_entendidos': [palavras ignoradas]}. 'tamanho' é None quando
+            a mensagem não informa ou a pizza não tem aquele tamanho.
+        """
+        originais = _PALAVRA.findall(mensagem)
+        palavras = [normalizar(palavra) or palavra for palavra in originais]
+        itens: List[Dict] = []
+        nao_entendidos: List[str] = []
+        quantidade, tamanho = None, None
+        observacao: Optional[List[str]] = None
+        atual: Optional[Dict] = None
+
+        def fechar_observacao():
+            nonlocal observacao
+            if observacao and atual is not None:
+                texto = ' '.join(observacao)
+                atual['observacoes'] = f"{atual['observacoes']}, {texto}" if atual['observacoes'] else texto
+            observacao = None
+
+        i = 0
+        while i < len(palavras):
+            palavra = palavras[i]
+            if observacao is not None:
+                # "sem cebola e tomate" continua a observação; "e 1 marguerita" não
+                fim = palavra.isdigit() or palavra in QUANTIDADES or palavra in TAMANHOS
+                if palavra in SEPARADORES:
+                    fim = self._inicia_item(palavras, i + 1)
+                if not fim:
+                    observacao.append(originais[i])
+                    i += 1
+                    continue
+                fechar_observacao()
+                if palavra in SEPARADORES:
+                    i += 1
+                    continue
+
+            if (palavra == 'x' and atual is not None and i + 1 < len(palavras)
+                    and palavras[i + 1].isdigit() and not self._inicia_item(palavras, i + 2)):
+                # "calabresa g x2": a quantidade vem depois do item
+                atual['quantidade'] = min(max(int(palavras[i + 1]), 1), QUANTIDADE_MAXIMA)
+                i += 2
+                continue
+            if palavra in SEPARADORES or palavra in IGNORADAS:
+                pass
+            elif palavra.isdigit() and not self._nome_com_numero(palavras, i):
+                quantidade = int(palavra)
+            elif palavra in TAMANHOS:
+                if atual is not None and atual['tamanho'] is None and quantidade is None:
+                    atual['tamanho'] = TAMANHOS[palavra]
+                else:
+                    tamanho = TAMANHOS[palavra]
+            elif palavra in OBSERVACOES and atual is not None:
+                observacao = [] if palavra == 'obs' else [originais[i]]
+            else:
+                encontrado = self.encontrar(palavras, i)
+                if encontrado is not None:
+                    pizza_id, i = encontrado
+                    pizza = self.pizzas[pizza_id]
+                    atual = {
+                        'pizza_id': pizza_id,
+                        'pizza_nome': pizza['nome'],
+                        'tamanho': tamanho,
+                        'quantidade': min(max(quantidade or 1, 1), QUANTIDADE_MAXIMA),
+                        'observacoes': None,
+                    }
+                    itens.append(atual)
+                    quantidade, tamanho = None, None
+                    continue
+                if palavra in QUANTIDADES:
+                    quantidade = QUANTIDADES[palavra]
+                else:
+                    nao_entendidos.append(originais[i])
+            i += 1
+        fechar_observacao()
+
+        for item in itens:
+            oferecidos = {preco['tamanho'] for preco in self.pizzas[item['pizza_id']]['precos']}
+            if item['tamanho'] not in oferecidos:
+                item['tamanho'] = None
+        return {'itens': itens, 'nao_entendidos': nao_entendidos}
@@ -1,24 +1,29 @@
-from BancoDeDados import BancoDeDados
+"""
+Importa um cardápio (CSV, JSON ou JSONL; ver ImportacaoCardapio) e mostra o
+que mudou. Sem arquivo, só acrescenta as pizzas de exemplo abaixo.
 
-db = BancoDeDados()
+    python Pizzas.py cardapio.csv [banco] [--simular] [--manter-ausentes]
+"""
+import json
+import sys
 
-# Pizzas inteiras e meias
-db.inserir_pizza(
-    nome="Margherita",
-    descricao="Clássica margherita",
-    ingredientes="Molho, mussarela, manjericão",
-    preco_inteira=59.90,
-    preco_meia=35.00,
-    sabor_principal="Margherita"
-)
+from BancoDeDados import BancoDeDados
 
-db.inserir_pizza(
-    nome="Pepperoni",
-    descricao="Pizza de pepperoni",
-    ingredientes="Molho, mussarela, pepperoni",
-    preco_inteira=64.90,
-    preco_meia=39.00,
-    sabor_principal="Pepperoni"
-)
+EXEMPLOS = [
+    {'nome': 'Margherita', 'descricao': 'Clássica margherita', 'categoria': 'Tradicionais',
+     'ingredientes': 'Molho, mussarela, manjericão', 'precos': {'P': 35.00, 'G': 59.90}},
+    {'nome': 'Pepperoni', 'descricao': 'Pizza de pepperoni', 'categoria': 'Tradicionais',
+     'ingredientes': 'Molho, mussarela, pepperoni', 'precos': {'P': 39.00, 'G': 64.90}},
+]
 
-print("Cardápio populado com sucesso!")
\ No newline at end of file
+if __name__ == "__main__":
+    argumentos = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    db = BancoDeDados(argumentos[1] if len(argumentos) > 1 else 'pizzaria.db')
+    if argumentos:
+        relatorio = db.importar_cardapio(argumentos[0], simular='--simular' in sys.argv,
+                                         desativar_ausentes='--manter-ausentes' not in sys.argv)
+    else:
+        relatorio = db.importar_cardapio(EXEMPLOS, desativar_ausentes=False)
+    if relatorio is None:
+        sys.exit(1)
+    print(json.dumps(relatorio, ensure_ascii=False, indent=2))
@@ -0,0 +1,150 @@
+"""
+Previsão do tempo de entrega a partir do movimento atual da cozinha.
+
+O EstimadorEntrega escuta o BancoDeDados (adicionar_ouvinte_status) e, a cada
+mudança de status, atualiza em O(1) a contagem de pedidos ativos por status e
+a média móvel (exponencial) do tempo passado em cada status. Uma previsão é
+a soma das médias de cada etapa mais a espera pela fila da cozinha, então
+custa o mesmo com 10 ou 10.000 pedidos no banco.
+
+Cada previsão prometida é comparada com a entrega real; o erro é exportado
+em pizzap_eta_erro_segundos e pizzap_eta_atrasos_total.
+"""
+import math
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from BancoDeDados import BancoDeDados, STATUS_PEDIDO
+from Cache import CacheLRU
+from Cozinha import _para_epoch
+from Metricas import REGISTRO, RegistroMetricas
+
+# Médias iniciais (segundos) enquanto não há entregas observadas
+MEDIAS_INICIAIS = {
+    'Recebido': 120.0,
+    'Confirmado': 180.0,
+    'Em preparo': 600.0,
+    'Assando': 720.0,
+    'Saiu para entrega': 1200.0,
+}
+# Status que ocupam a cozinha; a fila deles atrasa quem acabou de pedir
+STATUS_COZINHA = ('Recebido', 'Confirmado', 'Em preparo', 'Assando')
+# Durações acima disso (pedido esquecido, processo parado) não entram na média
+DURACAO_MAXIMA = 4 * 3600.0
+# Promessas sem entrega vista depois disso (pedido arquivado, entregue por outro
+# processo sem sincronização) são descartadas sem entrar no erro
+VALIDADE_PROMESSA = 2 * DURACAO_MAXIMA
+LIMITES_ERRO = (60, 120, 300, 600, 900, 1200, 1800, 2700, 3600)
+
+
+class EstimadorEntrega:
+    def __init__(self, db: BancoDeDados, paralelo: int = 4, alfa: float = 0.1,
+                 max_promessas: int = 10000, metricas: Optional[RegistroMetricas] = None) -> None:
+        """
+        Args:
+            db: Banco cujos eventos de status alimentam as estatísticas
+            paralelo: Pedidos que a cozinha prepara ao mesmo tempo
+            alfa: Peso de cada nova observação na média móvel (0 a 1)
+            max_promessas: Promessas guardadas à espera da entrega (descarte LRU)
+            metricas: Onde registrar as métricas (padrão: Metricas.REGISTRO)
+        """
+        self.paralelo = max(paralelo, 1)
+        self.alfa = alfa
+        self.medias: Dict[str, float] = dict(MEDIAS_INICIAIS)
+        self.ativos: Dict[str, int] = dict.fromkeys(MEDIAS_INICIAIS, 0)
+        self._na_cozinha = 0
+        # pedido_id -> (status, desde); só pedidos ainda não entregues
+        self._pedidos: Dict[int, Tuple[str, float]] = {}
+        # pedido_id -> (criado_em, segundos prometidos), até a entrega ou VALIDADE_PROMESSA
+        self._prometidos = CacheLRU(tamanho_maximo=max_promessas, ttl=VALIDADE_PROMESSA)
+        self._lock = threading.Lock()
+
+        metricas = metricas or REGISTRO
+        self._erro = metricas.histograma(
+            'pizzap_eta_erro_segundos', 'Diferença absoluta entre a entrega prevista e a real',
+            limites=LIMITES_ERRO)
+        self._atrasos = metricas.contador(
+            'pizzap_eta_atrasos_total', 'Pedidos entregues depois do horário previsto')
+        self._vies = 0.0
+        metricas.medidor('pizzap_eta_vies_segundos',
+                         'Média móvel de (real - previsto); positivo = previsões otimistas',
+                         lambda: self._vies)
+        metricas.medidor('pizzap_eta_media_status_segundos', 'Média móvel do tempo em cada status',
+                         lambda: dict(self.medias), ('status',))
+
+        for pedido in db.buscar_pedidos_ativos():
+            self._entrar(pedido['id'], pedido['status'], _para_epoch(pedido['data_pedido']))
+        db.adicionar_ouvinte_status(self._ao_mudar_status)
+
+    def _entrar(self, pedido_id: int, status: str, momento: float) -> None:
+        if status not in self.ativos:
+            return
+        self._pedidos[pedido_id] = (status, momento)
+        self.ativos[status] += 1
+        if status in STATUS_COZINHA:
+            self._na_cozinha += 1
+
+    def _sair(self, pedido_id: int, momento: float) -> None:
+        anterior = self._pedidos.pop(pedido_id, None)
+        if anterior is None:
+            return
+        status, desde = anterior
+        self.ativos[status] -= 1
+        if status in STATUS_COZINHA:
+            self._na_cozinha -= 1
+        duracao = momento - desde
+        if 0 <= duracao <= DURACAO_MAXIMA:
+            self.medias[status] += self.alfa * (duracao - self.medias[status])
+
+    def _ao_mudar_status(self, eventos: List[Dict]) -> None:
+        with self._lock:
+            for evento in eventos:
+                pedido_id, momento = evento['pedido_id'], evento['momento']
+                self._sair(pedido_id, momento)
+                self._entrar(pedido_id, evento['status'], momento)
+                if evento['status'] == STATUS_PEDIDO[-1]:
+                    self._avaliar(pedido_id, momento)
+
+    def _avaliar(self, pedido_id: int, entregue_em: float) -> None:
+        prometido = self._prometidos.obter(pedido_id, None)
+        if prometido is None:
+            return
+        self._prometidos.remover(pedido_id)
+        criado_em, previsto = prometido
+        diferenca = (entregue_em - criado_em) - previsto
+        self._erro.observar(abs(diferenca))
+        if diferenca > 0:
+            self._atrasos.incrementar()
+        self._vies += self.alfa * (diferenca - self._vies)
+
+    def estimar(self, status: str = 'Recebido', na_frente: Optional[int] = None) -> float:
+        """
+        Segundos até a entrega de um pedido que está em `status` agora.
+
+        Args:
+            status: Status atual do pedido
+            na_frente: Pedidos à frente na cozinha (padrão: todos os que estão nela)
+        """
+        with self._lock:
+            etapas = STATUS_PEDIDO[STATUS_PEDIDO.index(status):-1]
+            restante = sum(self.medias[etapa] for etapa in etapas)
+            if status in STATUS_COZINHA:
+                fila = self._na_cozinha if na_frente is None else na_frente
+                # Cada "rodada" da cozinha atende `paralelo` pedidos em preparo + forno
+                rodadas = max(fila - self.paralelo + 1, 0) / self.paralelo
+                restante += rodadas * (self.medias['Em preparo'] + self.medias['Assando'])
+            return restante
+
+    def prometer(self, pedido_id: int) -> int:
+        """
+        Previsão para um pedido recém-criado, em minutos arredondados para cima
+        de 5 em 5; fica registrada para medir o erro quando o pedido for entregue.
+        """
+        with self._lock:
+            status, criado_em = self._pedidos.get(pedido_id, ('Recebido', time.time()))
+            na_frente = max(self._na_cozinha - 1, 0)  # o próprio pedido já está contado
+        segundos = self.estimar(status, na_frente)
+        with self._lock:
+            self._prometidos.definir(pedido_id, (criado_em, segundos))
+        return max(5, int(math.ceil(segundos / 300.0)) * 5)
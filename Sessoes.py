@@ -0,0 +1,210 @@
+"""
+Armazéns do estado das conversas do bot (cadastro, login e pedido em andamento)
+e das respostas já dadas a cada MessageSid do Twilio.
+
+SessoesMemoria guarda tudo no próprio processo, com descarte LRU e expiração.
+SessoesSQLite guarda num arquivo SQLite e pode ser compartilhado por vários
+workers do gunicorn. Use criar_armazem() para escolher pelo ambiente:
+
+    PIZZAP_SESSOES=sqlite:sessoes.db   -> SessoesSQLite
+    (não definido)                     -> SessoesMemoria
+"""
+import json
+import os
+from abc import ABC, abstractmethod
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+from Cache import CacheLRU, AUSENTE
+
+TTL_PADRAO = 30 * 60  # conversas paradas há 30 minutos são descartadas
+
+
+class ArmazemSessoes(ABC):
+    """
+    Interface comum: cada sessão é um dicionário serializável em JSON, indexado pelo número.
+
+    Com `renovar` (padrão), ler uma sessão válida também adia a expiração dela,
+    então o TTL conta a partir da última mensagem, não do login.
+    """
+
+    @abstractmethod
+    def obter(self, numero: str) -> Optional[Dict]:
+        ...
+
+    @abstractmethod
+    def salvar(self, numero: str, dados: Dict) -> None:
+        ...
+
+    @abstractmethod
+    def remover(self, numero: str) -> None:
+        ...
+
+    @abstractmethod
+    def reservar(self, numero: str, dados: Dict) -> bool:
+        """Salva só se não houver sessão válida para o número, de forma atômica; retorna se salvou."""
+
+    @abstractmethod
+    def remover_expirados(self) -> int:
+        ...
+
+    def __contains__(self, numero: str) -> bool:
+        return self.obter(numero) is not None
+
+
+class SessoesMemoria(ArmazemSessoes):
+    def __init__(self, tamanho_maximo: int = 10000, ttl: float = TTL_PADRAO, renovar: bool = True) -> None:
+        self._cache = CacheLRU(tamanho_maximo=tamanho_maximo, ttl=ttl)
+        self.renovar = renovar
+        self._lock_reserva = threading.Lock()
+
+    def obter(self, numero: str) -> Optional[Dict]:
+        dados = self._cache.obter(numero)
+        if dados is AUSENTE:
+            return None
+        if self.renovar:
+            self._cache.definir(numero, dados)
+        return dados
+
+    def salvar(self, numero: str, dados: Dict) -> None:
+        self._cache.definir(numero, dados)
+
+    def remover(self, numero: str) -> None:
+        self._cache.remover(numero)
+
+    def reservar(self, numero: str, dados: Dict) -> bool:
+        with self._lock_reserva:
+            if self._cache.obter(numero) is not AUSENTE:
+                return False
+            self._cache.definir(numero, dados)
+            return True
+
+    def remover_expirados(self) -> int:
+        return self._cache.remover_expirados()
+
+    def __contains__(self, numero: str) -> bool:
+        if self.renovar:
+            return self.obter(numero) is not None
+        return numero in self._cache
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+
+class SessoesSQLite(ArmazemSessoes):
+    """
+    Sessões numa tabela SQLite compartilhada entre processos.
+
+    Vários armazéns podem usar o mesmo arquivo, separados por namespace.
+    A cada `intervalo_limpeza` segundos uma gravação também apaga as sessões vencidas.
+    Com `checkpoint_automatico=False` as conexões nunca fazem checkpoint do WAL,
+    para quando outro componente (BancoDeDados) já faz isso no mesmo arquivo.
+    A renovação na leitura só grava quando falta menos de `fracao_renovacao`
+    do TTL, para a maioria das leituras não disputar o lock de escrita.
+    """
+
+    def __init__(self, caminho: str, namespace: str, ttl: float = TTL_PADRAO,
+                 intervalo_limpeza: float = 60.0, checkpoint_automatico: bool = True,
+                 renovar: bool = True, fracao_renovacao: float = 0.5) -> None:
+        self.caminho = caminho
+        self.renovar = renovar
+        self.fracao_renovacao = fracao_renovacao
+        self.checkpoint_automatico = checkpoint_automatico
+        self.namespace = namespace
+        self.ttl = ttl
+        self.intervalo_limpeza = intervalo_limpeza
+        self._proxima_limpeza = time.time() + intervalo_limpeza
+        self._local = threading.local()
+        self._conexao().execute('''
+        CREATE TABLE IF NOT EXISTS sessoes (
+            namespace TEXT NOT NULL,
+            numero TEXT NOT NULL,
+            dados TEXT NOT NULL,
+            expira_em REAL NOT NULL,
+            PRIMARY KEY (namespace, numero)
+        ) WITHOUT ROWID
+        ''')
+
+    def _conexao(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.caminho, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            if not self.checkpoint_automatico:
+                conn.execute("PRAGMA wal_autocheckpoint = 0")
+            self._local.conn = conn
+        return conn
+
+    def obter(self, numero: str) -> Optional[Dict]:
+        agora = time.time()
+        conn = self._conexao()
+        resultado = conn.execute(
+            "SELECT dados, expira_em FROM sessoes WHERE namespace = ? AND numero = ? AND expira_em > ?",
+            (self.namespace, numero, agora)
+        ).fetchone()
+        if resultado is None:
+            return None
+        if self.renovar and resultado[1] - agora < self.ttl * self.fracao_renovacao:
+            conn.execute(
+                "UPDATE sessoes SET expira_em = ? WHERE namespace = ? AND numero = ? AND expira_em > ?",
+                (agora + self.ttl, self.namespace, numero, agora)
+            )
+        return json.loads(resultado[0])
+
+    def salvar(self, numero: str, dados: Dict) -> None:
+        agora = time.time()
+        self._conexao().execute(
+            "INSERT OR REPLACE INTO sessoes (namespace, numero, dados, expira_em) VALUES (?, ?, ?, ?)",
+            (self.namespace, numero, json.dumps(dados, separators=(',', ':'), ensure_ascii=False),
+             agora + self.ttl)
+        )
+        if agora >= self._proxima_limpeza:
+            self._proxima_limpeza = agora + self.intervalo_limpeza
+            self.remover_expirados()
+
+    def remover(self, numero: str) -> None:
+        self._conexao().execute(
+            "DELETE FROM sessoes WHERE namespace = ? AND numero = ?",
+            (self.namespace, numero)
+        )
+
+    def reservar(self, numero: str, dados: Dict) -> bool:
+        agora = time.time()
+        # Só sobrescreve uma sessão já vencida; rowcount diz se a linha foi gravada
+        cursor = self._conexao().execute('''
+        INSERT INTO sessoes (namespace, numero, dados, expira_em) VALUES (?, ?, ?, ?)
+        ON CONFLICT (namespace, numero) DO UPDATE
+        SET dados = excluded.dados, expira_em = excluded.expira_em
+        WHERE sessoes.expira_em <= ?
+        ''', (self.namespace, numero, json.dumps(dados, separators=(',', ':'), ensure_ascii=False),
+              agora + self.ttl, agora))
+        return cursor.rowcount > 0
+
+    def remover_expirados(self) -> int:
+        cursor = self._conexao().execute(
+            "DELETE FROM sessoes WHERE namespace = ? AND expira_em <= ?",
+            (self.namespace, time.time())
+        )
+        return cursor.rowcount
+
+
+def criar_armazem(namespace: str, configuracao: Optional[str] = None, ttl: float = TTL_PADRAO,
+                  sem_checkpoint: Iterable[str] = (), renovar: bool = True) -> ArmazemSessoes:
+    """
+    Cria o armazém indicado em `configuracao` (ou na variável PIZZAP_SESSOES).
+
+    `sem_checkpoint` lista os arquivos já checkpointados em segundo plano
+    (BancoDeDados.arquivos_com_checkpoint); um SessoesSQLite num deles não faz
+    checkpoint automático. `renovar=False` mantém a expiração contada a partir
+    da gravação, para registros que não são conversas.
+    """
+    configuracao = configuracao or os.environ.get('PIZZAP_SESSOES', '')
+    if configuracao.startswith('sqlite:'):
+        caminho = configuracao[len('sqlite:'):]
+        return SessoesSQLite(caminho, namespace, ttl=ttl,
+                             checkpoint_automatico=os.path.abspath(caminho) not in set(sem_checkpoint),
+                             renovar=renovar)
+    return SessoesMemoria(ttl=ttl, renovar=renovar)
@@ -0,0 +1,241 @@
+"""
+Teste de carga do webhook /whatsapp usando o test client do Flask.
+
+Roda o Bot.py contra um banco temporário e um serviço de CEP local, então
+nenhuma chamada sai da máquina. Dois modos, que podem ser combinados:
+
+    # Conversas sintéticas concorrentes (cadastro, login, cardápio e pedido)
+    python benchmarks/carga_webhook.py --conversas 200 --threads 8
+
+    # Reenvia posts do Twilio gravados em JSONL (um formulário por linha;
+    # a chave opcional "etapa" dá nome à etapa no relatório)
+    python benchmarks/carga_webhook.py --replay posts.jsonl
+
+Relata vazão e latência p50/p95/p99 e consultas ao banco por etapa.
+Com --salvar-baseline grava o resultado; com --comparar falha (código 1)
+se o p95 de alguma etapa piorar além da tolerância.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+CEP_TESTE = '01001000'
+
+
+class _ServicoCep(BaseHTTPRequestHandler):
+    """Imita o ViaCEP: qualquer CEP terminado em 999 é inexistente."""
+
+    def do_GET(self):
+        cep = self.path.strip('/').split('/')[1]
+        if cep.endswith('999'):
+            corpo = {'erro': True}
+        else:
+            corpo = {'cep': cep, 'logradouro': 'Rua de Teste', 'bairro': 'Centro',
+                     'localidade': 'São Paulo', 'uf': 'SP'}
+        dados = json.dumps(corpo).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def log_message(self, *args):
+        pass
+
+
+def iniciar_servico_cep() -> ThreadingHTTPServer:
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), _ServicoCep)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+def carregar_bot(banco: str, url_cep: str):
+    """Importa o Bot.py apontando para o banco e o serviço de CEP informados."""
+    os.environ['PIZZAP_BANCO'] = banco
+    os.environ['PIZZAP_URL_CEP'] = url_cep
+    # A carga sintética manda mensagens sem pausa: sem limite de taxa nem de carga
+    for variavel in ('PIZZAP_TAXA_NUMERO', 'PIZZAP_RAJADA_NUMERO', 'PIZZAP_TAXA_GLOBAL',
+                     'PIZZAP_RAJADA_GLOBAL', 'PIZZAP_CARGA_MAXIMA'):
+        os.environ.setdefault(variavel, '1000000')
+    import Bot
+    return Bot
+
+
+def conversa_sintetica(indice: int):
+    """Retorna (numero, [(etapa, mensagem), ...]) de um cliente novo fazendo um pedido."""
+    numero = f"whatsapp:+5511{900000000 + indice:09d}"
+    passos = [
+        ('cadastro', 'cadastrar'),
+        ('cadastro', f'Cliente {indice}'),
+        ('cadastro_cep', CEP_TESTE),
+        ('cadastro', str(indice % 500 + 1)),
+        ('cadastro', '1'),
+        ('cadastro_final', 'não'),
+        ('login', 'login'),
+        ('cardapio', 'cardapio'),
+        ('pedir', 'pedir'),
+        ('pedido', '1'),
+        ('pedido', 'g'),
+        ('pedido', '2'),
+        ('pedido_confirmar', 'confirmar'),
+        ('sair', 'sair'),
+    ]
+    return numero, passos
+
+
+def carregar_replay(caminho: str):
+    """Agrupa os posts gravados por número, preservando a ordem de cada conversa."""
+    conversas = defaultdict(list)
+    with open(caminho, encoding='utf-8') as arquivo:
+        for linha in arquivo:
+            linha = linha.strip()
+            if not linha:
+                continue
+            post = json.loads(linha)
+            etapa = post.pop('etapa', 'replay')
+            conversas[post.get('From', '')].append((etapa, post))
+    return list(conversas.items())
+
+
+class Medidor:
+    def __init__(self, db) -> None:
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.latencias = defaultdict(list)
+        self.consultas = defaultdict(list)
+        db.rastrear_consultas(self._contar)
+
+    def _contar(self, sql: str) -> None:
+        self._local.consultas = getattr(self._local, 'consultas', 0) + 1
+
+    def medir(self, etapa: str, funcao) -> None:
+        self._local.consultas = 0
+        inicio = time.perf_counter()
+        funcao()
+        duracao = time.perf_counter() - inicio
+        with self._lock:
+            self.latencias[etapa].append(duracao)
+            self.consultas[etapa].append(self._local.consultas)
+
+
+def percentil(valores, p: float) -> float:
+    ordenados = sorted(valores)
+    if not ordenados:
+        return 0.0
+    posicao = min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[posicao]
+
+
+def executar(bot, conversas, threads: int) -> dict:
+    medidor = Medidor(bot.db)
+
+    def rodar(conversa):
+        numero, passos = conversa
+        cliente = bot.app.test_client()
+        for etapa, mensagem in passos:
+            formulario = mensagem if isinstance(mensagem, dict) else {'From': numero, 'Body': mensagem}
+            medidor.medir(etapa, lambda: cliente.post('/whatsapp', data=formulario))
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(rodar, conversas))
+    duracao = time.perf_counter() - inicio
+
+    total = sum(len(v) for v in medidor.latencias.values())
+    etapas = {}
+    for etapa, latencias in sorted(medidor.latencias.items()):
+        consultas = medidor.consultas[etapa]
+        etapas[etapa] = {
+            'requisicoes': len(latencias),
+            'p50_ms': percentil(latencias, 50) * 1000,
+            'p95_ms': percentil(latencias, 95) * 1000,
+            'p99_ms': percentil(latencias, 99) * 1000,
+            'consultas_media': sum(consultas) / len(consultas),
+        }
+    return {
+        'requisicoes': total,
+        'duracao_s': duracao,
+        'vazao_rps': total / duracao if duracao else 0.0,
+        'etapas': etapas,
+    }
+
+
+def imprimir(resultado: dict) -> None:
+    print(f"{resultado['requisicoes']} requisições em {resultado['duracao_s']:.2f}s "
+          f"({resultado['vazao_rps']:.1f} req/s)")
+    print(f"{'etapa':<18}{'n':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'consultas':>11}")
+    for etapa, dados in resultado['etapas'].items():
+        print(f"{etapa:<18}{dados['requisicoes']:>7}{dados['p50_ms']:>10.2f}"
+              f"{dados['p95_ms']:>10.2f}{dados['p99_ms']:>10.2f}{dados['consultas_media']:>11.1f}")
+
+
+def comparar(resultado: dict, baseline: dict, tolerancia: float, folga_ms: float) -> list:
+    """
+    Lista as etapas cujo p95 ou número de consultas piorou além da tolerância.
+
+    A folga absoluta evita acusar ruído em etapas que levam menos de 1ms.
+    """
+    regressoes = []
+    for etapa, antes in baseline['etapas'].items():
+        depois = resultado['etapas'].get(etapa)
+        if depois is None:
+            continue
+        limite = max(antes['p95_ms'] * (1 + tolerancia), antes['p95_ms'] + folga_ms)
+        if depois['p95_ms'] > limite:
+            regressoes.append(f"{etapa}: p95 {antes['p95_ms']:.2f}ms -> {depois['p95_ms']:.2f}ms")
+        if depois['consultas_media'] > antes['consultas_media'] + 0.5:
+            regressoes.append(f"{etapa}: consultas {antes['consultas_media']:.1f} -> "
+                              f"{depois['consultas_media']:.1f}")
+    return regressoes
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--conversas', type=int, default=100, help='conversas sintéticas (0 desliga)')
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--replay', help='arquivo JSONL com posts do Twilio')
+    parser.add_argument('--salvar-baseline', help='grava o resultado neste arquivo JSON')
+    parser.add_argument('--comparar', help='baseline JSON para detectar regressões')
+    parser.add_argument('--tolerancia', type=float, default=0.25, help='piora relativa aceita no p95')
+    parser.add_argument('--folga-ms', type=float, default=1.0, help='piora absoluta sempre aceita no p95')
+    args = parser.parse_args()
+
+    servico_cep = iniciar_servico_cep()
+    with tempfile.TemporaryDirectory() as pasta:
+        bot = carregar_bot(
+            os.path.join(pasta, 'carga.db'),
+            f'http://127.0.0.1:{servico_cep.server_port}/ws/{{cep}}/json/'
+        )
+        conversas = [conversa_sintetica(i) for i in range(args.conversas)]
+        if args.replay:
+            conversas += carregar_replay(args.replay)
+        resultado = executar(bot, conversas, args.threads)
+        bot.db.fechar()
+    servico_cep.shutdown()
+
+    imprimir(resultado)
+    if args.salvar_baseline:
+        with open(args.salvar_baseline, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultado, arquivo, indent=2)
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as arquivo:
+            regressoes = comparar(resultado, json.load(arquivo), args.tolerancia, args.folga_ms)
+        for regressao in regressoes:
+            print(f"❌ Regressão em {regressao}")
+        if regressoes:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+"""
+Mede como as consultas do BancoDeDados escalam com o volume de dados.
+
+Para cada escala (número de clientes; endereços, pedidos e itens crescem na
+mesma proporção do gerar_dados.py) um banco é gerado uma vez e reaproveitado
+nas execuções seguintes. Depois cada método é chamado com IDs aleatórios.
+
+    python benchmarks/escala_consultas.py --escalas 1000,10000,100000 --pasta /tmp/escala
+
+Um método que "não escala" aparece com p95 crescendo junto com a escala.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from BancoDeDados import BancoDeDados
+from benchmarks.gerar_dados import gerar
+
+
+def medir(funcao, argumentos, repeticoes: int) -> dict:
+    tempos = []
+    for _ in range(repeticoes):
+        args = argumentos()
+        inicio = time.perf_counter()
+        funcao(*args)
+        tempos.append(time.perf_counter() - inicio)
+    tempos.sort()
+    return {
+        'p50_us': tempos[len(tempos) // 2] * 1e6,
+        'p95_us': tempos[min(len(tempos) - 1, int(len(tempos) * 0.95))] * 1e6,
+    }
+
+
+def medir_escala(caminho: str, repeticoes: int, semente: int) -> dict:
+    db = BancoDeDados(caminho)
+    aleatorio = random.Random(semente)
+    with db._conectar() as conn:
+        clientes = conn.execute("SELECT MAX(id) FROM clientes").fetchone()[0] or 1
+        pedidos = conn.execute("SELECT MAX(id) FROM pedidos").fetchone()[0] or 1
+
+    cliente = lambda: aleatorio.randint(1, clientes)
+    metodos = {
+        'buscar_cliente': (db.buscar_cliente, lambda: (f'55{11000000000 + cliente()}',)),
+        'listar_enderecos': (db.listar_enderecos, lambda: (cliente(),)),
+        'buscar_pedidos_cliente': (db.buscar_pedidos_cliente, lambda: (cliente(),)),
+        'buscar_detalhes_pedido': (db.buscar_detalhes_pedido, lambda: (aleatorio.randint(1, pedidos),)),
+        'buscar_cardapio': (db.buscar_cardapio, lambda: ()),
+    }
+    resultado = {nome: medir(funcao, args, repeticoes) for nome, (funcao, args) in metodos.items()}
+    db.fechar()
+    return resultado
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--escalas', default='1000,10000,100000',
+                        help='números de clientes separados por vírgula (1000000 = volume de produção)')
+    parser.add_argument('--pasta', default='.', help='onde guardar os bancos gerados')
+    parser.add_argument('--pizzas', type=int, default=300)
+    parser.add_argument('--repeticoes', type=int, default=500)
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    escalas = [int(e) for e in args.escalas.split(',')]
+    resultados = {}
+    for escala in escalas:
+        caminho = os.path.join(args.pasta, f'escala_{escala}.db')
+        if not os.path.exists(caminho):
+            print(f"Gerando {caminho}...")
+            gerar(caminho, clientes=escala, pizzas=args.pizzas, semente=args.semente, verbose=False)
+        resultados[escala] = medir_escala(caminho, args.repeticoes, args.semente)
+
+    print(f"{'método':<26}" + "".join(f"{f'{e} (p50/p95 µs)':>26}" for e in escalas))
+    for metodo in resultados[escalas[0]]:
+        linha = f"{metodo:<26}"
+        for escala in escalas:
+            dados = resultados[escala][metodo]
+            linha += f"{dados['p50_us']:>15.1f} /{dados['p95_us']:>9.1f}"
+        print(linha)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Gera um banco com volume realista para testar o esquema do BancoDeDados.
+
+As tabelas são criadas pelo próprio BancoDeDados (com migrações e índices) e
+as linhas são inseridas em lotes com executemany a partir de geradores, então
+a memória usada não cresce com o volume.
+
+    # Volume de produção esperado: 1M clientes, 3M endereços, 10M pedidos e itens
+    python benchmarks/gerar_dados.py grande.db --clientes 1000000
+
+    python benchmarks/gerar_dados.py pequeno.db --clientes 10000 --pizzas 300
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from itertools import islice
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from BancoDeDados import BancoDeDados
+
+TAMANHOS = ('P', 'M', 'G')
+TIPOS_RESIDENCIA = ('Casa', 'Apartamento', 'Condomínio')
+FORMAS_PAGAMENTO = ('Dinheiro', 'Cartão', 'PIX')
+# Proporção aproximada de pedidos em cada status num dia normal
+STATUS = (('Entregue', 0.94), ('Saiu para entrega', 0.02), ('Assando', 0.01),
+          ('Em preparo', 0.01), ('Confirmado', 0.01), ('Recebido', 0.01))
+PERIODO_DIAS = 730
+
+
+def _em_lotes(linhas, conn: sqlite3.Connection, sql: str, lote: int) -> int:
+    total = 0
+    linhas = iter(linhas)
+    while True:
+        bloco = list(islice(linhas, lote))
+        if not bloco:
+            return total
+        conn.executemany(sql, bloco)
+        conn.commit()
+        total += len(bloco)
+
+
+def gerar(caminho: str, clientes: int, enderecos_por_cliente: int = 3,
+          pedidos_por_cliente: int = 10, itens_por_pedido: float = 1.0,
+          pizzas: int = 200, categorias: int = 12, lote: int = 50000,
+          semente: int = 42, verbose: bool = True) -> dict:
+    """
+    Preenche `caminho` (criando o esquema se preciso) e retorna a contagem por tabela.
+
+    itens_por_pedido é a média; cada pedido recebe entre 1 e 2x esse valor.
+    """
+    aleatorio = random.Random(semente)
+    BancoDeDados(caminho).fechar()
+
+    conn = sqlite3.connect(caminho)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = OFF")
+    conn.execute("PRAGMA cache_size = -262144")
+    conn.execute("PRAGMA temp_store = MEMORY")
+
+    contagem = {}
+    inicio = time.perf_counter()
+
+    def registrar(tabela: str, quantidade: int) -> None:
+        contagem[tabela] = quantidade
+        if verbose:
+            print(f"{tabela}: {quantidade} linhas ({time.perf_counter() - inicio:.1f}s)")
+
+    base_categoria = conn.execute("SELECT COALESCE(MAX(id), 0) FROM categorias").fetchone()[0]
+    registrar('categorias', _em_lotes(
+        ((f'Categoria {base_categoria + i}', f'Categoria gerada {i}') for i in range(1, categorias + 1)),
+        conn, "INSERT INTO categorias (nome, descricao) VALUES (?, ?)", lote
+    ))
+
+    base_pizza = conn.execute("SELECT COALESCE(MAX(id), 0) FROM pizzas").fetchone()[0]
+    registrar('pizzas', _em_lotes(
+        ((f'Pizza {base_pizza + i}', f'Pizza gerada número {i}', f'Ingrediente {i % 40}, mussarela',
+          base_categoria + 1 + i % categorias, aleatorio.random() > 0.05)
+         for i in range(1, pizzas + 1)),
+        conn, "INSERT INTO pizzas (nome, descricao, ingredientes, categoria_id, disponivel) VALUES (?, ?, ?, ?, ?)",
+        lote
+    ))
+    registrar('precos', _em_lotes(
+        ((base_pizza + i, tamanho, round(30 + 10 * t + aleatorio.random() * 20, 2))
+         for i in range(1, pizzas + 1) for t, tamanho in enumerate(TAMANHOS)),
+        conn, "INSERT INTO precos (pizza_id, tamanho, valor) VALUES (?, ?, ?)", lote
+    ))
+    pizza_ids = [row[0] for row in conn.execute("SELECT id FROM pizzas")]
+
+    base_cliente = conn.execute("SELECT COALESCE(MAX(id), 0) FROM clientes").fetchone()[0]
+    registrar('clientes', _em_lotes(
+        ((f'Cliente {base_cliente + i}', f'55{11000000000 + base_cliente + i}')
+         for i in range(1, clientes + 1)),
+        conn, "INSERT INTO clientes (nome, telefone) VALUES (?, ?)", lote
+    ))
+
+    base_endereco = conn.execute("SELECT COALESCE(MAX(id), 0) FROM enderecos").fetchone()[0]
+    registrar('enderecos', _em_lotes(
+        ((base_cliente + c, f'Endereço {e}', f'{aleatorio.randrange(1000000, 99999999):08d}',
+          f'Rua {aleatorio.randrange(5000)}', str(aleatorio.randrange(1, 3000)),
+          aleatorio.choice(TIPOS_RESIDENCIA), 'Centro', 'São Paulo', 'SP')
+         for c in range(1, clientes + 1) for e in range(enderecos_por_cliente)),
+        conn, '''INSERT INTO enderecos (cliente_id, apelido, cep, logradouro, numero,
+                 tipo_residencia, bairro, cidade, uf) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+        lote
+    ))
+
+    status, pesos = zip(*STATUS)
+    agora = time.time()
+
+    def pedidos():
+        for c in range(1, clientes + 1):
+            for _ in range(pedidos_por_cliente):
+                endereco = (base_endereco + (c - 1) * enderecos_por_cliente
+                            + aleatorio.randrange(enderecos_por_cliente) + 1)
+                data = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(agora - aleatorio.random() * PERIODO_DIAS * 86400))
+                yield (base_cliente + c, endereco, data, aleatorio.choices(status, pesos)[0],
+                       1.0, aleatorio.choice(FORMAS_PAGAMENTO))
+
+    base_pedido = conn.execute("SELECT COALESCE(MAX(id), 0) FROM pedidos").fetchone()[0]
+    total_pedidos = _em_lotes(
+        pedidos(), conn,
+        '''INSERT INTO pedidos (cliente_id, endereco_id, data_pedido, status, valor_total, forma_pagamento)
+           VALUES (?, ?, ?, ?, ?, ?)''', lote
+    ) if enderecos_por_cliente else 0
+    registrar('pedidos', total_pedidos)
+
+    maximo_itens = max(1, int(round(itens_por_pedido * 2)) - 1)
+
+    def itens():
+        for p in range(base_pedido + 1, base_pedido + total_pedidos + 1):
+            for _ in range(aleatorio.randint(1, maximo_itens)):
+                yield (p, aleatorio.choice(pizza_ids), aleatorio.choice(TAMANHOS),
+                       aleatorio.randint(1, 3), round(30 + aleatorio.random() * 40, 2))
+
+    registrar('itens_pedido', _em_lotes(
+        itens(), conn,
+        '''INSERT INTO itens_pedido (pedido_id, pizza_id, tamanho, quantidade, valor_unitario)
+           VALUES (?, ?, ?, ?, ?)''', lote
+    ))
+
+    # valor_total coerente com os itens, numa única passada
+    conn.execute('''
+    UPDATE pedidos SET valor_total = (
+        SELECT SUM(quantidade * valor_unitario) FROM itens_pedido WHERE pedido_id = pedidos.id
+    ) WHERE id > ?
+    ''', (base_pedido,))
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+
+    # As linhas foram inseridas por fora do BancoDeDados; recalcula os resumos de vendas
+    db = BancoDeDados(caminho)
+    db.reconstruir_resumos()
+    db.fechar()
+    if verbose:
+        print(f"Concluído em {time.perf_counter() - inicio:.1f}s")
+    return contagem
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('banco')
+    parser.add_argument('--clientes', type=int, default=10000)
+    parser.add_argument('--enderecos-por-cliente', type=int, default=3)
+    parser.add_argument('--pedidos-por-cliente', type=int, default=10)
+    parser.add_argument('--itens-por-pedido', type=float, default=1.0)
+    parser.add_argument('--pizzas', type=int, default=200)
+    parser.add_argument('--categorias', type=int, default=12)
+    parser.add_argument('--lote', type=int, default=50000)
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+    gerar(args.banco, args.clientes, args.enderecos_por_cliente, args.pedidos_por_cliente,
+          args.itens_por_pedido, args.pizzas, args.categorias, args.lote, args.semente)
+
+
+if __name__ == "__main__":
+    main()
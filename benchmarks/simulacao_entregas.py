@@ -0,0 +1,161 @@
+"""
+Simula o despacho de entregas sobre um fluxo sintético de pedidos e mede
+entregas por hora de entregador, comparando capacidades de lote.
+
+A cidade é uma grade de células de 1 km, cada uma com um prefixo de CEP; a
+tabela de vizinhança é gerada a partir das distâncias entre os centros, como
+seria pré-calculada para vizinhanca_cep. A cada passo, os pedidos prontos vão
+para Entregas.agrupar_entregas (a mesma regra do DespachoEntregas) e cada lote
+pronto sai com um entregador livre, numa rota do vizinho mais próximo que
+começa e termina na pizzaria. Nada é gravado em banco.
+
+"ent/h rota" divide as entregas pelo tempo em rota (o ganho do agrupamento);
+"ent/h turno", pelo turno inteiro de todos os entregadores, e fica limitado
+pela demanda quando sobra entregador. Tempos em minutos, a partir do pedido pronto.
+
+    python benchmarks/simulacao_entregas.py
+    python benchmarks/simulacao_entregas.py --pedidos-hora 120 --entregadores 6 --capacidades 1,3,5
+"""
+import argparse
+import math
+import os
+import random
+import sys
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from Entregas import agrupar_entregas
+
+
+def prefixo_celula(linha: int, coluna: int) -> str:
+    # Células da mesma linha compartilham os 4 primeiros dígitos
+    return f"{13000 + linha * 10 + coluna:05d}"
+
+
+def gerar_vizinhanca(lado: int, raio_km: float):
+    vizinhanca = {}
+    for i in range(lado):
+        for j in range(lado):
+            vizinhos = vizinhanca.setdefault(prefixo_celula(i, j), {})
+            for k in range(lado):
+                for m in range(lado):
+                    distancia = math.hypot(i - k, j - m)
+                    if distancia <= raio_km * 1.5:
+                        vizinhos[prefixo_celula(k, m)] = round(distancia, 2)
+    return vizinhanca
+
+
+def gerar_pedidos(rng: random.Random, lado: int, pedidos_hora: float, horas: float,
+                  preparo_min: tuple):
+    pedidos, instante, pedido_id = [], 0.0, 0
+    while True:
+        instante += rng.expovariate(pedidos_hora / 3600)
+        if instante > horas * 3600:
+            return pedidos
+        pedido_id += 1
+        linha, coluna = rng.randrange(lado), rng.randrange(lado)
+        pedidos.append({
+            'id': pedido_id,
+            'cep': prefixo_celula(linha, coluna) + '000',
+            'posicao': (linha + rng.random(), coluna + rng.random()),
+            'pronto_desde': instante + rng.uniform(*preparo_min) * 60,
+        })
+
+
+def rota(origem, pedidos, velocidade_kmh: float, parada_min: float):
+    """Vizinho mais próximo a partir da pizzaria: (entrega de cada pedido em s, duração total em s, km)."""
+    restantes, posicao, tempo, km, entregas = list(pedidos), origem, 0.0, 0.0, {}
+    while restantes:
+        proximo = min(restantes, key=lambda pedido: math.dist(posicao, pedido['posicao']))
+        restantes.remove(proximo)
+        trecho = math.dist(posicao, proximo['posicao'])
+        km += trecho
+        tempo += trecho / velocidade_kmh * 3600 + parada_min * 60
+        entregas[proximo['id']] = tempo
+        posicao = proximo['posicao']
+    volta = math.dist(posicao, origem)
+    return entregas, tempo + volta / velocidade_kmh * 3600, km + volta
+
+
+def simular(pedidos, vizinhanca, lado: int, entregadores: int, capacidade: int,
+            espera_maxima: float, raio_km: float, velocidade_kmh: float, parada_min: float,
+            passo: float = 30.0) -> dict:
+    pizzaria = (lado / 2, lado / 2)
+    livres_em = [0.0] * entregadores
+    pendentes = sorted(pedidos, key=lambda pedido: pedido['pronto_desde'])
+    por_id = {pedido['id']: pedido for pedido in pedidos}
+    prontos, entregue_em, saida_em = [], {}, {}
+    em_rota_s, km_total, lotes = 0.0, 0.0, 0
+    agora, proximo = 0.0, 0
+    while proximo < len(pendentes) or prontos:
+        while proximo < len(pendentes) and pendentes[proximo]['pronto_desde'] <= agora:
+            prontos.append(pendentes[proximo])
+            proximo += 1
+        livres = [indice for indice, livre_em in enumerate(livres_em) if livre_em <= agora]
+        if prontos and livres:
+            for lote in agrupar_entregas(prontos, vizinhanca, agora, capacidade, espera_maxima, raio_km):
+                if not livres:
+                    break
+                if not lote['pronto']:
+                    continue
+                membros = [por_id[pedido_id] for pedido_id in lote['pedidos']]
+                entregas, duracao, km = rota(pizzaria, membros, velocidade_kmh, parada_min)
+                livres_em[livres.pop(0)] = agora + duracao
+                for pedido_id, tempo in entregas.items():
+                    entregue_em[pedido_id] = agora + tempo
+                    saida_em[pedido_id] = agora
+                em_rota_s += duracao
+                km_total += km
+                lotes += 1
+            prontos = [pedido for pedido in prontos if pedido['id'] not in saida_em]
+        agora += passo
+
+    esperas = sorted((saida_em[p['id']] - p['pronto_desde']) / 60 for p in pedidos)
+    totais = sorted((entregue_em[p['id']] - p['pronto_desde']) / 60 for p in pedidos)
+    turno_h = max(livres_em + [agora]) / 3600
+    return {
+        'entregas': len(pedidos),
+        'lotes': lotes,
+        'pedidos_por_lote': len(pedidos) / lotes if lotes else 0.0,
+        'por_hora_rota': len(pedidos) / (em_rota_s / 3600) if em_rota_s else 0.0,
+        'por_hora_turno': len(pedidos) / (entregadores * turno_h) if turno_h else 0.0,
+        'km_por_entrega': km_total / len(pedidos) if pedidos else 0.0,
+        'espera_media_min': sum(esperas) / len(esperas) if esperas else 0.0,
+        'entrega_p50_min': totais[len(totais) // 2] if totais else 0.0,
+        'entrega_p95_min': totais[int(len(totais) * 0.95)] if totais else 0.0,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pedidos-hora', type=float, default=40)
+    parser.add_argument('--horas', type=float, default=4)
+    parser.add_argument('--entregadores', type=int, default=8)
+    parser.add_argument('--capacidades', default='1,2,3,4', help='Capacidades de lote a comparar')
+    parser.add_argument('--espera-maxima-min', type=float, default=10)
+    parser.add_argument('--raio-km', type=float, default=2.0)
+    parser.add_argument('--lado-km', type=int, default=6, help='Lado da grade da cidade')
+    parser.add_argument('--velocidade-kmh', type=float, default=25)
+    parser.add_argument('--parada-min', type=float, default=3)
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.semente)
+    pedidos = gerar_pedidos(rng, args.lado_km, args.pedidos_hora, args.horas, (15, 25))
+    vizinhanca = gerar_vizinhanca(args.lado_km, args.raio_km)
+    print(f"{len(pedidos)} pedidos em {args.horas:g}h, {args.entregadores} entregadores, "
+          f"grade {args.lado_km}x{args.lado_km} km")
+    print(f"{'capacidade':>10}{'lotes':>7}{'ped/lote':>10}{'ent/h rota':>12}{'ent/h turno':>13}"
+          f"{'km/ent':>8}{'espera':>8}{'p50 min':>9}{'p95 min':>9}")
+    for capacidade in (int(valor) for valor in args.capacidades.split(',')):
+        r = simular(pedidos, vizinhanca, args.lado_km, args.entregadores, capacidade,
+                    args.espera_maxima_min * 60, args.raio_km, args.velocidade_kmh, args.parada_min)
+        print(f"{capacidade:>10}{r['lotes']:>7}{r['pedidos_por_lote']:>10.2f}{r['por_hora_rota']:>12.2f}"
+              f"{r['por_hora_turno']:>13.2f}{r['km_por_entrega']:>8.2f}{r['espera_media_min']:>8.1f}"
+              f"{r['entrega_p50_min']:>9.1f}{r['entrega_p95_min']:>9.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
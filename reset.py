@@ -1,23 +1,20 @@
+"""Volta o cardápio para as pizzas abaixo; as demais ficam indisponíveis."""
 from BancoDeDados import BancoDeDados
 
-db = BancoDeDados()
-
-
-import sqlite3
-
-conn = sqlite3.connect('seu_banco.db')
-cursor = conn.cursor()
-
-pizzas = [
-    ('Calabresa', 'Pizza com bastante calabresa saborosa.', 'Calabresa, cebola, mussarela', 39.90, 22.00, 'Tradicional'),
-    ('Marguerita', 'Pizza clássica com manjericão fresco.', 'Tomate, mussarela, manjericão', 37.50, 20.00, 'Vegetariana'),
-    ('Frango com Catupiry', 'Pizza cremosa com frango e catupiry.', 'Frango, catupiry, orégano', 42.00, 23.00, 'Premium')
+PIZZAS = [
+    {'nome': 'Calabresa', 'descricao': 'Pizza com bastante calabresa saborosa.',
+     'ingredientes': 'Calabresa, cebola, mussarela', 'categoria': 'Tradicionais',
+     'precos': {'P': 22.00, 'G': 39.90}},
+    {'nome': 'Marguerita', 'descricao': 'Pizza clássica com manjericão fresco.',
+     'ingredientes': 'Tomate, mussarela, manjericão', 'categoria': 'Vegetarianas',
+     'precos': {'P': 20.00, 'G': 37.50}},
+    {'nome': 'Frango com Catupiry', 'descricao': 'Pizza cremosa com frango e catupiry.',
+     'ingredientes': 'Frango, catupiry, orégano', 'categoria': 'Especiais',
+     'precos': {'P': 23.00, 'G': 42.00}},
 ]
 
-cursor.executemany('''
-    INSERT INTO cardapio (nome, descricao, ingredientes, preco_inteira, preco_meia, categoria)
-    VALUES (?, ?, ?, ?, ?, ?)
-''', pizzas)
-
-conn.commit()
-conn.close()
+if __name__ == "__main__":
+    relatorio = BancoDeDados().importar_cardapio(PIZZAS)
+    if relatorio is not None:
+        print(f"Cardápio redefinido: {len(relatorio['adicionadas'])} adicionadas, "
+              f"{len(relatorio['alteradas'])} alteradas, {len(relatorio['desativadas'])} desativadas.")
@@ -0,0 +1,90 @@
+import os
+import sys
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+
+@pytest.fixture
+def criar_banco(tmp_path):
+    """Cria BancoDeDados num diretório temporário e fecha todos no fim do teste."""
+    from BancoDeDados import BancoDeDados
+
+    bancos = []
+
+    def criar(nome: str = 'pizzaria.db', **opcoes):
+        opcoes.setdefault('log_consultas_lentas', None)
+        db = BancoDeDados(str(tmp_path / nome), **opcoes)
+        bancos.append(db)
+        return db
+
+    yield criar
+    for db in bancos:
+        db.fechar()
+
+
+@pytest.fixture
+def db(criar_banco):
+    return criar_banco()
+
+
+@pytest.fixture
+def cliente(db):
+    """Cliente cadastrado com um endereço; retorna (cliente_id, endereco_id)."""
+    assert db.cadastrar_cliente('Ana', '5511911111111')
+    cliente_id = db.buscar_cliente('5511911111111')['id']
+    assert db.adicionar_endereco(cliente_id, 'Casa', '01001000', 'Rua A', '1', 'Casa')
+    return cliente_id, db.buscar_cliente('5511911111111')['endereco_padrao']['id']
+
+
+@pytest.fixture(scope='session')
+def bot(tmp_path_factory):
+    """
+    Módulo Bot carregado uma vez, sobre um banco temporário e no modo síncrono.
+    Os testes trocam com monkeypatch o que precisarem (limitador, fila, carga).
+    """
+    pasta = tmp_path_factory.mktemp('bot')
+    ambiente = {
+        'PIZZAP_BANCO': str(pasta / 'pizzaria.db'),
+        'PIZZAP_URL_CEP': 'http://127.0.0.1:9/ws/{cep}/json/',
+        'PIZZAP_LOG_CONSULTAS_LENTAS': str(pasta / 'consultas_lentas.log'),
+        'PIZZAP_CHECKPOINT_S': '0',
+        'PIZZAP_SINCRONIZACAO_S': '0',
+    }
+    anteriores = {chave: os.environ.get(chave) for chave in [*ambiente, 'PIZZAP_ASSINCRONO', 'PIZZAP_SESSOES',
+                                                             'PIZZAP_DEDUPLICACAO', 'PIZZAP_BANCO_ARQUIVO']}
+    for chave in anteriores:
+        os.environ.pop(chave, None)
+    os.environ.update(ambiente)
+    try:
+        import Bot
+    finally:
+        for chave, valor in anteriores.items():
+            if valor is None:
+                os.environ.pop(chave, None)
+            else:
+                os.environ[chave] = valor
+    yield Bot
+    Bot.db.fechar()
+
+
+@pytest.fixture
+def webhook(bot, monkeypatch):
+    """Cliente de teste do /whatsapp com limitador folgado e deduplicação limpa."""
+    from Limitador import LimitadorTaxa
+    from Metricas import RegistroMetricas
+    from Sessoes import SessoesMemoria
+
+    monkeypatch.setattr(bot, 'limitador', LimitadorTaxa(1000, 1000, 1000, 1000, metricas=RegistroMetricas()))
+    monkeypatch.setattr(bot, 'respostas_webhook', SessoesMemoria(ttl=bot.TTL_DEDUPLICACAO, renovar=False))
+    cliente = bot.app.test_client()
+
+    def enviar(corpo: str, numero: str = '+5511911111111', message_sid=None):
+        dados = {'Body': corpo, 'From': f'whatsapp:{numero}'}
+        if message_sid:
+            dados['MessageSid'] = message_sid
+        return cliente.post('/whatsapp', data=dados)
+
+    return enviar
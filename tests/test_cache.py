@@ -0,0 +1,56 @@
+"""CacheLRU: descarte pelo tamanho e expiração por TTL."""
+import time
+
+from Cache import AUSENTE, CacheLRU
+
+
+def test_descarta_o_menos_usado():
+    cache = CacheLRU(tamanho_maximo=2)
+    cache.definir('a', 1)
+    cache.definir('b', 2)
+    assert cache.obter('a') == 1  # 'b' passa a ser o menos usado
+    cache.definir('c', 3)
+    assert cache.obter('b') is AUSENTE
+    assert (cache.obter('a'), cache.obter('c')) == (1, 3)
+    assert cache.descartes == 1
+    assert len(cache) == 2
+
+
+def test_none_fica_guardado():
+    cache = CacheLRU()
+    cache.definir('cep', None)
+    assert cache.obter('cep') is None
+    assert 'cep' in cache
+    assert cache.obter('outro') is AUSENTE
+    assert cache.obter('outro', 'padrao') == 'padrao'
+
+
+def test_ttl_padrao_e_por_item():
+    cache = CacheLRU(ttl=0.05)
+    cache.definir('curto', 1)
+    cache.definir('longo', 2, ttl=10)
+    time.sleep(0.08)
+    assert 'curto' not in cache
+    assert cache.obter('curto') is AUSENTE
+    assert cache.obter('longo') == 2
+
+
+def test_remover_expirados():
+    cache = CacheLRU(ttl=0.05)
+    cache.definir('a', 1)
+    cache.definir('b', 2)
+    cache.definir('c', 3, ttl=10)
+    time.sleep(0.08)
+    assert cache.remover_expirados() == 2
+    assert len(cache) == 1
+
+
+def test_estatisticas():
+    cache = CacheLRU()
+    cache.definir('a', 1)
+    cache.obter('a')
+    cache.obter('a')
+    cache.obter('b')
+    estatisticas = cache.estatisticas()
+    assert (estatisticas['acertos'], estatisticas['falhas'], estatisticas['itens']) == (2, 1, 1)
+    assert abs(estatisticas['taxa_acerto'] - 2 / 3) < 1e-9
@@ -0,0 +1,115 @@
+"""
+BancoDeDados.validar_cep com o url_cep apontado para um servidor local que
+imita o ViaCEP: CEPs terminados em 999 não existem, e `falhar` responde 500.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class ServicoCep:
+    def __init__(self) -> None:
+        self.consultas = []
+        self.falhar = False
+        servico = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                cep = self.path.strip('/').split('/')[1]
+                servico.consultas.append(cep)
+                if servico.falhar:
+                    self.send_response(500)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                if cep.endswith('999'):
+                    corpo = {'erro': True}
+                else:
+                    corpo = {'cep': cep, 'logradouro': 'Rua de Teste', 'bairro': 'Centro',
+                             'localidade': 'São Paulo', 'uf': 'SP'}
+                dados = json.dumps(corpo).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(dados)))
+                self.end_headers()
+                self.wfile.write(dados)
+
+            def log_message(self, *args):
+                pass
+
+        self.servidor = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.servidor.server_port}/ws/{{cep}}/json/'
+
+
+@pytest.fixture
+def servico():
+    servico = ServicoCep()
+    yield servico
+    servico.servidor.shutdown()
+
+
+@pytest.fixture
+def criar(criar_banco, servico):
+    def criar(**opcoes):
+        return criar_banco(url_cep=servico.url, **opcoes)
+    return criar
+
+
+def contagens(db):
+    return {chave: valor for chave, valor in db.estatisticas_cep().items() if chave != 'taxa_acerto'}
+
+
+def test_memoria_e_cep_cache_nao_consultam_o_servico(criar, servico):
+    db = criar()
+    assert db.validar_cep('01001-000')['logradouro'] == 'Rua de Teste'
+    assert db.validar_cep('01001000')['uf'] == 'SP'
+    assert servico.consultas == ['01001000']
+    assert contagens(db) == {'indice': 0, 'memoria': 1, 'banco': 0, 'remoto': 1, 'erros': 0}
+
+    # Outro processo no mesmo arquivo: memória vazia, mas a tabela cep_cache responde
+    outro = criar()
+    assert outro.validar_cep('01001000')['bairro'] == 'Centro'
+    assert servico.consultas == ['01001000']
+    assert contagens(outro) == {'indice': 0, 'memoria': 0, 'banco': 1, 'remoto': 0, 'erros': 0}
+    assert outro.estatisticas_cep()['taxa_acerto'] == 1.0
+
+
+def test_cep_inexistente_fica_em_cache(criar, servico):
+    db = criar()
+    assert db.validar_cep('01001999') is None
+    assert db.validar_cep('01001999') is None
+    assert criar().validar_cep('01001999') is None
+    assert servico.consultas == ['01001999']
+    assert contagens(db)['remoto'] == 1 and contagens(db)['memoria'] == 1
+
+
+def test_entrada_vence_depois_do_ttl(criar, servico):
+    db = criar(ttl_cep=0.2, ttl_cep_invalido=0.1)
+    db.validar_cep('01001000')
+    db.validar_cep('01001999')
+    time.sleep(0.25)
+    db.validar_cep('01001000')
+    db.validar_cep('01001999')
+    assert servico.consultas == ['01001000', '01001999'] * 2
+    assert contagens(db) == {'indice': 0, 'memoria': 0, 'banco': 0, 'remoto': 4, 'erros': 0}
+
+
+def test_falha_de_rede_nao_fica_em_cache(criar, servico):
+    db = criar()
+    servico.falhar = True
+    assert db.validar_cep('01001000') is None
+    servico.falhar = False
+    assert db.validar_cep('01001000')['cep'] == '01001000'
+    assert servico.consultas == ['01001000', '01001000']
+    assert contagens(db) == {'indice': 0, 'memoria': 0, 'banco': 0, 'remoto': 1, 'erros': 1}
+
+
+def test_servico_fora_do_ar_nao_fica_em_cache(criar_banco):
+    db = criar_banco(url_cep='http://127.0.0.1:9/ws/{cep}/json/', timeout_cep=(0.5, 0.5))
+    assert db.validar_cep('01001000') is None
+    assert db.validar_cep('01001000') is None
+    assert contagens(db)['erros'] == 2
@@ -0,0 +1,64 @@
+"""Cache de clientes de BancoDeDados.buscar_cliente."""
+from contextlib import contextmanager
+
+TELEFONE = '5511911111111'
+
+
+def cadastrar(db):
+    assert db.cadastrar_cliente('Ana', '+55 (11) 91111-1111')
+    return db.buscar_cliente(TELEFONE)
+
+
+def adicionar_casa(db, cliente_id):
+    assert db.adicionar_endereco(cliente_id, 'Casa', '01001000', 'Rua A', '1', 'Casa')
+
+
+def test_segunda_busca_vem_do_cache(db):
+    cadastrar(db)
+    antes = db.estatisticas_cache_clientes()['acertos']
+    assert db.buscar_cliente('+55 11 91111-1111')['nome'] == 'Ana'
+    assert db.estatisticas_cache_clientes()['acertos'] == antes + 1
+
+
+def test_numero_desconhecido_nao_fica_em_cache(db):
+    assert db.buscar_cliente(TELEFONE) is None
+    cadastrar(db)
+    assert db.buscar_cliente(TELEFONE)['nome'] == 'Ana'
+
+
+def test_novo_endereco_invalida_o_cliente(db):
+    cliente = cadastrar(db)
+    assert cliente['endereco_padrao'] is None
+    adicionar_casa(db, cliente['id'])
+    assert db.buscar_cliente(TELEFONE)['endereco_padrao']['apelido'] == 'Casa'
+
+
+def test_alterar_o_retorno_nao_altera_o_cache(db):
+    cliente = cadastrar(db)
+    adicionar_casa(db, cliente['id'])
+    cliente = db.buscar_cliente(TELEFONE)
+    cliente['nome'] = 'Outra'
+    cliente['endereco_padrao']['apelido'] = 'Outro'
+    cliente = db.buscar_cliente(TELEFONE)
+    assert cliente['nome'] == 'Ana'
+    assert cliente['endereco_padrao']['apelido'] == 'Casa'
+
+
+def test_invalidacao_durante_a_leitura_nao_deixa_cliente_velho_no_cache(db):
+    cliente = cadastrar(db)
+    original = db._conectar_leitura
+    pendente = [cliente['id']]
+
+    @contextmanager
+    def leitura_interrompida():
+        with original() as conn:
+            yield conn
+        # Outro worker grava entre a leitura e a gravação no cache
+        if pendente:
+            adicionar_casa(db, pendente.pop())
+
+    db._cache_clientes.remover(TELEFONE)
+    db._conectar_leitura = leitura_interrompida
+    assert db.buscar_cliente(TELEFONE)['endereco_padrao'] is None  # leu antes do endereço
+    db._conectar_leitura = original
+    assert db.buscar_cliente(TELEFONE)['endereco_padrao']['apelido'] == 'Casa'
@@ -0,0 +1,78 @@
+"""Log de consultas lentas com EXPLAIN QUERY PLAN (ConsultasLentas)."""
+import json
+import sqlite3
+
+import pytest
+
+from ConsultasLentas import ConexaoMonitorada, MonitorConsultas, formato_parametros, resumir_plano
+from Metricas import RegistroMetricas
+
+
+@pytest.fixture
+def conectar(tmp_path):
+    conexoes = []
+
+    def conectar(monitor):
+        conn = sqlite3.connect(str(tmp_path / 'teste.db'), factory=ConexaoMonitorada)
+        conn.monitor = monitor
+        conn.execute("CREATE TABLE IF NOT EXISTS clientes (id INTEGER PRIMARY KEY, telefone TEXT)")
+        conn.executemany("INSERT INTO clientes (telefone) VALUES (?)", [(f'55119{i:08d}',) for i in range(50)])
+        conexoes.append(conn)
+        return conn
+
+    yield conectar
+    for conn in conexoes:
+        conn.close()
+
+
+def test_parametros_sem_valores():
+    assert formato_parametros(('5511911111111', 3)) == ['str', 'int']
+    assert formato_parametros({'telefone': '5511911111111'}) == {'telefone': 'str'}
+    assert formato_parametros(None) == []
+
+
+def test_resumo_do_plano():
+    plano = resumir_plano([
+        (2, 0, 0, 'SCAN clientes'),
+        (5, 0, 0, 'SEARCH pedidos USING INDEX idx_pedidos_cliente (cliente_id=?)'),
+        (9, 5, 0, 'SCAN CONSTANT ROW'),
+        (12, 0, 0, 'USE TEMP B-TREE FOR ORDER BY'),
+    ])
+    assert plano['varreduras'] == ['clientes']
+    assert plano['ordenacao_temporaria'] is True
+    assert plano['plano'][2] == '  SCAN CONSTANT ROW'
+
+
+def test_consulta_acima_do_limite_vai_para_o_log(conectar, tmp_path):
+    arquivo = tmp_path / 'lentas.log'
+    monitor = MonitorConsultas(0.0, str(arquivo), metricas=RegistroMetricas())
+    conn = conectar(monitor)
+    for _ in range(3):
+        conn.execute("SELECT id FROM clientes WHERE telefone = ?", ('5511900000007',)).fetchall()
+
+    entradas = [entrada for entrada in monitor.recentes if entrada['sql'].startswith('SELECT id')]
+    assert len(entradas) == 3
+    assert entradas[0]['varreduras'] == ['clientes']
+    assert entradas[0]['parametros'] == ['str']
+    assert '5511900000007' not in arquivo.read_text(encoding='utf-8')
+    linhas = [json.loads(linha) for linha in arquivo.read_text(encoding='utf-8').splitlines()]
+    assert sum(linha['sql'].startswith('SELECT id') for linha in linhas) == 3
+    # O plano da mesma consulta é calculado uma vez só
+    assert monitor._planos.estatisticas()['acertos'] >= 2
+
+
+def test_consulta_rapida_nao_e_registrada(conectar):
+    monitor = MonitorConsultas(10.0, None, metricas=RegistroMetricas())
+    conn = conectar(monitor)
+    conn.execute("SELECT id FROM clientes WHERE telefone = ?", ('5511900000007',)).fetchall()
+    assert len(monitor.recentes) == 0
+
+
+def test_banco_de_dados_registra_o_metodo(criar_banco, tmp_path):
+    metricas = RegistroMetricas()
+    db = criar_banco(limite_consulta_lenta=0.0, log_consultas_lentas=str(tmp_path / 'lentas.log'),
+                     metricas=metricas)
+    db.buscar_cliente('5511911111111')
+    metodos = {entrada['metodo'] for entrada in db.monitor_consultas.recentes}
+    assert 'buscar_cliente' in metodos
+    assert 'pizzap_banco_consultas_lentas_total{metodo="buscar_cliente"' in metricas.exportar()
@@ -0,0 +1,84 @@
+"""Fila da cozinha (heap com remoção preguiçosa) e repasse das mudanças de status."""
+import time
+
+from Cozinha import Cozinha, FilaCozinha, TransmissorEventos
+
+
+def ids(fila, limite=None):
+    return [pedido['pedido_id'] for pedido in fila.proximos(limite)]
+
+
+def test_ordem_por_status_e_depois_por_idade():
+    fila = FilaCozinha()
+    fila.atualizar(1, 'Recebido', 10.0)
+    fila.atualizar(2, 'Recebido', 5.0)
+    fila.atualizar(3, 'Em preparo', 20.0)
+    fila.atualizar(4, 'Assando', 30.0)
+    assert ids(fila) == [4, 3, 2, 1]
+    assert ids(fila, limite=2) == [4, 3]
+
+
+def test_mudanca_de_status_reposiciona_sem_duplicar():
+    fila = FilaCozinha()
+    fila.atualizar(1, 'Recebido', 10.0)
+    fila.atualizar(2, 'Recebido', 20.0)
+    fila.atualizar(2, 'Assando', 25.0)
+    assert ids(fila) == [2, 1]
+    pedido = fila.obter(2)
+    # A idade continua a da criação; status_desde acompanha a mudança
+    assert (pedido['status'], pedido['criado_em'], pedido['status_desde']) == ('Assando', 20.0, 25.0)
+    fila.atualizar(2, 'Entregue', 40.0)
+    assert ids(fila) == [1]
+    assert fila.obter(2) is None
+    assert fila.contagem_por_status()['Assando'] == 0
+
+
+def test_entradas_velhas_sao_compactadas():
+    fila = FilaCozinha()
+    fila.atualizar(1, 'Recebido', 1.0)
+    for i in range(1000):
+        fila.atualizar(1, 'Em preparo' if i % 2 else 'Confirmado', float(i))
+    assert len(fila) == 1
+    assert len(fila._heap) <= 2 * len(fila) + 65
+    assert ids(fila) == [1]
+
+
+def test_transmissor_descarta_o_mais_antigo_para_tela_lenta():
+    transmissor = TransmissorEventos(tamanho_fila=2)
+    tela = transmissor.inscrever()
+    for i in range(3):
+        transmissor.publicar({'i': i})
+    assert [tela.get_nowait()['i'] for _ in range(2)] == [1, 2]
+    transmissor.cancelar(tela)
+    assert len(transmissor) == 0
+
+
+def test_cozinha_acompanha_pedidos_do_banco(db, cliente):
+    cliente_id, endereco_id = cliente
+    cozinha = Cozinha(db)
+    tela = cozinha.transmissor.inscrever()
+    primeiro = db.fazer_pedido(cliente_id, endereco_id, [{'pizza_id': 1, 'tamanho': 'M', 'quantidade': 1}])
+    segundo = db.fazer_pedido(cliente_id, endereco_id, [{'pizza_id': 2, 'tamanho': 'M', 'quantidade': 1}])
+    assert ids(cozinha.fila) == [primeiro, segundo]
+
+    assert cozinha.avancar([segundo]) == [segundo]
+    assert ids(cozinha.fila) == [segundo, primeiro]  # Confirmado vem antes de Recebido
+    eventos = [tela.get_nowait() for _ in range(3)]
+    assert [(evento['pedido_id'], evento['status']) for evento in eventos] == [
+        (primeiro, 'Recebido'), (segundo, 'Recebido'), (segundo, 'Confirmado')]
+
+    # Uma cozinha nova (outro worker reiniciado) carrega os ativos do banco
+    assert ids(Cozinha(db).fila) == [segundo, primeiro]
+
+
+def test_mudanca_em_outro_worker_chega_pela_sincronizacao(criar_banco, cliente):
+    cliente_id, endereco_id = cliente
+    # Dois workers no mesmo arquivo; só a cozinha do segundo é observada
+    worker, outro = criar_banco(intervalo_sincronizacao=0.02), criar_banco(intervalo_sincronizacao=0.02)
+    cozinha = Cozinha(outro)
+    pedido_id = worker.fazer_pedido(cliente_id, endereco_id, [{'pizza_id': 1, 'tamanho': 'M', 'quantidade': 1}])
+    assert worker.atualizar_status_pedido(pedido_id, 'Confirmado')
+    limite = time.monotonic() + 2
+    while (cozinha.fila.obter(pedido_id) or {}).get('status') != 'Confirmado':
+        assert time.monotonic() < limite, "mudança não chegou"
+        time.sleep(0.01)
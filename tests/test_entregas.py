@@ -0,0 +1,83 @@
+"""Agrupamento de entregas por proximidade do CEP e despacho dos lotes."""
+import time
+
+import pytest
+
+from Entregas import DespachoEntregas, agrupar_entregas
+from Metricas import RegistroMetricas
+
+VIZINHANCA = {
+    '01001': {'01002': 0.5, '01003': 1.5, '01310': 5.0},
+    '01002': {'01001': 0.5},
+    '01003': {'01001': 1.5},
+    '01310': {'01001': 5.0},
+}
+
+
+def pedido(pedido_id, cep, pronto_desde):
+    return {'id': pedido_id, 'cep': cep, 'pronto_desde': pronto_desde}
+
+
+def test_lote_leva_os_vizinhos_mais_proximos_ate_a_capacidade():
+    pedidos = [
+        pedido(4, '01003-000', 3.0),
+        pedido(2, '01310-100', 1.0),
+        pedido(1, '01001-000', 0.0),
+        pedido(3, '01002-000', 2.0),
+        pedido(5, '01002-500', 4.0),
+    ]
+    lotes = agrupar_entregas(pedidos, VIZINHANCA, agora=10.0, capacidade=3, raio_km=2.0)
+    # O mais antigo abre o lote e leva os dois 01002 (0,5 km) antes do 01003 (1,5 km)
+    assert lotes[0]['pedidos'] == [1, 3, 5]
+    assert (lotes[0]['motivo'], lotes[0]['distancia_km'], lotes[0]['pronto']) == ('capacidade', 0.5, True)
+    # 01310 está fora do raio: sai sozinho, ainda aguardando companhia
+    assert [lote['pedidos'] for lote in lotes[1:]] == [[2], [4]]
+    assert lotes[1]['motivo'] == 'aguardando' and not lotes[1]['pronto']
+    assert lotes[1]['espera_s'] == 9.0
+
+
+def test_sem_vizinhanca_usa_os_quatro_primeiros_digitos():
+    pedidos = [pedido(1, '01001000', 0.0), pedido(2, '01009000', 50.0), pedido(3, '01101000', 60.0)]
+    lotes = agrupar_entregas(pedidos, {}, agora=900.0, capacidade=4, espera_maxima=900.0, raio_km=2.0)
+    assert [lote['pedidos'] for lote in lotes] == [[1, 2], [3]]
+    # O primeiro lote venceu a espera; o vizinho aproximado conta como no limite do raio
+    assert (lotes[0]['motivo'], lotes[0]['distancia_km']) == ('espera', 2.0)
+    assert lotes[1]['motivo'] == 'aguardando'
+
+
+@pytest.fixture
+def pedidos_prontos(db, cliente):
+    """Três pedidos 'Assando': dois em CEPs vizinhos e um longe; retorna (despacho, ids, metricas)."""
+    cliente_id, _ = cliente
+    assert db.adicionar_endereco(cliente_id, 'Trabalho', '01002000', 'Rua B', '2', 'Apartamento')
+    assert db.adicionar_endereco(cliente_id, 'Praia', '11700000', 'Rua C', '3', 'Casa')
+    enderecos = {endereco['cep']: endereco['id'] for endereco in db.listar_enderecos(cliente_id)}
+    assert db.importar_vizinhanca_cep([('01001', '01002', 0.8)]) == 2
+
+    metricas = RegistroMetricas()
+    despacho = DespachoEntregas(db, capacidade=2, espera_maxima=60.0, raio_km=2.0, metricas=metricas)
+    ids = [db.fazer_pedido(cliente_id, enderecos[cep], [{'pizza_id': 1, 'tamanho': 'M', 'quantidade': 1}])
+           for cep in ('01001000', '11700000', '01002000')]
+    assert db.atualizar_status_pedidos({pedido_id: 'Assando' for pedido_id in ids}) == ids
+    return despacho, ids, metricas
+
+
+def test_despacha_lote_cheio_e_segura_o_incompleto(db, pedidos_prontos):
+    despacho, (perto, longe, vizinho), metricas = pedidos_prontos
+    despachados = despacho.despachar_prontos(agora=time.time())
+    assert [sorted(lote['pedidos']) for lote in despachados] == [[perto, vizinho]]
+    assert sorted(p['id'] for p in db.buscar_pedidos_para_entrega(('Saiu para entrega',))) == [perto, vizinho]
+    assert [p['id'] for p in db.buscar_pedidos_para_entrega()] == [longe]
+
+    # Vencida a espera máxima, o pedido distante sai sozinho
+    despachados = despacho.despachar_prontos(agora=time.time() + 61)
+    assert [(lote['pedidos'], lote['motivo']) for lote in despachados] == [([longe], 'espera')]
+    assert metricas.obter('pizzap_entregas_lotes_total').valores() == {('capacidade',): 1, ('espera',): 1}
+
+
+def test_despacho_e_tudo_ou_nada(db, pedidos_prontos):
+    despacho, (perto, longe, vizinho), _ = pedidos_prontos
+    assert despacho.despachar([perto]) == [perto]
+    # Um pedido do lote já saiu: nenhum dos outros é alterado
+    assert despacho.despachar([perto, vizinho]) is None
+    assert sorted(p['id'] for p in db.buscar_pedidos_para_entrega()) == [longe, vizinho]
@@ -0,0 +1,46 @@
+"""BancoDeDados.fazer_pedido: o pedido inteiro numa única transação."""
+import sqlite3
+
+
+def contar(db, tabela):
+    with sqlite3.connect(db.nome_banco) as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM {tabela}").fetchone()[0]
+
+
+def test_grava_pedido_itens_e_total(db, cliente):
+    cliente_id, endereco_id = cliente
+    eventos = []
+    db.adicionar_ouvinte_status(eventos.extend)
+    pedido_id = db.fazer_pedido(cliente_id, endereco_id, [
+        {'pizza_id': 1, 'tamanho': 'G', 'quantidade': 2},
+        {'pizza_id': 2, 'tamanho': 'P', 'quantidade': 1, 'observacoes': 'sem cebola'},
+    ], forma_pagamento='PIX')
+
+    pedido = db.buscar_detalhes_pedido(pedido_id)
+    assert pedido['valor_total'] == round(55.90 * 2 + 38.50, 2)
+    assert pedido['status'] == 'Recebido'
+    assert [(item['pizza_id'], item['quantidade'], item['valor_unitario'], item['observacoes'])
+            for item in pedido['itens']] == [(1, 2, 55.90, None), (2, 1, 38.50, 'sem cebola')]
+    assert [(evento['pedido_id'], evento['status']) for evento in eventos] == [(pedido_id, 'Recebido')]
+
+
+def test_item_sem_preco_nao_grava_nada(db, cliente):
+    cliente_id, endereco_id = cliente
+    assert db.fazer_pedido(cliente_id, endereco_id, [
+        {'pizza_id': 1, 'tamanho': 'G', 'quantidade': 1},
+        {'pizza_id': 999, 'tamanho': 'G', 'quantidade': 1},
+    ]) is None
+    assert db.fazer_pedido(cliente_id, endereco_id, []) is None
+    assert (contar(db, 'pedidos'), contar(db, 'itens_pedido')) == (0, 0)
+
+
+def test_erro_no_meio_desfaz_o_pedido(db, cliente):
+    cliente_id, endereco_id = cliente
+    # quantidade 0 viola o CHECK de itens_pedido depois de o pedido ter sido inserido
+    assert db.fazer_pedido(cliente_id, endereco_id, [
+        {'pizza_id': 1, 'tamanho': 'G', 'quantidade': 1},
+        {'pizza_id': 2, 'tamanho': 'M', 'quantidade': 0},
+    ]) is None
+    assert (contar(db, 'pedidos'), contar(db, 'itens_pedido')) == (0, 0)
+    with sqlite3.connect(db.nome_banco) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM resumo_vendas_diario").fetchone()[0] == 0
@@ -0,0 +1,188 @@
+"""
+FilaMensagens com o EnviadorTwilio apontado para um servidor local que imita
+a API de mensagens (POST .../Accounts/<sid>/Messages.json).
+"""
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import pytest
+
+from FilaMensagens import MAXIMO_TENTATIVAS, EnviadorTwilio, FilaMensagens
+
+
+class ApiMensagens:
+    """Servidor local; `falhas[corpo]` diz quantas vezes recusar aquele texto (-1 = sempre)."""
+
+    def __init__(self) -> None:
+        self.recebidas = []
+        self.tentativas = {}
+        self.falhas = {}
+        self._lock = threading.Lock()
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                tamanho = int(self.headers.get('Content-Length', 0))
+                formulario = {chave: valores[0] for chave, valores
+                              in parse_qs(self.rfile.read(tamanho).decode('utf-8')).items()}
+                corpo = formulario.get('Body', '')
+                with api._lock:
+                    api.tentativas[corpo] = api.tentativas.get(corpo, 0) + 1
+                    restantes = api.falhas.get(corpo, 0)
+                    if restantes:
+                        api.falhas[corpo] = restantes - 1 if restantes > 0 else restantes
+                        status = 500
+                    else:
+                        api.recebidas.append((formulario['To'], corpo))
+                        status = 201
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', '2')
+                self.end_headers()
+                self.wfile.write(b'{}')
+
+            def log_message(self, *args):
+                pass
+
+        self.servidor = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.servidor.server_port}'
+
+    def de(self, numero: str):
+        with self._lock:
+            return [corpo for destino, corpo in self.recebidas if destino == f'whatsapp:{numero}']
+
+
+def esperar(condicao, timeout: float = 5.0) -> None:
+    limite = time.monotonic() + timeout
+    while not condicao():
+        assert time.monotonic() < limite, "tempo esgotado"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def api():
+    api = ApiMensagens()
+    yield api
+    api.servidor.shutdown()
+
+
+@pytest.fixture
+def criar_fila(tmp_path, api):
+    filas = []
+
+    def criar(processar, workers: int = 2):
+        enviador = EnviadorTwilio('AC123', 'token', '+5511900000000', url_api=api.url, timeout=(1.0, 1.0))
+        fila = FilaMensagens(str(tmp_path / 'fila.db'), processar, enviador, workers=workers,
+                             intervalo_consulta=0.01, espera_base=0.01)
+        filas.append(fila)
+        return fila
+
+    yield criar
+    for fila in filas:
+        fila.parar()
+
+
+def status_saida(fila: FilaMensagens):
+    with sqlite3.connect(fila.caminho) as conn:
+        return conn.execute("SELECT texto, status, tentativas FROM mensagens_saida ORDER BY id").fetchall()
+
+
+def test_respostas_saem_na_ordem_de_cada_numero(api, criar_fila):
+    fila = criar_fila(lambda numero, corpo: [f'{corpo}.a', f'{corpo}.b'], workers=3)
+    numeros = ['+5511911111111', '+5511922222222', '+5511933333333']
+    for i in range(20):
+        for numero in numeros:
+            fila.enfileirar(numero, f'{numero[-2:]}-{i}')
+    # Falhas no meio não podem deixar as respostas seguintes passarem na frente
+    api.falhas['11-3.b'] = 2
+    api.falhas['22-7.a'] = 1
+    fila.iniciar()
+
+    esperar(lambda: all(len(api.de(numero)) == 40 for numero in numeros))
+    for numero in numeros:
+        esperado = [f'{numero[-2:]}-{i}.{parte}' for i in range(20) for parte in 'ab']
+        assert api.de(numero) == esperado
+    # A API registra a mensagem antes de responder; a linha sai logo depois
+    esperar(lambda: fila.profundidade() == 0 and fila.profundidade_saida() == 0)
+
+
+def test_falha_de_envio_repete_so_o_envio(api, criar_fila):
+    processadas = []
+
+    def processar(numero, corpo):
+        processadas.append(corpo)
+        return [f'resposta {corpo}']
+
+    fila = criar_fila(processar)
+    api.falhas['resposta pedido'] = MAXIMO_TENTATIVAS - 1
+    fila.enfileirar('+5511911111111', 'pedido')
+    fila.iniciar()
+
+    esperar(lambda: api.de('+5511911111111') == ['resposta pedido'])
+    assert api.tentativas['resposta pedido'] == MAXIMO_TENTATIVAS
+    assert processadas == ['pedido']  # o pedido não foi refeito
+    esperar(lambda: status_saida(fila) == [])
+
+
+def test_envio_que_sempre_falha_fica_em_erro_sem_travar_o_numero(api, criar_fila):
+    fila = criar_fila(lambda numero, corpo: [corpo])
+    api.falhas['primeira'] = -1
+    fila.enfileirar('+5511911111111', 'primeira')
+    fila.enfileirar('+5511911111111', 'segunda')
+    fila.iniciar()
+
+    esperar(lambda: api.de('+5511911111111') == ['segunda'])
+    assert api.tentativas['primeira'] == MAXIMO_TENTATIVAS
+    esperar(lambda: status_saida(fila) == [('primeira', 'erro', MAXIMO_TENTATIVAS)])
+    assert fila.profundidade_saida() == 0
+
+
+def test_mensagem_que_sempre_falha_fica_em_erro(api, criar_fila):
+    chamadas = []
+
+    def processar(numero, corpo):
+        chamadas.append(time.monotonic())
+        raise RuntimeError('falha no processamento')
+
+    fila = criar_fila(processar)
+    fila.enfileirar('+5511911111111', 'oi')
+    fila.iniciar()
+
+    esperar(lambda: len(chamadas) == MAXIMO_TENTATIVAS)
+    with sqlite3.connect(fila.caminho) as conn:
+        esperar(lambda: conn.execute("SELECT status FROM mensagens_entrada").fetchall() == [('erro',)])
+    # Backoff: a espera dobra a cada tentativa
+    assert chamadas[1] - chamadas[0] >= 0.009
+    assert chamadas[2] - chamadas[1] >= 0.019
+    assert api.recebidas == []
+
+
+def test_falha_no_processamento_nao_deixa_a_seguinte_passar(api, criar_fila):
+    processadas = []
+    falhas = {'primeira': 1}
+
+    def processar(numero, corpo):
+        processadas.append(corpo)
+        if falhas.get(corpo):
+            falhas[corpo] -= 1
+            raise RuntimeError('falha no processamento')
+        return [f'resposta {corpo}']
+
+    fila = criar_fila(processar)
+    fila.espera_base = 0.2  # a segunda fica disponível bem antes da nova tentativa da primeira
+    fila.enfileirar('+5511911111111', 'primeira')
+    fila.enfileirar('+5511911111111', 'segunda')
+    fila.enfileirar('+5511922222222', 'outro')
+    fila.iniciar()
+
+    esperar(lambda: len(api.de('+5511911111111')) == 2)
+    assert processadas.count('primeira') == 2
+    assert [corpo for corpo in processadas if corpo != 'outro'] == ['primeira', 'primeira', 'segunda']
+    assert api.de('+5511911111111') == ['resposta primeira', 'resposta segunda']
+    # Os outros números não esperam o backoff
+    corpos = [corpo for _, corpo in api.recebidas]
+    assert corpos.index('resposta outro') < corpos.index('resposta primeira')
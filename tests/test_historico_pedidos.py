@@ -0,0 +1,59 @@
+"""Paginação de buscar_pedidos_cliente com pedidos no banco principal e no de arquivo."""
+import sqlite3
+
+import pytest
+
+
+@pytest.fixture
+def db(criar_banco, tmp_path):
+    return criar_banco(banco_arquivo=str(tmp_path / 'arquivo.db'))
+
+
+def criar_pedidos(db, cliente, datas_status):
+    cliente_id, endereco_id = cliente
+    ids = [db.fazer_pedido(cliente_id, endereco_id, [{'pizza_id': 1, 'tamanho': 'M', 'quantidade': 1}])
+           for _ in datas_status]
+    with sqlite3.connect(db.nome_banco) as conn:
+        conn.executemany("UPDATE pedidos SET data_pedido = datetime('now', ?), status = ? WHERE id = ?",
+                         [(data, status, pedido_id) for (data, status), pedido_id in zip(datas_status, ids)])
+    return cliente_id, ids
+
+
+def paginas(db, cliente_id, tamanho):
+    todos, offset = [], 0
+    while True:
+        pagina = db.buscar_pedidos_cliente(cliente_id, limit=tamanho, offset=offset)
+        if not pagina:
+            return todos
+        assert len(pagina) <= tamanho
+        todos.extend(pedido['id'] for pedido in pagina)
+        offset += tamanho
+
+
+def test_pedido_antigo_nao_entregue_fica_na_ordem(db, cliente):
+    cliente_id, ids = criar_pedidos(db, cliente, [
+        ('-200 days', 'Recebido'),   # nunca entregue: continua no banco principal
+        ('-150 days', 'Entregue'),
+        ('-120 days', 'Entregue'),
+        ('-100 days', 'Entregue'),
+        ('-10 days', 'Entregue'),
+        ('-5 days', 'Recebido'),
+    ])
+    assert db.arquivar_pedidos(dias=90) == 3
+
+    esperado = list(reversed(ids))
+    for tamanho in (1, 2, 4, 10):
+        assert paginas(db, cliente_id, tamanho) == esperado
+
+
+def test_mesma_data_desempata_pelo_id_entre_os_bancos(db, cliente):
+    cliente_id, ids = criar_pedidos(db, cliente, [
+        ('-100 days', 'Entregue'),
+        ('-100 days', 'Recebido'),
+        ('-100 days', 'Entregue'),
+    ])
+    with sqlite3.connect(db.nome_banco) as conn:
+        data = conn.execute("SELECT data_pedido FROM pedidos WHERE id = ?", (ids[0],)).fetchone()[0]
+        conn.execute("UPDATE pedidos SET data_pedido = ?", (data,))
+    assert db.arquivar_pedidos(dias=90) == 2
+    assert paginas(db, cliente_id, 1) == list(reversed(ids))
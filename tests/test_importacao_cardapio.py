@@ -0,0 +1,78 @@
+"""BancoDeDados.importar_cardapio: relatório e invalidação do cardápio em memória."""
+import json
+import sqlite3
+import time
+
+
+def pizza(nome, preco_g=50.0, **extra):
+    item = {'nome': nome, 'descricao': f'Pizza de {nome.lower()} da casa',
+            'ingredientes': 'Mussarela e tomate', 'categoria': 'Tradicionais',
+            'precos': {'P': 30.0, 'M': 40.0, 'G': preco_g}}
+    item.update(extra)
+    return item
+
+
+def versao_no_banco(db):
+    with sqlite3.connect(db.nome_banco) as conn:
+        return conn.execute("SELECT versao FROM versoes WHERE nome = 'cardapio'").fetchone()[0]
+
+
+def test_relatorio_de_adicionadas_alteradas_e_desativadas(db):
+    db.importar_cardapio([pizza('Atum'), pizza('Bacon'), pizza('Cebola')])
+    relatorio = db.importar_cardapio([
+        pizza('Atum', preco_g=55.0),
+        pizza('Bacon'),
+        pizza('Dois Queijos'),
+    ])
+    assert relatorio['adicionadas'] == ['Dois Queijos']
+    assert relatorio['alteradas'] == [{'nome': 'Atum', 'mudancas': {'preco_G': [50.0, 55.0]}}]
+    assert relatorio['desativadas'] == ['Cebola']
+    assert relatorio['inalteradas'] == 1
+    assert relatorio['ignoradas'] == []
+    nomes = {p['nome'] for p in db.buscar_cardapio_completo()}
+    assert nomes == {'Atum', 'Bacon', 'Dois Queijos'}
+
+
+def test_item_que_nao_e_objeto_vai_para_ignoradas(db, tmp_path):
+    arquivo = tmp_path / 'cardapio.json'
+    arquivo.write_text(json.dumps(['Calabresa', 42, pizza('Atum')]), encoding='utf-8')
+    relatorio = db.importar_cardapio(str(arquivo))
+    assert relatorio is not None
+    assert [item['linha'] for item in relatorio['ignoradas']] == [1, 2]
+    assert all('não é um objeto' in item['erro'] for item in relatorio['ignoradas'])
+    assert relatorio['adicionadas'] == ['Atum']
+
+    relatorio = db.importar_cardapio(['Calabresa', pizza('Atum')], desativar_ausentes=False)
+    assert relatorio['ignoradas'][0]['erro'].startswith('item não é um objeto')
+
+
+def test_importacao_invalida_o_cardapio_uma_vez(criar_banco):
+    db = criar_banco(intervalo_sincronizacao=0.02)
+    db.buscar_cardapio_completo()
+    versao_banco, versao_cache = versao_no_banco(db), db.versao_cardapio
+
+    relatorio = db.importar_cardapio([pizza(f'Pizza {i:03d}') for i in range(200)])
+    assert len(relatorio['adicionadas']) == 200
+    time.sleep(0.2)  # várias voltas da sincronização, que vê o commit da importação
+
+    assert versao_no_banco(db) == versao_banco + 1
+    assert db.versao_cardapio == versao_cache + 1
+
+
+def test_importacao_sem_mudancas_nao_invalida(db):
+    db.importar_cardapio([pizza('Atum')])
+    versao_banco, versao_cache = versao_no_banco(db), db.versao_cardapio
+    relatorio = db.importar_cardapio([pizza('Atum')])
+    assert relatorio['inalteradas'] == 1
+    assert (versao_no_banco(db), db.versao_cardapio) == (versao_banco, versao_cache)
+
+
+def test_alteracao_de_outro_processo_ainda_invalida(criar_banco):
+    db = criar_banco(intervalo_sincronizacao=0.02)
+    db.importar_cardapio([pizza('Atum')])
+    antes = db.versao_cardapio
+    with sqlite3.connect(db.nome_banco) as conn:  # como o reset.py ou outro worker
+        conn.execute("UPDATE precos SET valor = 99 WHERE tamanho = 'G'")
+    time.sleep(0.2)
+    assert db.versao_cardapio == antes + 1
+    assert db.buscar_cardapio_completo()[0]['precos'][-1]['valor'] == 99
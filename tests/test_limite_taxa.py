@@ -0,0 +1,72 @@
+"""Limite de taxa (Limitador) e a resposta do /whatsapp sob sobrecarga."""
+import time
+
+from FilaMensagens import EnviadorMemoria, FilaMensagens
+from Limitador import BaldeFichas, LimitadorTaxa
+from Metricas import RegistroMetricas
+
+
+def test_balde_aceita_a_rajada_e_repoe_pela_taxa():
+    balde = BaldeFichas(taxa=20.0, rajada=3)
+    assert [balde.consumir() for _ in range(4)] == [True, True, True, False]
+    time.sleep(0.06)  # pouco mais de uma ficha
+    assert balde.consumir() is True
+    assert balde.consumir() is False
+
+
+def test_limite_por_numero_nao_afeta_os_outros():
+    limitador = LimitadorTaxa(taxa_numero=0.01, rajada_numero=2, taxa_global=1000, rajada_global=1000,
+                              metricas=RegistroMetricas())
+    assert [limitador.permitir('a') for _ in range(3)] == [None, None, 'numero']
+    assert limitador.permitir('b') is None
+
+
+def test_limite_global():
+    limitador = LimitadorTaxa(taxa_numero=100, rajada_numero=100, taxa_global=0.01, rajada_global=3,
+                              metricas=RegistroMetricas())
+    assert [limitador.permitir(str(i)) for i in range(4)] == [None, None, None, 'global']
+
+
+def test_numeros_ociosos_e_excedentes_sao_esquecidos():
+    limitador = LimitadorTaxa(taxa_numero=100, rajada_numero=1, tamanho_maximo=3, metricas=RegistroMetricas())
+    for i in range(10):
+        limitador.permitir(str(i))
+    assert len(limitador) <= 3
+    time.sleep(0.02)  # rajada / taxa = 10 ms: os baldes já estariam cheios
+    limitador.permitir('novo')
+    assert len(limitador) == 1
+
+
+def test_numero_acima_do_limite_pode_repetir_o_message_sid_depois(bot, webhook, monkeypatch):
+    monkeypatch.setattr(bot, 'limitador', LimitadorTaxa(taxa_numero=0.01, rajada_numero=1,
+                                                        metricas=RegistroMetricas()))
+    webhook('oi', message_sid='SM10')
+    resposta = webhook('oi', message_sid='SM11')
+    assert 'Muitas mensagens seguidas' in resposta.get_data(as_text=True)
+    monkeypatch.setattr(bot, 'limitador', LimitadorTaxa(metricas=RegistroMetricas()))
+    assert 'Muitas mensagens seguidas' not in webhook('oi', message_sid='SM11').get_data(as_text=True)
+
+
+def test_sobrecarga_no_modo_sincrono_serve_o_cardapio(bot, webhook, monkeypatch):
+    monkeypatch.setattr(bot, 'CARGA_MAXIMA', 0)
+    assert 'Calabresa' in webhook('cardapio').get_data(as_text=True)
+    assert 'tente novamente em instantes' in webhook('pedir').get_data(as_text=True)
+
+
+def test_sobrecarga_no_modo_assincrono_adia_para_a_fila(bot, webhook, monkeypatch, tmp_path):
+    fila = FilaMensagens(str(tmp_path / 'fila.db'), lambda numero, corpo: [], EnviadorMemoria(), workers=1)
+    monkeypatch.setattr(bot, 'fila_mensagens', fila)  # sem iniciar: nada sai da fila
+    monkeypatch.setattr(bot, 'CARGA_MAXIMA', 0)
+    monkeypatch.setattr(bot, 'ADIAMENTO_MAXIMO', 2)
+
+    def enviar(corpo, message_sid):
+        monkeypatch.setattr(bot, '_profundidade_fila', (0.0, 0))  # relê a profundidade
+        return webhook(corpo, message_sid=message_sid).get_data(as_text=True)
+
+    assert 'Recebemos sua mensagem' in enviar('pedir', 'SM20')
+    assert 'Recebemos sua mensagem' in enviar('1', 'SM21')
+    assert 'Recebemos sua mensagem' in enviar('1', 'SM21')  # repetição: mesma resposta
+    assert fila.profundidade() == 2
+    assert 'tente novamente em instantes' in enviar('g', 'SM22')
+    assert 'Calabresa' in enviar('cardapio', 'SM23')
+    assert fila.profundidade() == 2
@@ -0,0 +1,39 @@
+"""Interpretação de pedidos em texto livre (PedidoTexto.IndiceCardapio)."""
+import pytest
+
+from PedidoTexto import QUANTIDADE_MAXIMA, IndiceCardapio
+
+PIZZAS = [
+    {'id': 1, 'nome': 'Calabresa', 'precos': [{'tamanho': t, 'valor': 40.0} for t in 'PMG']},
+    {'id': 2, 'nome': 'Marguerita', 'precos': [{'tamanho': t, 'valor': 42.0} for t in 'PMG']},
+    {'id': 3, 'nome': 'Quatro Queijos', 'precos': [{'tamanho': t, 'valor': 45.0} for t in 'PMG']},
+]
+
+
+@pytest.fixture(scope='module')
+def indice():
+    return IndiceCardapio(PIZZAS)
+
+
+def itens(resultado):
+    return [(item['pizza_id'], item['tamanho'], item['quantidade']) for item in resultado['itens']]
+
+
+@pytest.mark.parametrize('mensagem, esperado', [
+    ('2x calabresa g', [(1, 'G', 2)]),
+    ('2X Calabresa G', [(1, 'G', 2)]),
+    ('calabresa g x2', [(1, 'G', 2)]),
+    ('calabresa g x 2', [(1, 'G', 2)]),
+    ('2x calabresa g e 3x marguerita m', [(1, 'G', 2), (2, 'M', 3)]),
+    ('calabresa g x2 e marguerita m', [(1, 'G', 2), (2, 'M', 1)]),
+    ('1 calabresa g x 3 marguerita p', [(1, 'G', 1), (2, 'P', 3)]),
+    ('2 quatro queijos m', [(3, 'M', 2)]),
+])
+def test_quantidade_com_x(indice, mensagem, esperado):
+    resultado = indice.interpretar(mensagem)
+    assert itens(resultado) == esperado
+    assert resultado['nao_entendidos'] == []
+
+
+def test_quantidade_limitada(indice):
+    assert itens(indice.interpretar('calabresa g x99')) == [(1, 'G', QUANTIDADE_MAXIMA)]
@@ -0,0 +1,40 @@
+"""BancoDeDados.pesquisar_pizzas sobre o índice FTS5 pizzas_busca."""
+
+
+def nomes(resultados):
+    return [pizza['nome'] for pizza in resultados]
+
+
+def test_prefixo_e_sem_acentos(db):
+    assert nomes(db.pesquisar_pizzas('calab')) == ['Calabresa']
+    assert nomes(db.pesquisar_pizzas('MANJERICAO')) == ['Marguerita']
+    assert nomes(db.pesquisar_pizzas('berinj abobr')) == ['Vegetariana']
+    assert db.pesquisar_pizzas('abacaxi') == []
+
+
+def test_nome_pesa_mais_que_ingredientes(db):
+    db.importar_cardapio([{
+        'nome': 'Portuguesa', 'descricao': 'Pizza portuguesa tradicional',
+        'ingredientes': 'Presunto, ovo e calabresa', 'categoria': 'Tradicionais',
+        'precos': {'M': 45.0},
+    }], desativar_ausentes=False)
+    assert nomes(db.pesquisar_pizzas('calabresa')) == ['Calabresa', 'Portuguesa']
+    assert nomes(db.pesquisar_pizzas('calabresa', limite=1, deslocamento=1)) == ['Portuguesa']
+
+
+def test_indice_acompanha_alteracoes_e_disponibilidade(db):
+    db.importar_cardapio([{
+        'nome': 'Calabresa', 'descricao': 'Pizza clássica de calabresa',
+        'ingredientes': 'Calabresa, catupiry e mussarela', 'categoria': 'Tradicionais',
+        'precos': {'G': 55.9},
+    }], desativar_ausentes=False)
+    assert nomes(db.pesquisar_pizzas('catupiry')) == ['Calabresa']
+    assert db.pesquisar_pizzas('cebola') == []
+    assert db.definir_disponibilidade(1, False)
+    assert db.pesquisar_pizzas('catupiry') == []
+
+
+def test_caracteres_da_sintaxe_fts_sao_ignorados(db):
+    assert db.pesquisar_pizzas('"') == []
+    assert db.pesquisar_pizzas('*') == []
+    assert nomes(db.pesquisar_pizzas('calabresa" -(*')) == ['Calabresa']
@@ -0,0 +1,77 @@
+"""Previsão de entrega: estimativa pela fila da cozinha e acompanhamento das promessas."""
+import time
+
+import pytest
+
+import PrevisaoEntrega
+from Metricas import RegistroMetricas
+from PrevisaoEntrega import MEDIAS_INICIAIS, EstimadorEntrega
+
+ITENS = [{'pizza_id': 1, 'tamanho': 'M', 'quantidade': 1}]
+
+
+def novo_pedido(db, cliente):
+    return db.fazer_pedido(*cliente, ITENS)
+
+
+def avaliados(metricas):
+    return sum(serie['contagem'] for serie in metricas.obter('pizzap_eta_erro_segundos').valores().values())
+
+
+def test_estimativa_soma_as_etapas_e_a_fila_da_cozinha(db, cliente):
+    estimador = EstimadorEntrega(db, paralelo=1, metricas=RegistroMetricas())
+    etapas = sum(MEDIAS_INICIAIS.values())
+    assert estimador.estimar() == pytest.approx(etapas)
+    assert estimador.estimar('Saiu para entrega') == pytest.approx(MEDIAS_INICIAIS['Saiu para entrega'])
+
+    ids = [novo_pedido(db, cliente) for _ in range(3)]
+    assert estimador.ativos['Recebido'] == 3
+    # Com um pedido por vez, cada pedido à frente custa uma rodada de preparo + forno
+    rodada = MEDIAS_INICIAIS['Em preparo'] + MEDIAS_INICIAIS['Assando']
+    assert estimador.estimar('Recebido', na_frente=2) == pytest.approx(etapas + 2 * rodada)
+    assert estimador.prometer(ids[-1]) % 5 == 0
+
+
+def test_media_movel_acompanha_o_tempo_em_cada_status(db, cliente):
+    estimador = EstimadorEntrega(db, alfa=0.5, metricas=RegistroMetricas())
+    pedido_id = novo_pedido(db, cliente)
+    assert db.atualizar_status_pedidos({pedido_id: 'Confirmado'}) == [pedido_id]
+    # O pedido ficou ~0 s em 'Recebido': a média cai pela metade
+    assert estimador.medias['Recebido'] == pytest.approx(MEDIAS_INICIAIS['Recebido'] / 2, abs=1)
+    assert (estimador.ativos['Recebido'], estimador.ativos['Confirmado']) == (0, 1)
+
+
+def test_entrega_avalia_a_promessa(db, cliente):
+    metricas = RegistroMetricas()
+    estimador = EstimadorEntrega(db, metricas=metricas)
+    pedido_id = novo_pedido(db, cliente)
+    estimador.prometer(pedido_id)
+    assert db.atualizar_status_pedidos({pedido_id: 'Entregue'}) == [pedido_id]
+    assert avaliados(metricas) == 1
+    # Entregue bem antes do previsto: nenhum atraso e viés negativo
+    assert metricas.obter('pizzap_eta_atrasos_total').valores() == {}
+    assert estimador._vies < 0
+    assert len(estimador._prometidos) == 0
+
+
+def test_promessas_pendentes_saem_pelo_lru(db, cliente):
+    metricas = RegistroMetricas()
+    estimador = EstimadorEntrega(db, max_promessas=2, metricas=metricas)
+    ids = [novo_pedido(db, cliente) for _ in range(3)]
+    for pedido_id in ids:
+        estimador.prometer(pedido_id)
+    assert len(estimador._prometidos) == 2
+    assert db.atualizar_status_pedidos({pedido_id: 'Entregue' for pedido_id in ids}) == ids
+    # A promessa mais antiga foi descartada e não entra no erro
+    assert avaliados(metricas) == 2
+
+
+def test_promessas_pendentes_expiram(db, cliente, monkeypatch):
+    monkeypatch.setattr(PrevisaoEntrega, 'VALIDADE_PROMESSA', 0.05)
+    metricas = RegistroMetricas()
+    estimador = EstimadorEntrega(db, metricas=metricas)
+    pedido_id = novo_pedido(db, cliente)
+    estimador.prometer(pedido_id)
+    time.sleep(0.1)
+    assert db.atualizar_status_pedidos({pedido_id: 'Entregue'}) == [pedido_id]
+    assert avaliados(metricas) == 0
@@ -0,0 +1,66 @@
+"""Resumos de vendas mantidos incrementalmente e relatorio_vendas."""
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+
+def resumos(db):
+    with sqlite3.connect(db.nome_banco) as conn:
+        return (
+            sorted(conn.execute("SELECT dia, pizza_id, tamanho, quantidade, ROUND(receita, 2) "
+                                "FROM resumo_vendas_diario WHERE quantidade != 0")),
+            sorted(conn.execute("SELECT dia, status, pedidos, ROUND(valor, 2) "
+                                "FROM resumo_status_diario WHERE pedidos != 0")),
+        )
+
+
+def fazer_pedidos(db, cliente):
+    cliente_id, endereco_id = cliente
+    return [
+        db.fazer_pedido(cliente_id, endereco_id, [{'pizza_id': 1, 'tamanho': 'G', 'quantidade': 2}]),
+        db.fazer_pedido(cliente_id, endereco_id, [{'pizza_id': 1, 'tamanho': 'G', 'quantidade': 1},
+                                                  {'pizza_id': 3, 'tamanho': 'P', 'quantidade': 1}]),
+        db.fazer_pedido(cliente_id, endereco_id, [{'pizza_id': 2, 'tamanho': 'M', 'quantidade': 1}]),
+    ]
+
+
+def test_incremental_igual_a_reconstrucao(db, cliente):
+    pedidos = fazer_pedidos(db, cliente)
+    db.atualizar_status_pedidos({pedidos[0]: 'Confirmado', pedidos[1]: 'Entregue'})
+    db.atualizar_status_pedido(pedidos[0], 'Assando')
+    db.atualizar_status_pedido(pedidos[0], 'Assando')  # sem mudança: não conta de novo
+    incremental = resumos(db)
+    assert db.reconstruir_resumos()
+    assert resumos(db) == incremental
+
+
+def test_relatorio_vendas(db, cliente):
+    pedidos = fazer_pedidos(db, cliente)
+    db.atualizar_status_pedido(pedidos[2], 'Entregue')
+    hoje = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+    relatorio = db.relatorio_vendas(hoje, hoje)
+    assert relatorio['pedidos'] == 3
+    assert relatorio['receita'] == round(55.90 * 3 + 42.00 + 48.50, 2)
+    assert relatorio['ticket_medio'] == round(relatorio['receita'] / 3, 2)
+    assert relatorio['por_status'] == {'Recebido': 2, 'Entregue': 1}
+    assert (relatorio['top_pizzas'][0]['nome'], relatorio['top_pizzas'][0]['quantidade']) == ('Calabresa', 3)
+    assert db.relatorio_vendas('2000-01-01', '2000-01-31')['pedidos'] == 0
+
+
+def test_mudancas_concorrentes_contam_uma_vez(db, cliente):
+    pedido_id = fazer_pedidos(db, cliente)[0]
+    resultados = []
+    barreira = threading.Barrier(8)
+
+    def confirmar():
+        barreira.wait()
+        resultados.append(db.atualizar_status_pedido(pedido_id, 'Confirmado'))
+
+    threads = [threading.Thread(target=confirmar) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(resultados)
+    status = {linha[1]: linha[2] for linha in resumos(db)[1]}
+    assert status == {'Recebido': 2, 'Confirmado': 1}
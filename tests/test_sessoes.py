@@ -0,0 +1,69 @@
+"""Expiração das sessões: o TTL conta a partir da última leitura ou gravação."""
+import time
+
+import pytest
+
+from Sessoes import ArmazemSessoes, SessoesMemoria, SessoesSQLite
+
+TTL = 0.3
+
+
+@pytest.fixture(params=['memoria', 'sqlite'])
+def criar(request, tmp_path):
+    def criar(renovar: bool = True):
+        if request.param == 'memoria':
+            return SessoesMemoria(ttl=TTL, renovar=renovar)
+        return SessoesSQLite(str(tmp_path / 'sessoes.db'), 'login', ttl=TTL, renovar=renovar)
+    return criar
+
+
+def test_leitura_renova_a_sessao(criar):
+    sessoes = criar()
+    sessoes.salvar('+5511911111111', {'id': 1})
+    # Cliente conversando: lê a sessão a cada mensagem, por mais tempo que o TTL
+    for _ in range(4):
+        time.sleep(TTL * 0.6)
+        assert '+5511911111111' in sessoes
+        assert sessoes.obter('+5511911111111') == {'id': 1}
+    time.sleep(TTL * 1.5)
+    assert sessoes.obter('+5511911111111') is None
+
+
+def test_sem_renovar_expira_a_partir_da_gravacao(criar):
+    sessoes = criar(renovar=False)
+    sessoes.salvar('+5511911111111', {'id': 1})
+    time.sleep(TTL / 2)
+    assert sessoes.obter('+5511911111111') == {'id': 1}
+    time.sleep(TTL * 0.75)
+    assert sessoes.obter('+5511911111111') is None
+
+
+def test_leitura_so_grava_depois_da_metade_do_ttl(tmp_path):
+    sessoes = SessoesSQLite(str(tmp_path / 'sessoes.db'), 'login', ttl=TTL)
+    sessoes.salvar('+5511911111111', {'id': 1})
+    conn = sessoes._conexao()
+    gravacoes = conn.total_changes
+    for _ in range(5):
+        assert sessoes.obter('+5511911111111') == {'id': 1}
+    assert conn.total_changes == gravacoes
+    time.sleep(TTL * 0.6)
+    assert sessoes.obter('+5511911111111') == {'id': 1}
+    assert conn.total_changes == gravacoes + 1
+
+
+def test_armazem_incompleto_falha_ao_ser_criado():
+    class SemReserva(ArmazemSessoes):
+        def obter(self, numero):
+            return None
+
+        def salvar(self, numero, dados):
+            pass
+
+        def remover(self, numero):
+            pass
+
+        def remover_expirados(self):
+            return 0
+
+    with pytest.raises(TypeError):
+        SemReserva()
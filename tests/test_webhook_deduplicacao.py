@@ -0,0 +1,54 @@
+"""Deduplicação do /whatsapp pelo MessageSid do Twilio."""
+import threading
+import time
+
+
+def contar_atendimentos(bot, monkeypatch, espera=0.0, falhas=0):
+    chamadas = []
+    restantes = [falhas]
+
+    def atender(numero, mensagem, msg):
+        chamadas.append(mensagem)
+        time.sleep(espera)
+        if restantes[0]:
+            restantes[0] -= 1
+            raise RuntimeError('falha no processamento')
+        msg.body(f'resposta {len(chamadas)}')
+
+    monkeypatch.setattr(bot, 'atender_mensagem', atender)
+    return chamadas
+
+
+def test_repeticao_recebe_a_mesma_resposta_sem_reprocessar(bot, webhook, monkeypatch):
+    chamadas = contar_atendimentos(bot, monkeypatch)
+    primeira = webhook('oi', message_sid='SM1')
+    segunda = webhook('oi', message_sid='SM1')
+    assert primeira.data == segunda.data
+    assert b'resposta 1' in segunda.data
+    assert chamadas == ['oi']
+    assert webhook('oi', message_sid='SM2').data != primeira.data
+    assert webhook('oi').data != primeira.data  # sem MessageSid, sem deduplicação
+    assert len(chamadas) == 3
+
+
+def test_repeticao_durante_o_processamento_espera_a_original(bot, webhook, monkeypatch):
+    chamadas = contar_atendimentos(bot, monkeypatch, espera=0.3)
+    respostas = []
+    threads = [threading.Thread(target=lambda: respostas.append(webhook('oi', message_sid='SM3').data))
+               for _ in range(3)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.02)
+    for thread in threads:
+        thread.join()
+    assert chamadas == ['oi']
+    assert len(set(respostas)) == 1 and b'resposta 1' in respostas[0]
+
+
+def test_falha_libera_o_message_sid_para_nova_tentativa(bot, webhook, monkeypatch):
+    monkeypatch.setitem(bot.app.config, 'PROPAGATE_EXCEPTIONS', False)
+    chamadas = contar_atendimentos(bot, monkeypatch, falhas=1)
+    assert webhook('oi', message_sid='SM4').status_code == 500
+    resposta = webhook('oi', message_sid='SM4')
+    assert resposta.status_code == 200 and b'resposta 2' in resposta.data
+    assert len(chamadas) == 2